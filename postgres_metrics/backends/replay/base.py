@@ -0,0 +1,60 @@
+"""
+A Django database backend replaying metric results recorded with the
+``pgm_record`` management command, without connecting to PostgreSQL:
+
+.. code-block:: python
+
+    DATABASES = {
+        "customer": {
+            "ENGINE": "postgres_metrics.backends.replay",
+            "NAME": "/path/to/customer.json.gz",
+        },
+    }
+
+Only the queries of the recorded metrics can be executed.
+"""
+
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.base.client import BaseDatabaseClient
+from django.db.backends.base.creation import BaseDatabaseCreation
+from django.db.backends.base.features import BaseDatabaseFeatures
+from django.db.backends.base.introspection import BaseDatabaseIntrospection
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.utils.functional import cached_property
+
+from postgres_metrics import replay as Database
+
+
+class DatabaseWrapper(BaseDatabaseWrapper):
+    vendor = "postgresql"
+    display_name = "PostgreSQL (replay)"
+
+    Database = Database
+    client_class = BaseDatabaseClient
+    creation_class = BaseDatabaseCreation
+    features_class = BaseDatabaseFeatures
+    introspection_class = BaseDatabaseIntrospection
+    ops_class = BaseDatabaseOperations
+
+    def get_connection_params(self):
+        return {"path": self.settings_dict["NAME"]}
+
+    def get_new_connection(self, conn_params):
+        return Database.ReplayConnection(Database.load(conn_params["path"]))
+
+    def init_connection_state(self):
+        pass
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor()
+
+    def _set_autocommit(self, autocommit):
+        pass
+
+    def is_usable(self):
+        return True
+
+    @cached_property
+    def pg_version(self):
+        with self.temporary_connection():
+            return self.connection.server_version
@@ -0,0 +1,125 @@
+import time
+from collections import Counter
+from decimal import Decimal
+
+from .metrics import MetricRecords
+
+
+class DeltaTracker:
+    """
+    Turn the cumulative :attr:`~postgres_metrics.metrics.Metric.counter_columns`
+    of a metric's results into the changes since the previous sample of the
+    same metric on the same database.
+
+    Records are identified by their
+    :attr:`~postgres_metrics.metrics.Metric.identity_columns`. The counters of
+    a record that wasn't part of the previous sample, or whose counters went
+    down because the statistics were reset, are ``None``. So are the counters
+    of records sharing their identity with another record of the same sample,
+    as they can't be told apart. With
+    ``per_second=True``, or for metrics with
+    :attr:`~postgres_metrics.metrics.Metric.counters_per_second` set, the
+    changes are divided by the seconds between the two samples.
+
+    Like :class:`~postgres_metrics.tracking.StyleTracker`, the previous
+    samples are kept in the given Django ``cache`` or, without a cache, in
+    memory. Trackers with different ``scope`` strings, such as the session
+    keys of different admin users, keep separate samples, so one viewer's
+    reload doesn't reset the interval of another.
+    """
+
+    cache_key_prefix = "postgres_metrics:samples"
+
+    def __init__(self, cache=None, timeout=None, per_second=False, scope=None):
+        self.cache = cache
+        self.timeout = timeout
+        self.per_second = per_second
+        self.scope = scope
+        self._samples = {}
+
+    def get_cache_key(self, metric, alias):
+        key = "%s:%s:%s" % (self.cache_key_prefix, metric.slug, alias)
+        if self.scope is not None:
+            key += ":%s" % self.scope
+        return key
+
+    def get_sample(self, metric, alias):
+        """
+        Return the previous sample of the metric on the database ``alias`` as
+        a 2-tuple of when it was taken and a dictionary mapping record keys to
+        the values of the counter columns, or ``None``.
+        """
+        key = self.get_cache_key(metric, alias)
+        if self.cache is None:
+            return self._samples.get(key)
+        return self.cache.get(key)
+
+    def set_sample(self, metric, alias, sample):
+        key = self.get_cache_key(metric, alias)
+        if self.cache is None:
+            self._samples[key] = sample
+        else:
+            self.cache.set(key, sample, self.timeout)
+
+    def get_delta(self, value, previous, seconds, per_second=None):
+        if value is None or previous is None or value < previous:
+            return None
+        delta = value - previous
+        if per_second is None:
+            per_second = self.per_second
+        if per_second:
+            if isinstance(delta, Decimal):
+                delta = float(delta)
+            return delta / seconds if seconds > 0 else None
+        return delta
+
+    def update(self, metric, result, now=None):
+        """
+        Replace the :attr:`~postgres_metrics.metrics.MetricResult.records` of
+        ``result`` with the changes since the previous sample, passing each
+        record through :meth:`Metric.get_delta_record
+        <postgres_metrics.metrics.Metric.get_delta_record>`, and store the
+        counters as the new sample.
+
+        :return: Returns the seconds since the previous sample, or ``None`` if
+            there's none.
+        """
+        if not result.holds_data or not metric.counter_columns:
+            return None
+        if now is None:
+            now = time.time()
+        previous = self.get_sample(metric, result.alias)
+        previous_time, previous_counters = previous or (None, {})
+        seconds = None if previous_time is None else now - previous_time
+
+        per_second = self.per_second or metric.counters_per_second
+        counter_columns = metric.counter_columns
+        identity_columns = metric.identity_columns
+        keys = [
+            tuple(record[index] for index in identity_columns)
+            for record in result.records
+        ]
+        duplicates = {key for key, count in Counter(keys).items() if count > 1}
+        counters = {}
+        records = []
+        for key, record in zip(keys, result.records):
+            values = tuple(record[index] for index in counter_columns)
+            if key in duplicates:
+                before = None
+            else:
+                counters[key] = values
+                before = previous_counters.get(key)
+            record = list(record)
+            for position, index in enumerate(counter_columns):
+                record[index] = self.get_delta(
+                    values[position],
+                    None if before is None else before[position],
+                    seconds,
+                    per_second,
+                )
+            records.append(metric.get_delta_record(tuple(record)))
+        self.set_sample(metric, result.alias, (now, counters))
+
+        result.records = MetricRecords(records)
+        result.styles = None
+        return seconds
@@ -0,0 +1,169 @@
+import json
+import statistics
+
+from django.core.management import CommandError
+from django.db import DatabaseError, connections
+from django_rich.management import RichCommand
+from rich.markup import escape
+from rich.table import Table
+from rich.text import Text
+
+from postgres_metrics.metrics import (
+    format_size,
+    get_metrics_and_aliases,
+)
+from postgres_metrics.timing import format_duration
+
+
+def get_text_size(records):
+    """
+    Approximate the number of bytes needed to transfer ``records`` from the
+    server: the length of the text representation of all values that aren't
+    ``None``.
+    """
+    return sum(
+        len(str(item).encode())
+        for record in records
+        for item in record
+        if item is not None
+    )
+
+
+def get_percentile(values, percent):
+    """Return the ``percent`` percentile of ``values``, interpolated linearly."""
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+class Command(RichCommand):
+    help = (
+        "Execute the selected metrics several times on all databases and report "
+        "how long they took."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "metrics",
+            nargs="*",
+            metavar="metric",
+            help="The slugs of the metrics to benchmark. Defaults to all metrics.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Only use the given database alias. Can be used multiple times.",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=10,
+            help="How often to execute each metric. Defaults to 10.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=1,
+            help="How often to execute each metric before measuring. Defaults to 1.",
+        )
+        parser.add_argument(
+            "--exact",
+            action="store_true",
+            help="Use the exact but more expensive query if the metric provides one.",
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Additionally run EXPLAIN (ANALYZE, BUFFERS) for each metric and "
+            "report the shared buffer hits and reads. With --verbosity 2, the "
+            "plans are printed as well.",
+        )
+
+    def handle(self, *args, **options):
+        if options["runs"] < 1:
+            raise CommandError("--runs must be at least 1.")
+        try:
+            metrics, aliases = get_metrics_and_aliases(
+                options["metrics"], options["databases"], exact=options["exact"]
+            )
+        except ValueError as e:
+            self.console.print(Text("%s!" % e, style="bold red"))
+            raise CommandError(1)
+
+        for alias in aliases:
+            connection = connections[alias]
+            table = Table(
+                title=escape(
+                    "%s (%d runs, %d warmup)"
+                    % (alias, options["runs"], options["warmup"])
+                ),
+                title_style="bold green",
+            )
+            table.add_column("Metric", no_wrap=True)
+            for label in ("Min", "Median", "P95", "Rows", "Bytes"):
+                table.add_column(label, justify="right", no_wrap=True)
+            if options["explain"]:
+                for label in ("Shared hit", "Shared read", "Planning", "Execution"):
+                    table.add_column(label, justify="right", no_wrap=True)
+            plans = []
+            for metric in metrics:
+                try:
+                    row, plan = self.benchmark(metric, connection, **options)
+                except DatabaseError as e:
+                    table.add_row(
+                        escape(metric.slug), Text(str(e).strip(), style="red")
+                    )
+                    continue
+                table.add_row(escape(metric.slug), *row)
+                if plan:
+                    plans.append((metric, plan))
+            self.console.print(table)
+            for metric, plan in plans:
+                self.console.print(Text(metric.slug, style="bold"))
+                self.console.print(escape(plan))
+
+    def benchmark(
+        self, metric, connection, runs, warmup, explain, verbosity, **options
+    ):
+        """
+        Execute ``metric`` ``warmup`` times, then ``runs`` times while measuring
+        it, on the given database connection.
+
+        :return: Returns a 2-tuple of the table cells for the metric and the
+            textual query plan, if requested.
+        """
+        for i in range(warmup):
+            result = metric.get_result(connection)
+        durations = []
+        for i in range(runs):
+            result = metric.get_result(connection)
+            if not result.holds_data:
+                return [Text(result.reason, style="yellow")], None
+            durations.append(result.timing.total)
+        row = [
+            format_duration(min(durations)),
+            format_duration(statistics.median(durations)),
+            format_duration(get_percentile(durations, 95)),
+            str(len(result.records)),
+            format_size(get_text_size(result.records)),
+        ]
+        plan = None
+        if explain:
+            sql = metric.get_full_sql(connection)
+            with connection.cursor() as cursor:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+                data = cursor.fetchone()[0]
+                if isinstance(data, str):
+                    data = json.loads(data)
+                if verbosity >= 2:
+                    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql)
+                    plan = "\n".join(line for line, in cursor.fetchall())
+            top = data[0]
+            row += [
+                str(top["Plan"].get("Shared Hit Blocks", 0)),
+                str(top["Plan"].get("Shared Read Blocks", 0)),
+                format_duration(top.get("Planning Time", 0) / 1000),
+                format_duration(top["Execution Time"] / 1000),
+            ]
+        return row, plan
@@ -0,0 +1,191 @@
+import json
+import sys
+import time
+
+from django.core.management import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from postgres_metrics.metrics import (
+    get_cache,
+    get_data_concurrently,
+    get_metrics_and_aliases,
+    worst_style,
+)
+from postgres_metrics.tracking import StyleTracker
+
+OK, WARNING, CRITICAL, UNKNOWN = 0, 1, 2, 3
+
+STATUS_LABELS = {
+    OK: "OK",
+    WARNING: "WARNING",
+    CRITICAL: "CRITICAL",
+    UNKNOWN: "UNKNOWN",
+}
+
+STYLE_STATUS_MAPPING = {
+    "warning": WARNING,
+    "critical": CRITICAL,
+}
+
+# Nagios' precedence of states: CRITICAL > WARNING > UNKNOWN > OK
+STATUS_SEVERITY = {OK: 0, UNKNOWN: 1, WARNING: 2, CRITICAL: 3}
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the selected metrics on all databases and exit with a Nagios "
+        "compatible status code."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "metrics",
+            nargs="*",
+            metavar="metric",
+            help="The slugs of the metrics to check. Defaults to all metrics.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Only check the given database alias. Can be used multiple times.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5,
+            help="Cancel queries running longer than this many seconds. "
+            "Defaults to 5.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Execute the full queries of the metrics instead of their "
+            "cheaper summaries.",
+        )
+        parser.add_argument(
+            "--track",
+            action="store_true",
+            help="Track the style of each record in the POSTGRES_METRICS_CACHE "
+            "cache and send the style_changed signal when it changes. Implies "
+            "--full.",
+        )
+        parser.add_argument(
+            "--min-duration",
+            type=float,
+            default=0,
+            help="With --track, only report a style change once it lasted this "
+            "many seconds.",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Print details on all non-OK records as JSON after the summary.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        try:
+            metrics, aliases = get_metrics_and_aliases(
+                options["metrics"],
+                options["databases"],
+                summary=not (options["full"] or options["track"]),
+            )
+        except ValueError as e:
+            self.exit(UNKNOWN, str(e))
+
+        data = get_data_concurrently(
+            metrics, aliases, statement_timeout=options["timeout"]
+        )
+
+        tracker = None
+        if options["track"]:
+            tracker = StyleTracker(get_cache(), min_duration=options["min_duration"])
+
+        status = OK
+        counts = {WARNING: 0, CRITICAL: 0, UNKNOWN: 0}
+        details = []
+        for metric, results in data.items():
+            for alias, result in zip(aliases, results):
+                if isinstance(result, Exception):
+                    counts[UNKNOWN] += 1
+                    status = self.worst_status(status, UNKNOWN)
+                    details.append(
+                        {
+                            "metric": metric.slug,
+                            "alias": alias,
+                            "status": STATUS_LABELS[UNKNOWN],
+                            "error": str(result).strip(),
+                        }
+                    )
+                    continue
+                if not result.holds_data:
+                    continue
+                result.styles = metric.get_styles(result.records)
+                if tracker is not None:
+                    tracker.update(metric, result)
+                if result.style_counts is not None:
+                    # Summaries only return their first records but count all.
+                    for style, record_status in STYLE_STATUS_MAPPING.items():
+                        if result.style_counts[style]:
+                            counts[record_status] += result.style_counts[style]
+                            status = self.worst_status(status, record_status)
+                for record, record_status in self.get_record_statuses(metric, result):
+                    if result.style_counts is None:
+                        counts[record_status] += 1
+                    status = self.worst_status(status, record_status)
+                    details.append(
+                        {
+                            "metric": metric.slug,
+                            "alias": alias,
+                            "status": STATUS_LABELS[record_status],
+                            "record": dict(
+                                zip((h.name for h in metric.headers), record)
+                            ),
+                        }
+                    )
+
+        summary = (
+            "PGM %s - %d critical, %d warning, %d unknown in %d metrics on %d "
+            "databases | critical=%d warning=%d unknown=%d time=%.3fs"
+            % (
+                STATUS_LABELS[status],
+                counts[CRITICAL],
+                counts[WARNING],
+                counts[UNKNOWN],
+                len(metrics),
+                len(aliases),
+                counts[CRITICAL],
+                counts[WARNING],
+                counts[UNKNOWN],
+                time.monotonic() - start,
+            )
+        )
+        if options["json"]:
+            summary += "\n" + json.dumps(details, cls=DjangoJSONEncoder)
+        self.exit(status, summary)
+
+    def exit(self, status, message):
+        if not message.startswith("PGM "):
+            message = "PGM %s - %s" % (STATUS_LABELS[status], message)
+        self.stdout.write(message)
+        if status != OK:
+            sys.exit(status)
+
+    @staticmethod
+    def get_record_statuses(metric, result):
+        """
+        Yield each record of ``result`` whose record or item styles are
+        ``warning`` or ``critical``, together with the respective status.
+        """
+        record_styles, item_styles = result.styles
+        for record, record_style, record_item_styles in zip(
+            result.records, record_styles, item_styles
+        ):
+            style = worst_style([record_style, *record_item_styles])
+            if style in STYLE_STATUS_MAPPING:
+                yield record, STYLE_STATUS_MAPPING[style]
+
+    @staticmethod
+    def worst_status(*statuses):
+        return max(statuses, key=STATUS_SEVERITY.__getitem__)
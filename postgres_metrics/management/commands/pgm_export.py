@@ -0,0 +1,62 @@
+from django.core.management import CommandError
+from django_rich.management import RichCommand
+from rich.markup import escape
+from rich.text import Text
+
+from postgres_metrics.metrics import (
+    get_data_concurrently,
+    get_metrics_and_aliases,
+)
+from postgres_metrics.snapshots import SNAPSHOT_SUFFIX, write_snapshot
+
+
+class Command(RichCommand):
+    help = (
+        "Export the results of the selected metrics on all databases into a "
+        "snapshot file that can be browsed with pgm_show_metric --snapshot or, if "
+        "the file ends in %s and is stored in the POSTGRES_METRICS_SNAPSHOT_DIR, "
+        "in the Django Admin." % SNAPSHOT_SUFFIX
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="The snapshot file to write.")
+        parser.add_argument(
+            "metrics",
+            nargs="*",
+            metavar="metric",
+            help="The slugs of the metrics to export. Defaults to all metrics.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Only export the given database alias. Can be used multiple times.",
+        )
+        parser.add_argument(
+            "--exact",
+            action="store_true",
+            help="Use the exact but more expensive query if the metric provides one.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            help="Cancel queries running longer than this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            metrics, aliases = get_metrics_and_aliases(
+                options["metrics"], options["databases"], exact=options["exact"]
+            )
+        except ValueError as e:
+            self.console.print(Text("%s!" % e, style="bold red"))
+            raise CommandError(1)
+
+        data = get_data_concurrently(
+            metrics, aliases, statement_timeout=options["timeout"]
+        )
+        write_snapshot(options["file"], data, aliases)
+        self.console.print(
+            "Exported %d metrics from %d databases to %s"
+            % (len(metrics), len(aliases), escape(options["file"]))
+        )
@@ -0,0 +1,60 @@
+import os
+
+from django.core.management import CommandError
+from django.db import connections
+from django_rich.management import RichCommand
+from rich.markup import escape
+from rich.text import Text
+
+from postgres_metrics import replay
+from postgres_metrics.metrics import get_metrics_and_aliases
+
+
+class Command(RichCommand):
+    help = (
+        "Record the results of the selected metrics on all databases into fixture "
+        "files that can be replayed with the postgres_metrics.backends.replay "
+        "database backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "directory", help="The directory to write one fixture per database to."
+        )
+        parser.add_argument(
+            "metrics",
+            nargs="*",
+            metavar="metric",
+            help="The slugs of the metrics to record. Defaults to all metrics.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            help="Only record the given database alias. Can be used multiple times.",
+        )
+        parser.add_argument(
+            "--compress",
+            action="store_true",
+            help="Compress the fixtures with gzip.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            metrics, aliases = get_metrics_and_aliases(
+                options["metrics"], options["databases"]
+            )
+        except ValueError as e:
+            self.console.print(Text("%s!" % e, style="bold red"))
+            raise CommandError(1)
+
+        os.makedirs(options["directory"], exist_ok=True)
+        extension = ".json.gz" if options["compress"] else ".json"
+        for alias in aliases:
+            fixture = replay.record(metrics, connections[alias])
+            path = os.path.join(options["directory"], alias + extension)
+            replay.dump(fixture, path)
+            self.console.print(
+                "Recorded %d queries from %s to %s"
+                % (len(fixture["queries"]), escape(alias), escape(path))
+            )
@@ -1,10 +1,15 @@
+import time
+
 from django.core.management import CommandError
 from django_rich.management import RichCommand
 from rich.markup import escape
 from rich.table import Table
 from rich.text import Text
 
+from postgres_metrics.deltas import DeltaTracker
 from postgres_metrics.metrics import registry as metrics_registry
+from postgres_metrics.snapshots import Snapshot
+from postgres_metrics.timing import format_duration
 
 RICH_STYLE_MAPPING = {
     "ok": "green",
@@ -19,36 +24,109 @@ class Command(RichCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("metric", help="The metric's slug")
+        parser.add_argument(
+            "--exact",
+            action="store_true",
+            help="Use the exact but more expensive query if the metric provides one.",
+        )
+        parser.add_argument(
+            "--delta",
+            type=float,
+            metavar="SECONDS",
+            help="Show how the metric's counters changed over the given number of "
+            "seconds instead of their totals.",
+        )
+        parser.add_argument(
+            "--snapshot",
+            metavar="FILE",
+            help="Show the results from a snapshot file written by pgm_export "
+            "instead of querying the databases.",
+        )
 
     def handle(self, *args, **options):
         name = options["metric"]
         try:
-            metric = metrics_registry[name]()
+            metric = metrics_registry[name](exact=options["exact"])
         except KeyError:
             self.console.print(Text(f"Metric '{name}' not found!", style="bold red"))
             raise CommandError(1)
 
-        results = metric.get_data()
+        if options["snapshot"]:
+            try:
+                snapshot = Snapshot(options["snapshot"])
+            except (OSError, ValueError) as e:
+                self.console.print(Text(str(e), style="bold red"))
+                raise CommandError(1)
+            with snapshot:
+                if name not in snapshot.metrics:
+                    self.console.print(
+                        Text(
+                            f"Metric '{name}' not found in the snapshot!",
+                            style="bold red",
+                        )
+                    )
+                    raise CommandError(1)
+                description = snapshot.metrics[name]
+                metric = type(metric)(exact=description["exact"])
+                if metric.header_labels is None:
+                    metric.header_labels = description["header_labels"]
+                results = snapshot.get_results(name, metric.column_formatters)
+                self.print_results(
+                    metric, results, f"snapshot taken at {snapshot.created}"
+                )
+        elif options["delta"] is not None:
+            if not metric.counter_columns:
+                self.console.print(
+                    Text(f"Metric '{name}' has no counters!", style="bold red")
+                )
+                raise CommandError(1)
+            tracker = DeltaTracker()
+            for result in metric.get_data():
+                tracker.update(metric, result)
+            time.sleep(options["delta"])
+            results = metric.get_data()
+            for result in results:
+                tracker.update(metric, result)
+            if metric.counters_per_second:
+                note = "changes per second over %g seconds" % options["delta"]
+            else:
+                note = "changes over %g seconds" % options["delta"]
+            self.print_results(metric, results, note)
+        else:
+            self.print_results(metric, metric.get_data())
+
+    def print_results(self, metric, results, note=None):
         for result in results:
             if result.holds_data:
+                title = f"{escape(result.alias)} ({escape(result.dsn)})"
+                if metric.estimated:
+                    title += " (estimated)"
+                captions = [note] if note else []
+                if result.timing is not None:
+                    captions.append(
+                        "%d rows in %s (%s)"
+                        % (
+                            result.timing.rowcount,
+                            format_duration(result.timing.total),
+                            result.timing,
+                        )
+                    )
                 table = Table(
-                    title=f"{escape(result.alias)} ({escape(result.dsn)})",
+                    title=title,
                     title_style="bold green",
+                    caption=", ".join(captions) or None,
                 )
                 for header in metric.headers:
                     table.add_column(escape(header.name), no_wrap=True)
-                for record in result.records:
+                if result.styles is None:
+                    result.styles = metric.get_styles(result.records)
+                for record_style, items in result.rows:
                     table.add_row(
                         *[
-                            Text(
-                                str(item),
-                                style=RICH_STYLE_MAPPING.get(
-                                    metric.get_record_item_style(record, item, idx)
-                                ),
-                            )
-                            for idx, item in enumerate(record)
+                            Text(str(item), style=RICH_STYLE_MAPPING.get(item_style))
+                            for item_style, item in items
                         ],
-                        style=RICH_STYLE_MAPPING.get(metric.get_record_style(record)),
+                        style=RICH_STYLE_MAPPING.get(record_style),
                     )
                 self.console.print(table)
             else:
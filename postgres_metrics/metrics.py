@@ -1,13 +1,28 @@
+import functools
+import itertools
+import operator
 import re
-
+import sys
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
-from django.db import connections
+from django.db import DatabaseError, connections
 from django.utils.encoding import force_str
 from django.utils.functional import cached_property
 from django.utils.html import escape, urlize
 from django.utils.text import normalize_newlines, slugify
 from django.utils.translation import gettext_lazy as _
 
+from .signals import post_metric_execute, pre_metric_execute
+from .timing import MetricTiming, format_duration, record_timing
+from .tracing import metric_span
+
 try:
     import psycopg  # noqa
 
@@ -16,6 +31,11 @@ except ImportError:
     HAS_PSYCOPG = False
 
 
+#: The query used by :meth:`Metric.get_missing_extensions` to list the
+#: installed extensions.
+EXTENSIONS_SQL = "SELECT extname FROM pg_extension"
+
+
 class MetricRegistry:
     def __init__(self):
         self._registry = {}
@@ -53,6 +73,42 @@ class MetricRegistry:
 
 registry = MetricRegistry()
 
+# (unit, limit, rounded, bits) as used by PostgreSQL's pg_size_pretty()
+SIZE_UNITS = [
+    ("bytes", 10 * 1024, False, 0),
+    ("kB", 20 * 1024 - 1, True, 10),
+    ("MB", 20 * 1024 - 1, True, 20),
+    ("GB", 20 * 1024 - 1, True, 30),
+    ("TB", 20 * 1024 - 1, True, 40),
+    ("PB", 20 * 1024 - 1, True, 50),
+]
+
+
+def format_size(value):
+    """
+    Format a number of bytes into a human readable form the same way
+    PostgreSQL's ``pg_size_pretty()`` does, e.g. ``24576`` as ``'24 kB'``.
+    """
+    size = abs(int(value))
+    sign = "-" if value < 0 else ""
+    for (name, limit, rounded, bits), next_unit in zip(
+        SIZE_UNITS, SIZE_UNITS[1:] + [None]
+    ):
+        if next_unit is None or size < limit:
+            if rounded:
+                size = (size + 1) // 2
+            return "%s%d %s" % (sign if size else "", size, name)
+        size >>= next_unit[3] - bits - next_unit[2] + rounded
+
+
+def format_milliseconds(value):
+    """
+    Format a duration in milliseconds, as reported by many of PostgreSQL's
+    statistics views, into a human readable form, e.g. ``1234.5`` as
+    ``'1.23 s'``.
+    """
+    return format_duration(value / 1000)
+
 
 class MetricHeader:
     """
@@ -130,6 +186,144 @@ class MetricHeader:
         )
 
 
+class DecimalColumn:
+    """
+    Compact storage for a column of :class:`~decimal.Decimal` values sharing
+    the same exponent, such as the result of ``round(..., 2)``. The values are
+    kept as unscaled integers and only turned back into ``Decimal`` instances
+    when accessed.
+    """
+
+    __slots__ = ("values", "exponent")
+
+    def __init__(self, values, exponent):
+        self.values = values
+        self.exponent = exponent
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DecimalColumn(self.values[index], self.exponent)
+        return Decimal(self.values[index]).scaleb(self.exponent)
+
+    def __iter__(self):
+        exponent = self.exponent
+        return (Decimal(value).scaleb(exponent) for value in self.values)
+
+    def __reduce__(self):
+        return DecimalColumn, (self.values, self.exponent)
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Return a :class:`DecimalColumn` for the given ``Decimal`` values, or
+        ``None`` if they cannot be stored compactly.
+        """
+        exponents = {value.as_tuple().exponent for value in values}
+        if len(exponents) != 1:
+            return None
+        exponent = exponents.pop()
+        if not isinstance(exponent, int):  # NaN or Infinity
+            return None
+        try:
+            return cls(array("q", (int(v.scaleb(-exponent)) for v in values)), exponent)
+        except OverflowError:
+            return None
+
+
+def compact_column(values):
+    """
+    Turn a sequence of values from a single column into the most compact
+    representation possible:
+
+    * integers and floats without ``NULL`` values are stored in an
+      :class:`~array.array`,
+    * decimals with the same exponent are stored in a :class:`DecimalColumn`,
+    * strings are interned so that repeated values (e.g. a table name showing
+      up for each of its indexes) are only stored once.
+
+    Any other column is stored as a list.
+    """
+    types = {type(value) for value in values}
+    if types == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            pass
+    elif types == {float}:
+        return array("d", values)
+    elif types == {Decimal}:
+        column = DecimalColumn.from_values(values)
+        if column is not None:
+            return column
+    elif types <= {str, type(None)}:
+        return [value if value is None else sys.intern(value) for value in values]
+    return list(values)
+
+
+class MetricRecords:
+    """
+    A column-oriented, memory efficient container for the rows returned by a
+    metric. See :func:`compact_column` for how each column is stored.
+
+    It behaves like a read-only list of tuples: it can be iterated over,
+    indexed, sliced, and compared to a list of tuples.
+    """
+
+    __slots__ = ("columns", "length")
+
+    def __init__(self, records=(), columns=None):
+        if columns is None:
+            records = list(records)
+            columns = [compact_column(column) for column in zip(*records)]
+            self.length = len(records)
+        else:
+            self.length = len(columns[0]) if columns else 0
+        self.columns = columns
+
+    def __repr__(self):
+        return "<MetricRecords: %d rows, %d columns>" % (
+            self.length,
+            len(self.columns),
+        )
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return zip(*self.columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MetricRecords(columns=[column[index] for column in self.columns])
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("record index out of range")
+        return tuple(column[index] for column in self.columns)
+
+    def __eq__(self, other):
+        if isinstance(other, (MetricRecords, list, tuple)):
+            return len(self) == len(other) and all(
+                a == tuple(b) for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __reduce__(self):
+        return MetricRecords, ((), self.columns)
+
+    def column(self, index):
+        """
+        Return all values of the zero-indexed column ``index``. Without any
+        records, that's an empty list for any column.
+        """
+        if not self.length:
+            return []
+        return self.columns[index]
+
+
 class MetricResult:
     """
     Hold a metric's data for a single database.
@@ -147,19 +341,108 @@ class MetricResult:
 
     .. attribute:: records
 
-       The rows returned by a metric for the given database.
+       The rows returned by a metric for the given database, stored as
+       :class:`MetricRecords`. The values are the raw values as returned by
+       the database.
+
+    .. attribute:: formatters
+
+       A mapping of zero-indexed column positions to callables turning a raw
+       value into its human readable form. See
+       :attr:`Metric.column_formatters`.
+
+    .. attribute:: styles
+
+       ``None`` or the 2-tuple of record styles and item styles as returned by
+       :meth:`Metric.get_styles` for the :attr:`records`.
+
+    .. attribute:: timing
+
+       ``None`` or a :class:`~postgres_metrics.timing.MetricTiming` with how
+       long it took to get the :attr:`records`.
+
+    .. attribute:: total
+
+       The total number of records found. More than the number of
+       :attr:`records` if a :attr:`Metric.summary_sql` built by
+       :func:`get_summary_sql` only returned the first of them.
+
+    .. attribute:: style_counts
+
+       ``None`` or a dictionary with the total numbers of ``"critical"`` and
+       ``"warning"`` records, as counted by a :attr:`Metric.summary_sql`
+       built by :func:`get_summary_sql`.
     """
 
+    __slots__ = (
+        "alias",
+        "dsn",
+        "records",
+        "formatters",
+        "styles",
+        "timing",
+        "total",
+        "style_counts",
+    )
+
     holds_data = True
 
-    def __init__(self, connection, records):
+    def __init__(
+        self,
+        connection,
+        records,
+        formatters=None,
+        timing=None,
+        total=None,
+        style_counts=None,
+    ):
         connection.ensure_connection()
         self.alias = connection.alias
         if HAS_PSYCOPG:
             self.dsn = connection.connection.info.dsn
         else:
             self.dsn = connection.connection.dsn
+        if not isinstance(records, MetricRecords):
+            records = MetricRecords(records)
         self.records = records
+        self.formatters = formatters or {}
+        self.styles = None
+        self.timing = timing
+        self.total = len(records) if total is None else total
+        self.style_counts = style_counts
+
+    @property
+    def rows(self):
+        """
+        Iterate over all :attr:`records` ready for display. Each row is a
+        2-tuple of the record's style and a list of ``(style, value)`` pairs,
+        one per item in the record. The styles are taken from :attr:`styles`.
+
+        Formatting happens lazily, one record at a time, so the cost is only
+        paid for the records actually shown. ``None`` values are never
+        formatted.
+        """
+        if not self.records:
+            return
+        width = len(self.records.columns)
+        if self.styles is None:
+            record_styles = itertools.repeat("")
+            item_styles = itertools.repeat(("",) * width)
+        else:
+            record_styles, item_styles = self.styles
+        formatters = [self.formatters.get(index) for index in range(width)]
+        for record, record_style, record_item_styles in zip(
+            self.records, record_styles, item_styles
+        ):
+            yield record_style, [
+                (
+                    item_style,
+                    item if formatter is None or item is None else formatter(item),
+                )
+                for formatter, item_style, item in zip(
+                    formatters, record_item_styles, record
+                )
+            ]
 
 
 class NoMetricResult(MetricResult):
@@ -168,6 +451,8 @@ class NoMetricResult(MetricResult):
     not available.
     """
 
+    __slots__ = ("reason",)
+
     holds_data = False
 
     def __init__(self, connection, reason):
@@ -175,6 +460,328 @@ class NoMetricResult(MetricResult):
         self.reason = reason
 
 
+#: The styles a record or item can have, ordered by increasing severity.
+STYLE_SEVERITY = {None: 0, "": 0, "ok": 1, "info": 2, "warning": 3, "critical": 4}
+
+
+def worst_style(styles):
+    """
+    Return the most severe of the given styles according to
+    :data:`STYLE_SEVERITY`, or ``None`` if there are no styles.
+    """
+    return max(styles, key=STYLE_SEVERITY.__getitem__, default=None)
+
+
+def get_column(records, index):
+    """
+    Return all values of the zero-indexed column ``index`` of ``records``,
+    which may be a :class:`MetricRecords` instance or a list of tuples.
+    """
+    if isinstance(records, MetricRecords):
+        return records.column(index)
+    return [record[index] for record in records]
+
+
+class Threshold:
+    """
+    A declarative rule to style a record, or a single item of a record, based
+    on the value in one of its columns::
+
+       # Mark a record as critical if column 5 is >= 75, as warning if it is
+       # >= 50, and as ok otherwise.
+       Threshold(5, warning=50, critical=75)
+
+       # Only style records with at least 10000 rows in column 2.
+       Threshold(1, "<", warning=99, critical=95, guard=(2, ">=", 10000))
+
+    Columns are zero-indexed. ``None`` values are never styled, nor are records
+    for which the ``guard`` doesn't hold. If ``cast`` is given, values are
+    passed through it before being compared, and values it cannot convert
+    aren't styled either. With ``item=True`` only the item in ``column`` is
+    styled instead of the entire record.
+
+    When tracking style changes over time (see
+    :class:`~postgres_metrics.tracking.StyleTracker`), a ``hysteresis`` margin
+    prevents values hovering around a level from flapping: a record only
+    leaves a style once its value is past the level by more than the margin.
+
+    The rule is compiled once into a predicate that is evaluated for an entire
+    column at a time by :meth:`get_styles`.
+    """
+
+    COMPARATORS = {
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge,
+    }
+
+    def __init__(
+        self,
+        column,
+        comparator=">=",
+        *,
+        warning=None,
+        critical=None,
+        guard=None,
+        item=False,
+        cast=None,
+        hysteresis=0,
+    ):
+        if comparator not in self.COMPARATORS:
+            raise ImproperlyConfigured(
+                'Invalid threshold comparator "%s". Use one of %s.'
+                % (comparator, ", ".join(self.COMPARATORS))
+            )
+        if guard is not None and guard[1] not in self.COMPARATORS:
+            raise ImproperlyConfigured(
+                'Invalid threshold guard comparator "%s". Use one of %s.'
+                % (guard[1], ", ".join(self.COMPARATORS))
+            )
+        self.column = column
+        self.comparator = comparator
+        self.warning = warning
+        self.critical = critical
+        self.guard = guard
+        self.item = item
+        self.cast = cast
+        self.hysteresis = hysteresis
+        self._predicate = self._compile()
+
+    def __repr__(self):
+        return "<Threshold column=%d %s warning=%r critical=%r>" % (
+            self.column,
+            self.comparator,
+            self.warning,
+            self.critical,
+        )
+
+    def _compile(self):
+        compare = self.COMPARATORS[self.comparator]
+        levels = [
+            (level, style)
+            for level, style in ((self.critical, "critical"), (self.warning, "warning"))
+            if level is not None
+        ]
+        cast = self.cast
+
+        def predicate(value):
+            if value is None:
+                return None
+            if cast is not None:
+                try:
+                    value = cast(value)
+                except (TypeError, ValueError):
+                    return None
+            for level, style in levels:
+                if compare(value, level):
+                    return style
+            return "ok"
+
+        return predicate
+
+    def _guard_holds(self, value):
+        column, comparator, level = self.guard
+        return value is not None and self.COMPARATORS[comparator](value, level)
+
+    def get_style(self, record, previous=None):
+        """
+        Return the style for a single ``record``. If the ``previous`` style of
+        the record is given, the :attr:`hysteresis` is taken into account.
+        """
+        if self.guard is not None and not self._guard_holds(record[self.guard[0]]):
+            return None
+        if not self.hysteresis or STYLE_SEVERITY[previous] < STYLE_SEVERITY["warning"]:
+            return self._predicate(record[self.column])
+
+        value = record[self.column]
+        if value is None:
+            return None
+        if self.cast is not None:
+            try:
+                value = self.cast(value)
+            except (TypeError, ValueError):
+                return None
+        compare = self.COMPARATORS[self.comparator]
+        margin = self.hysteresis if self.comparator in ("<", "<=") else -self.hysteresis
+        for level, style in ((self.critical, "critical"), (self.warning, "warning")):
+            if level is None:
+                continue
+            if STYLE_SEVERITY[previous] >= STYLE_SEVERITY[style]:
+                level += margin
+            if compare(value, level):
+                return style
+        return "ok"
+
+    def get_severity_sql(self):
+        """
+        Return an SQL expression that is ``2`` for records this threshold
+        marks as critical, ``1`` for warning, and ``0`` otherwise, to sort the
+        most severe records first in a :func:`get_summary_sql` query. The
+        columns are referenced as ``c1``, ``c2``, etc. The ``cast`` isn't
+        applied.
+        """
+        column = "c%d" % (self.column + 1)
+        cases = []
+        if self.guard is not None:
+            guard_column, comparator, level = self.guard
+            cases.append(
+                "WHEN (c%d %s %s) IS NOT TRUE THEN 0"
+                % (guard_column + 1, comparator, level)
+            )
+        for level, severity in ((self.critical, 2), (self.warning, 1)):
+            if level is not None:
+                cases.append(
+                    "WHEN %s %s %s THEN %d" % (column, self.comparator, level, severity)
+                )
+        return "CASE %s ELSE 0 END" % " ".join(cases)
+
+    def get_styles(self, records):
+        """Return a list with the style for each of the ``records``."""
+        styles = list(map(self._predicate, get_column(records, self.column)))
+        if self.guard is not None:
+            guard_holds = self._guard_holds
+            styles = [
+                style if guard_holds(value) else None
+                for style, value in zip(styles, get_column(records, self.guard[0]))
+            ]
+        return styles
+
+
+@contextmanager
+def local_statement_timeout(connection, seconds):
+    """
+    Execute the block in a transaction on the given connection with a
+    ``statement_timeout`` of ``seconds`` that is reset at the end of the
+    transaction. If the connection is already in a transaction, the timeout
+    applies until the end of that transaction.
+    """
+    autocommit = connection.get_autocommit()
+    if autocommit:
+        connection.set_autocommit(False)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s, true)",
+                ["%dms" % (seconds * 1000)],
+            )
+        yield
+    except Exception:
+        if autocommit:
+            connection.rollback()
+        raise
+    else:
+        if autocommit:
+            connection.commit()
+    finally:
+        if autocommit:
+            connection.set_autocommit(True)
+
+
+def format_sql(sql, pg_version, order_by):
+    """
+    Return the query ``sql``, or the one for the PostgreSQL ``pg_version``
+    (the newest one if ``None``) if it maps versions to queries, formatted with
+    the ``order_by`` clause, or ``None`` if no query applies to the version.
+    """
+    if isinstance(sql, dict):
+        versions = [v for v in sql if pg_version is None or v <= pg_version]
+        if not versions:
+            return None
+        sql = sql[max(versions)]
+    return sql.format(ORDER_BY=order_by)
+
+
+#: The number of queries :func:`compile_sql` keeps. The ordering is chosen
+#: by the users, so the cache must not grow with every ordering requested.
+COMPILE_SQL_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=COMPILE_SQL_CACHE_SIZE)
+def compile_sql(metric_class, attribute, pg_version, order_by):
+    """
+    Return the query in the ``attribute`` of ``metric_class`` formatted by
+    :func:`format_sql`.
+
+    The result is cached, so each query is only picked and formatted once per
+    metric class, PostgreSQL version and ordering, for the
+    :data:`COMPILE_SQL_CACHE_SIZE` most recently used ones.
+    """
+    return format_sql(getattr(metric_class, attribute), pg_version, order_by)
+
+
+#: The names of the last columns of the queries built by
+#: :func:`get_summary_sql`, holding the total number of records and the
+#: numbers of records marked as critical and warning.
+SUMMARY_COLUMNS = ("total_records", "critical_records", "warning_records")
+
+
+def get_summary_sql(sql, columns, order_by, *, thresholds=(), severity=None, limit=10):
+    """
+    Build a :attr:`Metric.summary_sql` from a metric's :attr:`Metric.sql`
+    returning ``columns`` columns: only the first ``limit`` records sorted by
+    ``order_by`` are returned. The columns are available as ``c1``, ``c2``,
+    etc. in ``order_by``, e.g. ``"c3 DESC"``, unless ``columns`` is a sequence
+    of column names.
+
+    Records that any of the ``thresholds`` marks as critical or warning are
+    sorted first. For metrics styling their records otherwise, pass a
+    ``severity`` SQL expression that is ``2`` for critical records, ``1`` for
+    warning and ``0`` otherwise, e.g. as returned by
+    :meth:`Threshold.get_severity_sql`.
+
+    The total number of records and the numbers of critical and warning
+    records are returned in the additional :data:`SUMMARY_COLUMNS`, which
+    :meth:`Metric.get_result` turns into :attr:`MetricResult.total` and
+    :attr:`MetricResult.style_counts`.
+    """
+    if isinstance(sql, dict):
+        return {
+            version: get_summary_sql(
+                query,
+                columns,
+                order_by,
+                thresholds=thresholds,
+                severity=severity,
+                limit=limit,
+            )
+            for version, query in sql.items()
+        }
+    severities = [threshold.get_severity_sql() for threshold in thresholds]
+    if severity is not None:
+        severities.append(severity)
+    if isinstance(columns, int):
+        columns = ["c%d" % column for column in range(1, columns + 1)]
+    return """
+        SELECT
+            %s,
+            count(*) OVER () AS %s,
+            count(*) FILTER (WHERE severity = 2) OVER () AS %s,
+            count(*) FILTER (WHERE severity = 1) OVER () AS %s
+        FROM (
+            SELECT
+                *,
+                %s AS severity
+            FROM (
+                %s
+            ) AS records (%s)
+        ) AS records
+        ORDER BY
+            severity DESC,
+            %s
+        LIMIT %d
+        ;
+    """ % (
+        ", ".join(columns),
+        *SUMMARY_COLUMNS,
+        "greatest(%s)" % ", ".join(severities) if severities else "0",
+        sql.replace("{ORDER_BY}", "").strip().rstrip(";"),
+        ", ".join(columns),
+        order_by,
+        limit,
+    )
+
+
 class MetricMeta(type):
     def __new__(mcs, name, bases, attrs):
         if bases:
@@ -186,6 +793,17 @@ class MetricMeta(type):
             if not attrs.get("sql"):
                 msg = 'Metric "%s" is missing a "sql" attribute or "sql" is empty.'
                 raise ImproperlyConfigured(msg % name)
+            for attr in ("sql", "exact_sql", "summary_sql"):
+                variants = attrs.get(attr)
+                if isinstance(variants, dict) and not all(
+                    isinstance(version, int) and isinstance(sql, str) and sql
+                    for version, sql in variants.items()
+                ):
+                    msg = (
+                        'Metric "%s" must map PostgreSQL versions to non-empty '
+                        'SQL strings in "%s".'
+                    )
+                    raise ImproperlyConfigured(msg % (name, attr))
 
             docstring = attrs.get("__doc__")
             if docstring and docstring.strip():
@@ -205,7 +823,13 @@ class MetricMeta(type):
             )
             attrs["permission_key"] = "postgres_metrics.%s" % attrs["permission_name"]
 
-        return super().__new__(mcs, name, bases, attrs)
+        cls = super().__new__(mcs, name, bases, attrs)
+        cls._record_thresholds = [t for t in cls.thresholds if not t.item]
+        cls._item_thresholds = {}
+        for threshold in cls.thresholds:
+            if threshold.item:
+                cls._item_thresholds.setdefault(threshold.column, []).append(threshold)
+        return cls
 
 
 class Metric(metaclass=MetricMeta):
@@ -254,15 +878,59 @@ class Metric(metaclass=MetricMeta):
        ``urlize()`` method to create ``<a></a>`` HTML tags around links.
     """
 
+    #: A mapping of zero-indexed column positions to callables, each turning
+    #: a raw value of that column into its human readable form, e.g.
+    #: ``{1: format_size}``. This allows the :attr:`sql` to return raw values
+    #: (e.g. a number of bytes) that can be sorted and exported as such, while
+    #: only formatting the values that are actually displayed.
+    column_formatters = {}
+
+    #: The zero-indexed columns holding cumulative counters, such as the
+    #: number of calls of a statement since the statistics were reset. When
+    #: showing the changes since a previous sample (see
+    #: :class:`~postgres_metrics.deltas.DeltaTracker`), these columns hold
+    #: the difference to the previous sample of the same record as identified
+    #: by :attr:`identity_columns`.
+    counter_columns = ()
+
+    #: Whether the changes of the :attr:`counter_columns` since the previous
+    #: sample are shown per second rather than in total. Useful for counters
+    #: that are only meaningful as rates, such as the number of bytes written.
+    counters_per_second = False
+
+    #: The zero-indexed columns identifying a record across executions of the
+    #: metric, e.g. ``(0, 1)`` for a table and index name. Used to track how
+    #: the style of a record changes over time. By default, all records of a
+    #: database are treated as one.
+    identity_columns = ()
+
     #: A list of strings used as column headers in the admin. Consider making
     #: the strings translateable. If the attribute is undefined, the column
     #: names returned by the database will be used.
     header_labels = None
 
+    #: An optional, more expensive variant of :attr:`sql` returning exact
+    #: values where :attr:`sql` only returns estimates. If defined, the metric
+    #: is considered :attr:`estimated` unless it is instantiated with
+    #: ``exact=True``. The same rules as for :attr:`sql` apply, including
+    #: mapping PostgreSQL versions to queries.
+    exact_sql = ""
+
+    #: The names of the extensions that need to be installed in a database in
+    #: addition to the :attr:`required_extensions` to provide the
+    #: :attr:`exact_sql`, e.g. ``["pgstattuple"]``.
+    exact_required_extensions = ()
+
     #: The label is what is used in the Django Admin views. Consider making
     #: this string translateable.
     label = ""
 
+    #: The maximum number of records to fetch, e.g. ``100`` to only show the
+    #: top 100 statements. The ``LIMIT`` is part of the ``{ORDER_BY}`` clause
+    #: (see :meth:`get_order_by_clause`), so it only applies if the records
+    #: are sorted.
+    limit = None
+
     #: The maximum PostgreSQL version possible to provide the metric data.
     #: If not explicitly specified, every PostgreSQL version is suitable. This
     # value is checked against
@@ -280,17 +948,55 @@ class Metric(metaclass=MetricMeta):
     #: :attr:`parsed_ordering`.
     ordering = ""
 
+    #: Whether the metric is shown on the overview dashboard. Set it to
+    #: ``False`` for metrics another metric summarizes there.
+    overview = True
+
+    #: The names of the extensions that need to be installed in a database
+    #: to provide the metric data, e.g. ``["pg_stat_statements"]``. On other
+    #: databases, the metric isn't executed.
+    required_extensions = ()
+
     #: A URL safe representation of the label and unique across all metrics.
     slug = ""
 
+    #: The number of seconds after which the query is canceled, e.g. ``2`` for
+    #: metrics that are looked at when the database is under stress. The query
+    #: is then executed in a transaction with a local ``statement_timeout``,
+    #: which overrides the timeout passed to :func:`get_data_concurrently`.
+    statement_timeout = None
+
+    #: A list of :class:`Threshold` instances used to style the records and
+    #: items of this metric by default. See :meth:`get_record_style`,
+    #: :meth:`get_record_item_style`, and :meth:`get_styles`.
+    thresholds = []
+
+    #: An optional, cheaper variant of :attr:`sql` used for the overview
+    #: dashboard when the metric is instantiated with ``summary=True``. It
+    #: must return the same columns as :attr:`sql` but may limit the records
+    #: to those worth looking at, e.g. the top 10 or those exceeding a
+    #: threshold. As it's executed as is, it doesn't need to include the
+    #: ``{ORDER_BY}`` placeholder. Use :func:`get_summary_sql` to return the
+    #: most severe records first along with the total number of records.
+    summary_sql = ""
+
     #: The actual SQL statement that is being used to query the database. In
     #: order to make use of the :attr:`ordering`, include the string
     #: ``{ORDER_BY}`` in the query as necessary. For details on that value see
     #: :meth:`get_order_by_clause`.
+    #:
+    #: To use different queries on different PostgreSQL versions, e.g. to
+    #: use catalog views that only exist on newer versions, map the minimum
+    #: version of each query to the query instead, e.g.
+    #: ``{100000: "...", 170000: "..."}``. The query with the highest version
+    #: not above the database's version is used; the metric isn't supported
+    #: on databases older than the lowest version.
     sql = ""
 
-    def __init__(self, ordering=None):
+    def __init__(self, ordering=None, exact=False, summary=False):
         self.ordering = ordering or self.ordering
+        self.exact = bool(exact and self.exact_sql)
+        self.summary = bool(summary and self.summary_sql and not self.exact)
 
     def __repr__(self):
         return '<Metric "%s">' % self.label
@@ -312,12 +1018,78 @@ class Metric(metaclass=MetricMeta):
         """
         return user.is_superuser or user.is_staff and user.has_perm(cls.permission_key)
 
+    @property
+    def estimated(self):
+        """
+        ``True`` if the metric has an :attr:`exact_sql` variant but the
+        cheaper, estimating :attr:`sql` is used.
+        """
+        return bool(self.exact_sql) and not self.exact
+
+    @property
+    def sql_attribute(self):
+        """
+        The name of the attribute holding the query to execute: ``"sql"``,
+        ``"exact_sql"`` or ``"summary_sql"``.
+        """
+        if self.exact:
+            return "exact_sql"
+        if self.summary:
+            return "summary_sql"
+        return "sql"
+
     @cached_property
     def full_sql(self):
         """
-        The :attr:`sql` formatted with :meth:`get_order_by_clause`.
+        The :attr:`sql` (or :attr:`exact_sql` or :attr:`summary_sql` when
+        requested) formatted with :meth:`get_order_by_clause`. If the query
+        depends on the PostgreSQL version, the one for the newest version.
+        """
+        return self._compile_sql(None)
+
+    def _compile_sql(self, pg_version):
+        # Queries assigned to the instance override the ones of the class but
+        # aren't cached by compile_sql(), which is keyed by the class.
+        attribute = self.sql_attribute
+        if attribute in vars(self):
+            return format_sql(
+                vars(self)[attribute], pg_version, self.get_order_by_clause()
+            )
+        return compile_sql(
+            type(self), attribute, pg_version, self.get_order_by_clause()
+        )
+
+    def get_full_sql(self, connection):
+        """
+        Return the SQL to execute on the given PostgreSQL database connection,
+        picked by ``connection.pg_version`` if the query depends on the
+        PostgreSQL version, or ``None`` if no query applies to the version.
+
+        Override this method to pick a query depending on something else.
+        """
+        return self._compile_sql(connection.pg_version)
+
+    def get_required_extensions(self):
+        """
+        Return the :attr:`required_extensions` and, if the :attr:`exact_sql`
+        is used, the :attr:`exact_required_extensions`.
+        """
+        if self.exact:
+            return [*self.required_extensions, *self.exact_required_extensions]
+        return list(self.required_extensions)
+
+    def get_missing_extensions(self, connection):
+        """
+        Return the extensions returned by :meth:`get_required_extensions` that
+        aren't installed in the database behind the given connection.
         """
-        return self.sql.format(ORDER_BY=self.get_order_by_clause())
+        required_extensions = self.get_required_extensions()
+        if not required_extensions:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(EXTENSIONS_SQL)
+            installed = {name for name, in cursor.fetchall()}
+        return [name for name in required_extensions if name not in installed]
 
     def get_data(self):
         """
@@ -327,30 +1099,101 @@ class Metric(metaclass=MetricMeta):
         :return: Returns a list of :class:`MetricResult` instances.
         :rtype: list
         """
-        results = []
-        for connection in connections.all():
-            if connection.vendor != "postgresql":
-                continue
-            if (
-                self.min_pg_version is None
-                or connection.pg_version >= self.min_pg_version
-            ) and (
-                self.max_pg_version is None
-                or connection.pg_version <= self.max_pg_version
-            ):
-                with connection.cursor() as cursor:
-                    cursor.execute(self.full_sql)
-                    if self.header_labels is None:
-                        self.header_labels = [c.name for c in cursor.description]
+        return [
+            self.get_result(connection)
+            for connection in connections.all()
+            if connection.vendor == "postgresql"
+        ]
+
+    def get_result(self, connection):
+        """
+        Execute the SQL returned by :meth:`get_full_sql` on the given
+        PostgreSQL database connection.
+
+        The time spent connecting, executing the query and fetching the rows is
+        recorded in :attr:`MetricResult.timing` and passed on to
+        :func:`~postgres_metrics.timing.record_timing`.
+
+        The :data:`~postgres_metrics.signals.pre_metric_execute` and
+        :data:`~postgres_metrics.signals.post_metric_execute` signals are sent
+        before and after the query, and the query is wrapped in an
+        OpenTelemetry span if OpenTelemetry is installed.
+
+        :return: Returns a :class:`MetricResult`, or a :class:`NoMetricResult`
+            if the metric isn't supported by the database or one of the
+            :attr:`required_extensions` isn't installed.
+        """
+        sql = None
+        if (
+            self.min_pg_version is None or connection.pg_version >= self.min_pg_version
+        ) and (
+            self.max_pg_version is None or connection.pg_version <= self.max_pg_version
+        ):
+            sql = self.get_full_sql(connection)
+        if sql is None:
+            return NoMetricResult(
+                connection,
+                "This metric is not supported on this PostgreSQL version.",
+            )
+        missing_extensions = self.get_missing_extensions(connection)
+        if missing_extensions:
+            return NoMetricResult(
+                connection,
+                "This metric requires the %s extension."
+                % ", ".join(missing_extensions),
+            )
+        signal_kwargs = {"metric": self, "alias": connection.alias, "sql": sql}
+        pre_metric_execute.send(sender=type(self), **signal_kwargs)
+        start = time.perf_counter()
+        try:
+            with metric_span(self, connection, sql) as span:
+                connection.ensure_connection()
+                connected = time.perf_counter()
+                if self.statement_timeout is None:
+                    timeout = nullcontext()
+                else:
+                    timeout = local_statement_timeout(
+                        connection, self.statement_timeout
+                    )
+                with timeout, connection.cursor() as cursor:
+                    cursor.execute(sql)
+                    executed = time.perf_counter()
+                    names = [c.name for c in cursor.description]
                     data = cursor.fetchall()
-                db = MetricResult(connection, data)
-            else:
-                db = NoMetricResult(
-                    connection,
-                    "This metric is not supported on this PostgreSQL version.",
-                )
-            results.append(db)
-        return results
+                    fetched = time.perf_counter()
+                total = style_counts = None
+                if tuple(names[-3:]) == SUMMARY_COLUMNS:
+                    total, critical, warning = data[0][-3:] if data else (0, 0, 0)
+                    style_counts = {"critical": critical, "warning": warning}
+                    data = [row[:-3] for row in data]
+                    del names[-3:]
+                if self.header_labels is None:
+                    self.header_labels = names
+                if span is not None:
+                    span.set_attribute("db.response.returned_rows", len(data))
+        except Exception as e:
+            post_metric_execute.send(
+                sender=type(self),
+                duration=time.perf_counter() - start,
+                rowcount=None,
+                error=e,
+                **signal_kwargs,
+            )
+            raise
+        timing = MetricTiming(
+            connected - start, executed - connected, fetched - executed, len(data)
+        )
+        record_timing(self, connection.alias, timing)
+        post_metric_execute.send(
+            sender=type(self),
+            duration=timing.total,
+            rowcount=timing.rowcount,
+            error=None,
+            **signal_kwargs,
+        )
+        return MetricResult(
+            connection, data, self.column_formatters, timing, total, style_counts
+        )
 
     @cached_property
     def headers(self):
@@ -388,15 +1231,91 @@ class Metric(metaclass=MetricMeta):
 
         Ensures that each column (excluding the ``-`` prefix) is an integer by
         calling ``int()`` on it.
+
+        If the metric has a :attr:`limit`, ``LIMIT 100`` or the like is
+        appended, so the limit always applies to the sorted records.
         """
         if self.parsed_ordering:
             ordering = [
                 ("%d DESC" if direction == "-" else "%d ASC") % column
                 for direction, column in self.parsed_ordering
             ]
-            return "ORDER BY " + ", ".join(ordering)
+            clause = "ORDER BY " + ", ".join(ordering)
+            if self.limit is not None:
+                clause += " LIMIT %d" % self.limit
+            return clause
         return ""
 
+    def get_styles(self, records):
+        """
+        Compute the styles for all ``records`` of a :class:`MetricResult` in a
+        single pass, so they don't need to be computed while rendering.
+
+        Returns a 2-tuple of a list with the style of each record and a list
+        with a tuple of item styles for each record. By default, the
+        :attr:`thresholds` are evaluated for entire columns at once. If the
+        metric overrides :meth:`get_record_style` or
+        :meth:`get_record_item_style` though, those are called for each record
+        and item instead.
+
+        Override this method to compute the styles for entire columns at once,
+        e.g. by using :meth:`MetricRecords.column`.
+        """
+        num_records = len(records)
+        width = len(records[0]) if num_records else 0
+        metric_class = type(self)
+
+        if metric_class.get_record_style is not Metric.get_record_style:
+            get_record_style = self.get_record_style
+            record_styles = [get_record_style(record) for record in records]
+        elif self._record_thresholds:
+            record_styles = [
+                worst_style(styles)
+                for styles in zip(
+                    *(t.get_styles(records) for t in self._record_thresholds)
+                )
+            ]
+        else:
+            record_styles = [""] * num_records
+
+        if metric_class.get_record_item_style is not Metric.get_record_item_style:
+            get_record_item_style = self.get_record_item_style
+            item_styles = [
+                tuple(
+                    get_record_item_style(record, item, index)
+                    for index, item in enumerate(record)
+                )
+                for record in records
+            ]
+        elif self._item_thresholds:
+            columns = []
+            for index in range(width):
+                thresholds = self._item_thresholds.get(index)
+                if thresholds:
+                    columns.append(
+                        [
+                            worst_style(styles)
+                            for styles in zip(
+                                *(t.get_styles(records) for t in thresholds)
+                            )
+                        ]
+                    )
+                else:
+                    columns.append(itertools.repeat(None))
+            item_styles = list(zip(*columns))
+        else:
+            item_styles = [("",) * width] * num_records
+        return record_styles, item_styles
+
+    def get_delta_record(self, record):
+        """
+        Given a record whose :attr:`counter_columns` hold the changes since the
+        previous sample, return the record to show instead. Override this
+        method to recompute derived columns, such as averages, from the
+        changes.
+        """
+        return record
+
     def get_record_style(self, record):
         """
         Given a single record from :class:`MetricResult`, decide how to style
@@ -413,8 +1332,13 @@ class Metric(metaclass=MetricMeta):
         Override this method and return one of the above strings or ``None``
         to apply the given style to the entire record. In the Django Admin this
         will highlight the entire row.
+
+        By default, the most severe style of all :attr:`thresholds` that apply
+        to the entire record is returned.
         """
-        return ""
+        if not self._record_thresholds:
+            return ""
+        return worst_style(t.get_style(record) for t in self._record_thresholds)
 
     def get_record_item_style(self, record, item, index):
         """
@@ -431,10 +1355,114 @@ class Metric(metaclass=MetricMeta):
         * ``info``
 
         Override this method and return one of the above strings or ``None``
-        to apply the given style to the entire record. In the Django Admin this
-        will highlight the entire row.
+        to apply the given style to the item. In the Django Admin this will
+        highlight the table cell.
+
+        By default, the most severe style of all :attr:`thresholds` with
+        ``item=True`` for the given column is returned.
         """
-        return ""
+        if not self._item_thresholds:
+            return ""
+        return worst_style(
+            t.get_style(record) for t in self._item_thresholds.get(index, ())
+        )
+
+
+def get_postgresql_aliases():
+    """
+    Return the aliases of all configured PostgreSQL databases.
+    """
+    return [
+        connection.alias
+        for connection in connections.all()
+        if connection.vendor == "postgresql"
+    ]
+
+
+def get_metrics_and_aliases(slugs=(), aliases=(), **kwargs):
+    """
+    Instantiate the registered metrics with the given ``slugs``, or all
+    metrics if none are given, passing ``kwargs`` to each, and check the
+    given database ``aliases``, or use all PostgreSQL databases if none are
+    given. Used by the management commands taking metric slugs and
+    ``--database`` options.
+
+    :raises ValueError: Raises an error naming the metric or databases that
+        don't exist.
+    :return: Returns a 2-tuple of the list of metric instances and the list
+        of database aliases.
+    """
+    try:
+        metrics = [
+            registry[slug](**kwargs) for slug in slugs or [m.slug for m in registry]
+        ]
+    except KeyError as e:
+        raise ValueError("Metric '%s' not found" % e.args[0])
+    postgresql_aliases = get_postgresql_aliases()
+    aliases = list(aliases or postgresql_aliases)
+    unknown_aliases = set(aliases) - set(postgresql_aliases)
+    if unknown_aliases:
+        raise ValueError(
+            "Database '%s' not found" % "', '".join(sorted(unknown_aliases))
+        )
+    return metrics, aliases
+
+
+def get_cache():
+    """
+    Return the Django cache configured by the ``POSTGRES_METRICS_CACHE``
+    setting (``"default"`` by default) to keep the overview summaries, the
+    previous samples of counters, and the tracked styles in.
+    """
+    return caches[getattr(settings, "POSTGRES_METRICS_CACHE", "default")]
+
+
+def get_data_concurrently(metrics, aliases=None, statement_timeout=None):
+    """
+    Execute all ``metrics`` (instances of :class:`Metric`) on all PostgreSQL
+    databases, or only those in ``aliases``, concurrently.
+
+    Each database is queried from its own thread with its own connection, which
+    is closed afterwards. The metrics are executed one after another on that
+    connection. If ``statement_timeout`` is given, queries running longer than
+    that many seconds are canceled.
+
+    :return: Returns a dictionary mapping each metric to a list of results,
+        one per database in the order of ``aliases``. Each result is either a
+        :class:`MetricResult` or the :class:`~django.db.DatabaseError` raised
+        while executing the metric.
+    :rtype: dict
+    """
+    if aliases is None:
+        aliases = get_postgresql_aliases()
+
+    def run(alias):
+        connection = connections[alias]
+        results = []
+        try:
+            if statement_timeout is not None:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT set_config('statement_timeout', %s, false)",
+                        ["%dms" % (statement_timeout * 1000)],
+                    )
+            for metric in metrics:
+                try:
+                    results.append(metric.get_result(connection))
+                except DatabaseError as e:
+                    results.append(e)
+        except DatabaseError as e:
+            results.extend(e for _ in range(len(metrics) - len(results)))
+        finally:
+            connection.close()
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(len(aliases), 1)) as executor:
+        per_alias = list(executor.map(run, aliases))
+    return {
+        metric: [results[index] for results in per_alias]
+        for index, metric in enumerate(metrics)
+    }
 
 
 class CacheHits(Metric):
@@ -474,39 +1502,60 @@ class CacheHits(Metric):
         {ORDER_BY}
         ;
     """
-
-    def get_record_item_style(self, record, item, index):
-        if index == 2 and item is not None and item != "N/A":
-            ratio = float(item)
-            if ratio < 0.95:
-                return "critical"
-            if ratio < 0.99:
-                return "warning"
-            return "ok"
+    thresholds = [
+        Threshold(2, "<", warning=0.99, critical=0.95, item=True, cast=float),
+    ]
 
 
 registry.register(CacheHits)
 
 
 class IndexSize(Metric):
+    """
+    The size of each index is estimated from the number of pages PostgreSQL
+    recorded for it in its catalog during the last VACUUM or ANALYZE. Use the
+    exact mode to measure the size of each index on disk instead, which can
+    take a while on databases with many relations.
+    """
+
+    column_formatters = {2: format_size}
     header_labels = [_("Table"), _("Index"), _("Size")]
+    identity_columns = (0, 1)
     label = _("Index Size")
     ordering = "1.2"
     slug = "index-size"
     sql = """
+        SELECT
+            tbl.relname,
+            idx.relname,
+            idx.relpages::bigint * current_setting('block_size')::bigint
+        FROM
+            pg_index
+        INNER JOIN
+            pg_class AS idx
+            ON idx.oid = pg_index.indexrelid
+        INNER JOIN
+            pg_class AS tbl
+            ON tbl.oid = pg_index.indrelid
+        INNER JOIN
+            pg_namespace AS nsp
+            ON nsp.oid = tbl.relnamespace
+        WHERE
+            tbl.relkind IN ('r', 'm', 'p')
+            AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+            AND nsp.nspname !~ '^pg_toast'
+        {ORDER_BY}
+        ;
+    """
+    summary_sql = get_summary_sql(sql, len(header_labels), "c3 DESC")
+    exact_sql = """
         SELECT
             relname,
             indexrelname,
-            pg_size_pretty(index_size)
-        FROM (
-            SELECT
-                relname,
-                indexrelname,
-                pg_relation_size(indexrelid) AS index_size
-            FROM
-                pg_stat_user_indexes
-            {ORDER_BY}
-        ) AS t
+            pg_relation_size(indexrelid)
+        FROM
+            pg_stat_user_indexes
+        {ORDER_BY}
         ;
     """
 
@@ -532,6 +1581,7 @@ class DetailedIndexUsage(Metric):
         _("Index Scan over Sequential Scan"),
         _("Index Scan on table"),
     ]
+    identity_columns = (0, 1)
     label = _("Detailed Index Usage")
     ordering = "1.2"
     slug = "detailed-index-usage"
@@ -562,6 +1612,7 @@ class DetailedIndexUsage(Metric):
         {ORDER_BY}
         ;
     """
+    summary_sql = get_summary_sql(sql, len(header_labels), "c3 ASC, c4 ASC")
 
 
 registry.register(DetailedIndexUsage)
@@ -581,6 +1632,7 @@ class IndexUsage(Metric):
     """
 
     header_labels = [_("Table"), _("Index used (in %)"), _("Num rows")]
+    identity_columns = (0,)
     label = _("Index Usage")
     ordering = "2"
     slug = "index-usage"
@@ -599,17 +1651,12 @@ class IndexUsage(Metric):
         {ORDER_BY}
         ;
     """
-
-    def get_record_style(self, record):
-        if record[2]:
-            usage = record[1]
-            rowcount = record[2]
-            if rowcount >= 10000:
-                if usage < 95.00:
-                    return "critical"
-                if usage < 99.00:
-                    return "warning"
-                return "ok"
+    thresholds = [
+        Threshold(1, "<", warning=99.00, critical=95.00, guard=(2, ">=", 10000)),
+    ]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c3 >= 10000 DESC, c2 ASC", thresholds=thresholds
+    )
 
 
 registry.register(IndexUsage)
@@ -626,10 +1673,24 @@ class TableSize(Metric):
     The "size of * fork" refers to the "main" data fork, the Free Space Map
     (fsm), Visibility Map (vm), and the initialization fork.
 
+    By default, all sizes are estimated from the number of pages PostgreSQL
+    recorded in its catalog during the last VACUUM or ANALYZE. The fsm and vm
+    forks are derived from the size of the main fork and only accounted for
+    once a table has been vacuumed. Use the exact mode to measure every fork
+    on disk instead, which can take a while on databases with many relations.
+
     See also the PostgreSQL documentation on the physical storage:
     https://www.postgresql.org/docs/current/storage.html
     """
 
+    column_formatters = {
+        1: format_size,
+        2: format_size,
+        3: format_size,
+        4: format_size,
+        5: format_size,
+        6: format_size,
+    }
     header_labels = [
         _("Table"),
         _("Total size"),
@@ -639,31 +1700,88 @@ class TableSize(Metric):
         _("Size of 'vm' fork"),
         _("Size of 'init' fork"),
     ]
+    identity_columns = (0,)
     label = _("Table Size")
     ordering = "1"
     slug = "table-size"
     sql = """
-        SELECT
-            relname,
-            pg_size_pretty(total_size),
-            pg_size_pretty(table_size),
-            pg_size_pretty(relation_size_main),
-            pg_size_pretty(relation_size_fsm),
-            pg_size_pretty(relation_size_vm),
-            pg_size_pretty(relation_size_init)
-        FROM (
+        WITH indexes AS (
             SELECT
-                relname,
-                pg_total_relation_size(relid) AS total_size,
-                pg_table_size(relid) AS table_size,
-                pg_relation_size(relid, 'main') AS relation_size_main,
-                pg_relation_size(relid, 'fsm') AS relation_size_fsm,
-                pg_relation_size(relid, 'vm') AS relation_size_vm,
-                pg_relation_size(relid, 'init') AS relation_size_init
+                indrelid,
+                sum(idx.relpages)::bigint AS pages
             FROM
-                pg_stat_user_tables
-            {ORDER_BY}
-        ) AS t
+                pg_index
+            INNER JOIN
+                pg_class AS idx
+                ON idx.oid = pg_index.indexrelid
+            GROUP BY
+                indrelid
+        ), pages AS (
+            SELECT
+                tbl.relname,
+                block.size AS block_size,
+                tbl.relpages::bigint AS main,
+                CASE
+                    WHEN tbl.relallvisible > 0
+                        THEN
+                            2 + ceil(tbl.relpages / (block.size / 2 - 27.0))::bigint
+                    ELSE 0
+                END AS fsm,
+                CASE
+                    WHEN tbl.relallvisible > 0
+                        THEN ceil(tbl.relpages / ((block.size - 24) * 4.0))::bigint
+                    ELSE 0
+                END AS vm,
+                COALESCE(toast.relpages, 0)
+                    + COALESCE(toast_indexes.pages, 0) AS toast,
+                COALESCE(indexes.pages, 0) AS indexes
+            FROM
+                pg_class AS tbl
+            CROSS JOIN
+                (SELECT current_setting('block_size')::bigint AS size) AS block
+            INNER JOIN
+                pg_namespace AS nsp
+                ON nsp.oid = tbl.relnamespace
+            LEFT OUTER JOIN
+                pg_class AS toast
+                ON toast.oid = tbl.reltoastrelid
+            LEFT OUTER JOIN
+                indexes AS toast_indexes
+                ON toast_indexes.indrelid = tbl.reltoastrelid
+            LEFT OUTER JOIN
+                indexes
+                ON indexes.indrelid = tbl.oid
+            WHERE
+                tbl.relkind IN ('r', 'm', 'p')
+                AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND nsp.nspname !~ '^pg_toast'
+        )
+        SELECT
+            relname,
+            (main + fsm + vm + toast + indexes) * block_size,
+            (main + fsm + vm + toast) * block_size,
+            main * block_size,
+            fsm * block_size,
+            vm * block_size,
+            0::bigint
+        FROM
+            pages
+        {ORDER_BY}
+        ;
+    """
+    summary_sql = get_summary_sql(sql, len(header_labels), "c2 DESC")
+    exact_sql = """
+        SELECT
+            relname,
+            pg_total_relation_size(relid),
+            pg_table_size(relid),
+            pg_relation_size(relid, 'main'),
+            pg_relation_size(relid, 'fsm'),
+            pg_relation_size(relid, 'vm'),
+            pg_relation_size(relid, 'init')
+        FROM
+            pg_stat_user_tables
+        {ORDER_BY}
         ;
     """
 
@@ -678,6 +1796,7 @@ class AvailableExtensions(Metric):
     shown below.
     """
 
+    identity_columns = (0,)
     label = _("Available Extensions")
     ordering = "1"
     slug = "available-extensions"
@@ -692,6 +1811,13 @@ class AvailableExtensions(Metric):
         {ORDER_BY}
         ;
     """
+    summary_sql = get_summary_sql(
+        sql,
+        ("name", "default_version", "installed_version", "comment"),
+        "installed_version IS NULL, name",
+        severity="CASE WHEN string_to_array(default_version, '.') "
+        "> string_to_array(installed_version, '.') THEN 1 ELSE 0 END",
+    )
 
     def get_record_style(self, record):
         if record[2]:
@@ -721,6 +1847,7 @@ class SequenceUsage(Metric):
         _("Max value"),
         _("Used (in %)"),
     ]
+    identity_columns = (2,)
     label = _("Sequence Usage")
     min_pg_version = 100000
     ordering = "-6.1.2.3"
@@ -760,14 +1887,1352 @@ class SequenceUsage(Metric):
         {ORDER_BY}
         ;
     """
+    thresholds = [
+        Threshold(5, warning=50.00, critical=75.00),
+    ]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c6 DESC", thresholds=thresholds
+    )
+
+
+registry.register(SequenceUsage)
+
+
+class StatementStatistics(Metric):
+    """
+    The statements that took the most time in total since the statistics of
+    the pg_stat_statements extension were last reset, with the number of
+    calls, the mean execution time, the number of rows returned, and how many
+    blocks were found in the shared buffers (hits), had to be read, or were
+    written to temporary files.
+
+    Only the top 100 statements by the column sorted by first are fetched.
+    When showing the changes since the previous sample, the top 100
+    statements are still chosen by their totals; statements that weren't part
+    of the previous sample show no changes. Neither do statements of other
+    users whose query ID isn't visible.
+
+    Since PostgreSQL 14, statements executed within functions are listed
+    separately from the same statements executed by the client if the
+    pg_stat_statements.track setting is "all".
+
+    The extension must be installed with CREATE EXTENSION and loaded through
+    the shared_preload_libraries setting. To see the statements of other
+    users, the database user needs the pg_read_all_stats role.
+    """
+
+    column_formatters = {
+        5: format_milliseconds,
+        6: format_milliseconds,
+        10: format_size,
+    }
+    counter_columns = (4, 5, 7, 8, 9, 10)
+    header_labels = [
+        _("Query ID"),
+        _("Database"),
+        _("User"),
+        _("Query"),
+        _("Calls"),
+        _("Total time"),
+        _("Mean time"),
+        _("Rows"),
+        _("Shared blocks hit"),
+        _("Shared blocks read"),
+        _("Temporary files written"),
+        _("Top level"),
+    ]
+    identity_columns = (0, 1, 2, 11)
+    label = _("Statement Statistics")
+    limit = 100
+    ordering = "-6"
+    required_extensions = ["pg_stat_statements"]
+    slug = "statement-statistics"
+    sql = """
+        SELECT
+            stmt.queryid,
+            db.datname,
+            usr.rolname,
+            stmt.query,
+            stmt.calls,
+            stmt.total_exec_time,
+            stmt.mean_exec_time,
+            stmt.rows,
+            stmt.shared_blks_hit,
+            stmt.shared_blks_read,
+            stmt.temp_blks_written * current_setting('block_size')::bigint,
+            stmt.toplevel
+        FROM
+            pg_stat_statements AS stmt
+        LEFT OUTER JOIN
+            pg_database AS db
+            ON db.oid = stmt.dbid
+        LEFT OUTER JOIN
+            pg_roles AS usr
+            ON usr.oid = stmt.userid
+        {ORDER_BY}
+        ;
+    """
+    # Before PostgreSQL 14, statements weren't told apart by whether they
+    # were executed at the top level. Before PostgreSQL 13, the execution
+    # times were called total_time and mean_time.
+    sql = {
+        0: sql.replace("_exec_time", "_time").replace("stmt.toplevel", "NULL::boolean"),
+        130000: sql.replace("stmt.toplevel", "NULL::boolean"),
+        140000: sql,
+    }
+
+    def get_delta_record(self, record):
+        record = list(record)
+        if record[0] is None:
+            # Without the pg_read_all_stats role, the statements of other
+            # users share a NULL query ID and can't be told apart.
+            for index in (*self.counter_columns, 6):
+                record[index] = None
+            return tuple(record)
+        calls, total_time = record[4], record[5]
+        record[6] = total_time / calls if calls and total_time is not None else None
+        return tuple(record)
+
+
+registry.register(StatementStatistics)
+
+
+class TableBloat(Metric):
+    """
+    Tables grow "bloated" when rows are updated or deleted faster than VACUUM
+    can make the space of the old row versions available again. A bloated
+    table needs more pages, and thus more I/O and more memory in the cache,
+    for the same number of rows. Unlike growth, bloat only goes away with a
+    VACUUM FULL or a tool like pg_repack.
+
+    The wasted space is estimated from the number of rows and pages and the
+    average width of the columns PostgreSQL recorded during the last ANALYZE,
+    taking the fillfactor into account. Tables that haven't been analyzed yet
+    are left out. The estimate only covers the table itself, not its TOAST
+    table or indexes. A ratio over 30% of at least 10 MB will be marked as
+    yellow, over 50% as red.
+
+    The exact mode scans the tables with pgstattuple_approx() from the
+    pgstattuple extension instead, and counts the dead rows and the free space
+    within each table, including the space reserved by the fillfactor. This
+    reads all pages not marked as all-visible, and requires the database user
+    to have the pg_stat_scan_tables role.
+    """
+
+    column_formatters = {1: format_size, 2: format_size}
+    exact_required_extensions = ["pgstattuple"]
+    header_labels = [_("Table"), _("Size"), _("Wasted"), _("Wasted (in %)")]
+    identity_columns = (0,)
+    label = _("Table Bloat")
+    ordering = "-3"
+    slug = "table-bloat"
+    sql = """
+        WITH widths AS (
+            SELECT
+                tbl.relname,
+                greatest(tbl.reltuples, 0) AS reltuples,
+                tbl.relpages::bigint AS pages,
+                COALESCE(
+                    substring(
+                        array_to_string(tbl.reloptions, ' ')
+                        FROM 'fillfactor=([0-9]+)'
+                    )::int,
+                    100
+                ) AS fillfactor,
+                23 + CASE
+                    WHEN max(COALESCE(stats.null_frac, 0)) > 0
+                        THEN (7 + count(*)) / 8
+                    ELSE 0
+                END AS header_width,
+                sum(
+                    (1 - COALESCE(stats.null_frac, 0)) * COALESCE(stats.avg_width, 0)
+                ) AS data_width,
+                count(stats.attname) = count(*) AS analyzed
+            FROM
+                pg_class AS tbl
+            INNER JOIN
+                pg_namespace AS nsp
+                ON nsp.oid = tbl.relnamespace
+            INNER JOIN
+                pg_attribute AS att
+                ON
+                    att.attrelid = tbl.oid
+                    AND att.attnum > 0
+                    AND NOT att.attisdropped
+            LEFT OUTER JOIN
+                pg_stats AS stats
+                ON
+                    stats.schemaname = nsp.nspname
+                    AND stats.tablename = tbl.relname
+                    AND stats.attname = att.attname
+                    AND NOT stats.inherited
+            WHERE
+                tbl.relkind IN ('r', 'm')
+                AND tbl.relpersistence <> 't'
+                AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND nsp.nspname !~ '^pg_toast'
+            GROUP BY
+                tbl.oid,
+                tbl.relname,
+                tbl.reltuples,
+                tbl.relpages,
+                tbl.reloptions
+        ), pages AS (
+            SELECT
+                relname,
+                block.size AS block_size,
+                pages,
+                ceil(
+                    reltuples
+                    * (4 + ceil(header_width / 8.0) * 8 + ceil(data_width / 8.0) * 8)
+                    / ((block.size - 24) * fillfactor / 100.0)
+                )::bigint AS expected_pages
+            FROM
+                widths
+            CROSS JOIN
+                (SELECT current_setting('block_size')::bigint AS size) AS block
+            WHERE
+                analyzed
+        )
+        SELECT
+            relname,
+            pages * block_size,
+            greatest(pages - expected_pages, 0) * block_size,
+            CASE
+                WHEN pages = 0 THEN round(0.0, 2)
+                ELSE round(100.0 * greatest(pages - expected_pages, 0) / pages, 2)
+            END
+        FROM
+            pages
+        {ORDER_BY}
+        ;
+    """
+    exact_sql = """
+        SELECT
+            tbl.relname,
+            stat.table_len,
+            stat.dead_tuple_len + stat.approx_free_space,
+            CASE
+                WHEN stat.table_len = 0 THEN round(0.0, 2)
+                ELSE round(
+                    100.0
+                    * (stat.dead_tuple_len + stat.approx_free_space)
+                    / stat.table_len,
+                    2
+                )
+            END
+        FROM
+            pg_class AS tbl
+        INNER JOIN
+            pg_namespace AS nsp
+            ON nsp.oid = tbl.relnamespace
+        CROSS JOIN LATERAL
+            pgstattuple_approx(tbl.oid) AS stat
+        WHERE
+            tbl.relkind IN ('r', 'm')
+            AND tbl.relpersistence <> 't'
+            AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+            AND nsp.nspname !~ '^pg_toast'
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [
+        Threshold(3, warning=30, critical=50, guard=(2, ">=", 10 * 1024 * 1024)),
+    ]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c3 DESC", thresholds=thresholds
+    )
+
+
+registry.register(TableBloat)
+
+
+class IndexBloat(Metric):
+    """
+    Like tables, B-tree indexes grow "bloated" when rows are updated or
+    deleted, and pages split by inserts are only ever half full. A bloated
+    index needs more I/O and more memory in the cache to be scanned. A REINDEX
+    CONCURRENTLY rebuilds an index without bloat.
+
+    The wasted space is estimated from the number of index entries and pages
+    and the average width of the indexed columns PostgreSQL recorded during
+    the last ANALYZE, taking the fillfactor into account. Indexes on tables
+    that haven't been analyzed yet are left out. A ratio over 30% of at least
+    10 MB will be marked as yellow, over 50% as red.
+
+    The exact mode scans the indexes with pgstatindex() from the pgstattuple
+    extension instead, and counts the free space in the leaf pages as well as
+    the empty and deleted pages. This reads the entire index, and requires the
+    database user to have the pg_stat_scan_tables role.
+    """
+
+    column_formatters = {2: format_size, 3: format_size}
+    exact_required_extensions = ["pgstattuple"]
+    header_labels = [
+        _("Table"),
+        _("Index"),
+        _("Size"),
+        _("Wasted"),
+        _("Wasted (in %)"),
+    ]
+    identity_columns = (0, 1)
+    label = _("Index Bloat")
+    ordering = "-4"
+    slug = "index-bloat"
+    sql = """
+        WITH widths AS (
+            SELECT
+                tbl.relname AS table_name,
+                idx.relname AS index_name,
+                greatest(idx.reltuples, 0) AS reltuples,
+                idx.relpages::bigint AS pages,
+                COALESCE(
+                    substring(
+                        array_to_string(idx.reloptions, ' ')
+                        FROM 'fillfactor=([0-9]+)'
+                    )::int,
+                    90
+                ) AS fillfactor,
+                8 + CASE
+                    WHEN max(COALESCE(stats.null_frac, 0)) > 0 THEN 4
+                    ELSE 0
+                END AS header_width,
+                sum(
+                    (1 - COALESCE(stats.null_frac, 0)) * COALESCE(stats.avg_width, 0)
+                ) AS data_width,
+                count(stats.attname) = count(*) AS analyzed
+            FROM
+                pg_index
+            INNER JOIN
+                pg_class AS idx
+                ON idx.oid = pg_index.indexrelid
+            INNER JOIN
+                pg_class AS tbl
+                ON tbl.oid = pg_index.indrelid
+            INNER JOIN
+                pg_namespace AS nsp
+                ON nsp.oid = idx.relnamespace
+            INNER JOIN
+                pg_am AS am
+                ON am.oid = idx.relam
+            INNER JOIN
+                pg_attribute AS att
+                ON att.attrelid = idx.oid
+            LEFT OUTER JOIN
+                pg_attribute AS col
+                ON
+                    col.attrelid = tbl.oid
+                    AND col.attnum = pg_index.indkey[att.attnum - 1]
+            LEFT OUTER JOIN
+                pg_stats AS stats
+                ON
+                    stats.schemaname = nsp.nspname
+                    AND stats.tablename = CASE
+                        WHEN col.attnum IS NULL THEN idx.relname
+                        ELSE tbl.relname
+                    END
+                    AND stats.attname = COALESCE(col.attname, att.attname)
+                    AND NOT stats.inherited
+            WHERE
+                idx.relkind = 'i'
+                AND idx.relpersistence <> 't'
+                AND am.amname = 'btree'
+                AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND nsp.nspname !~ '^pg_toast'
+            GROUP BY
+                tbl.relname,
+                idx.oid,
+                idx.relname,
+                idx.reltuples,
+                idx.relpages,
+                idx.reloptions
+        ), pages AS (
+            SELECT
+                table_name,
+                index_name,
+                block.size AS block_size,
+                pages,
+                1 + ceil(
+                    reltuples
+                    * (4 + ceil((header_width + data_width) / 8.0) * 8)
+                    / ((block.size - 24 - 16) * fillfactor / 100.0)
+                )::bigint AS expected_pages
+            FROM
+                widths
+            CROSS JOIN
+                (SELECT current_setting('block_size')::bigint AS size) AS block
+            WHERE
+                analyzed
+        )
+        SELECT
+            table_name,
+            index_name,
+            pages * block_size,
+            greatest(pages - expected_pages, 0) * block_size,
+            CASE
+                WHEN pages = 0 THEN round(0.0, 2)
+                ELSE round(100.0 * greatest(pages - expected_pages, 0) / pages, 2)
+            END
+        FROM
+            pages
+        {ORDER_BY}
+        ;
+    """
+    exact_sql = """
+        WITH stats AS (
+            SELECT
+                tbl.relname AS table_name,
+                idx.relname AS index_name,
+                current_setting('block_size')::bigint AS block_size,
+                stat.*
+            FROM
+                pg_index
+            INNER JOIN
+                pg_class AS idx
+                ON idx.oid = pg_index.indexrelid
+            INNER JOIN
+                pg_class AS tbl
+                ON tbl.oid = pg_index.indrelid
+            INNER JOIN
+                pg_namespace AS nsp
+                ON nsp.oid = idx.relnamespace
+            INNER JOIN
+                pg_am AS am
+                ON am.oid = idx.relam
+            CROSS JOIN LATERAL
+                pgstatindex(idx.oid) AS stat
+            WHERE
+                idx.relkind = 'i'
+                -- pgstatindex() fails for indexes left behind by a failed
+                -- CREATE INDEX CONCURRENTLY.
+                AND pg_index.indisvalid
+                AND pg_index.indisready
+                AND idx.relpersistence <> 't'
+                AND am.amname = 'btree'
+                AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND nsp.nspname !~ '^pg_toast'
+        ), wasted AS (
+            SELECT
+                table_name,
+                index_name,
+                index_size,
+                (
+                    CASE
+                        WHEN leaf_pages = 0 THEN 0
+                        ELSE round(leaf_pages * (1 - avg_leaf_density / 100))
+                    END
+                    + empty_pages
+                    + deleted_pages
+                )::bigint * block_size AS wasted
+            FROM
+                stats
+        )
+        SELECT
+            table_name,
+            index_name,
+            index_size,
+            wasted,
+            CASE
+                WHEN index_size = 0 THEN round(0.0, 2)
+                ELSE round(100.0 * wasted / index_size, 2)
+            END
+        FROM
+            wasted
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [
+        Threshold(4, warning=30, critical=50, guard=(3, ">=", 10 * 1024 * 1024)),
+    ]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c4 DESC", thresholds=thresholds
+    )
+
+
+registry.register(IndexBloat)
+
+
+class IndexProblems(Metric):
+    """
+    Indexes that likely cost more than they help: every index needs to be
+    updated on writes, adding to the WAL volume, and takes up disk space and
+    memory in the cache.
+
+    "Invalid" indexes are left behind by a failed CREATE INDEX CONCURRENTLY or
+    REINDEX CONCURRENTLY. They are updated on writes but never used for
+    queries. Drop and recreate them. They will be marked as red.
+
+    "Duplicate" indexes have the same definition as the other index on the
+    same table, "redundant" indexes' columns are the leading columns of the
+    other B-tree index. Dropping them usually doesn't slow down any query.
+    They will be marked as yellow.
+
+    "Unused" indexes haven't been scanned since the statistics were reset.
+    Unique indexes and indexes backing a constraint are left out. Consider
+    dropping them, but remember that the statistics are only collected on
+    each server separately, so an index may still be used on a replica.
+    """
+
+    column_formatters = {4: format_size}
+    header_labels = [
+        _("Table"),
+        _("Index"),
+        _("Problem"),
+        _("Other index"),
+        _("Size"),
+        _("Scans"),
+    ]
+    identity_columns = (0, 1, 2)
+    label = _("Index Problems")
+    min_pg_version = 110000
+    ordering = "-5"
+    slug = "index-problems"
+    sql = """
+        WITH indexes AS (
+            SELECT
+                idx.indexrelid,
+                idx.indrelid,
+                tbl.relname AS table_name,
+                cls.relname AS index_name,
+                am.amname,
+                idx.indisvalid,
+                idx.indisunique,
+                idx.indisprimary,
+                idx.indexprs IS NULL AS plain,
+                idx.indpred IS NULL AS complete,
+                (string_to_array(idx.indkey::text, ' ')::int[])[
+                    1:idx.indnkeyatts
+                ] AS keys,
+                (string_to_array(idx.indclass::text, ' ')::oid[])[
+                    1:idx.indnkeyatts
+                ] AS classes,
+                (string_to_array(idx.indoption::text, ' ')::int[])[
+                    1:idx.indnkeyatts
+                ] AS options,
+                concat_ws(
+                    ':',
+                    idx.indkey::text,
+                    idx.indclass::text,
+                    idx.indcollation::text,
+                    idx.indoption::text,
+                    pg_get_expr(idx.indexprs, idx.indrelid),
+                    pg_get_expr(idx.indpred, idx.indrelid)
+                ) AS definition,
+                cls.relpages::bigint * current_setting('block_size')::bigint AS size,
+                stat.idx_scan,
+                EXISTS (
+                    SELECT FROM pg_constraint WHERE conindid = idx.indexrelid
+                ) AS constrained
+            FROM
+                pg_index AS idx
+            INNER JOIN
+                pg_class AS cls
+                ON cls.oid = idx.indexrelid
+            INNER JOIN
+                pg_class AS tbl
+                ON tbl.oid = idx.indrelid
+            INNER JOIN
+                pg_namespace AS nsp
+                ON nsp.oid = tbl.relnamespace
+            INNER JOIN
+                pg_am AS am
+                ON am.oid = cls.relam
+            LEFT OUTER JOIN
+                pg_stat_all_indexes AS stat
+                ON stat.indexrelid = idx.indexrelid
+            WHERE
+                cls.relkind IN ('i', 'I')
+                AND nsp.nspname NOT IN ('pg_catalog', 'information_schema')
+                AND nsp.nspname !~ '^pg_toast'
+        )
+        SELECT
+            table_name,
+            index_name,
+            'Invalid',
+            NULL,
+            size,
+            idx_scan
+        FROM
+            indexes
+        WHERE
+            NOT indisvalid
+        UNION ALL
+        (
+            SELECT DISTINCT ON (idx.indexrelid)
+                idx.table_name,
+                idx.index_name,
+                'Duplicate',
+                other.index_name,
+                idx.size,
+                idx.idx_scan
+            FROM
+                indexes AS idx
+            INNER JOIN
+                indexes AS other
+                ON
+                    other.indrelid = idx.indrelid
+                    AND other.indexrelid <> idx.indexrelid
+                    AND other.amname = idx.amname
+                    AND other.definition = idx.definition
+            WHERE
+                idx.indisvalid
+                AND other.indisvalid
+                -- Keep primary keys over unique indexes over other indexes,
+                -- and older indexes over newer ones.
+                AND (other.indisprimary, other.indisunique, idx.indexrelid)
+                    > (idx.indisprimary, idx.indisunique, other.indexrelid)
+            ORDER BY
+                idx.indexrelid,
+                other.indexrelid
+        )
+        UNION ALL
+        (
+            SELECT DISTINCT ON (idx.indexrelid)
+                idx.table_name,
+                idx.index_name,
+                'Redundant',
+                other.index_name,
+                idx.size,
+                idx.idx_scan
+            FROM
+                indexes AS idx
+            INNER JOIN
+                indexes AS other
+                ON
+                    other.indrelid = idx.indrelid
+                    AND other.amname = idx.amname
+                    AND cardinality(other.keys) > cardinality(idx.keys)
+                    AND other.keys[1:cardinality(idx.keys)] = idx.keys
+                    AND other.classes[1:cardinality(idx.keys)] = idx.classes
+                    AND other.options[1:cardinality(idx.keys)] = idx.options
+            WHERE
+                idx.amname = 'btree'
+                AND idx.indisvalid
+                AND idx.plain
+                AND idx.complete
+                AND NOT idx.indisunique
+                AND other.indisvalid
+                AND other.complete
+            ORDER BY
+                idx.indexrelid,
+                other.indexrelid
+        )
+        UNION ALL
+        SELECT
+            table_name,
+            index_name,
+            'Unused',
+            NULL,
+            size,
+            idx_scan
+        FROM
+            indexes
+        WHERE
+            indisvalid
+            AND idx_scan = 0
+            AND NOT indisunique
+            AND NOT constrained
+        {ORDER_BY}
+        ;
+    """
+
+    summary_sql = get_summary_sql(
+        sql,
+        len(header_labels),
+        "c5 DESC",
+        severity="CASE WHEN c3 = 'Invalid' THEN 2 "
+        "WHEN c3 IN ('Duplicate', 'Redundant') THEN 1 ELSE 0 END",
+    )
 
     def get_record_style(self, record):
-        usage = record[5]
-        if usage >= 75.00:
+        if record[2] == "Invalid":
+            return "critical"
+        if record[2] in ("Duplicate", "Redundant"):
+            return "warning"
+        return "info"
+
+
+registry.register(IndexProblems)
+
+
+class BlockingLocks(Metric):
+    """
+    The sessions waiting for a lock, as a tree below the sessions blocking
+    them. Each row shows the path from the blocking session at the root of
+    the tree, which isn't waiting for a lock itself, to the waiting session.
+    Waits over 5 seconds will be marked as yellow, over 30 seconds as red.
+
+    Before PostgreSQL 14, the wait duration is approximated by the time since
+    the waiting query started.
+
+    Only the waiting sessions are looked up in the lock table, and the query
+    is canceled after 2 seconds, so the metric can be shown while the database
+    is under stress.
+    """
+
+    column_formatters = {8: format_duration, 9: format_duration}
+    header_labels = [
+        _("Blocking tree"),
+        _("PID"),
+        _("Blocked by"),
+        _("Lock mode"),
+        _("Lock type"),
+        _("Relation"),
+        _("State"),
+        _("Application"),
+        _("Query age"),
+        _("Wait duration"),
+        _("Query"),
+    ]
+    identity_columns = (0,)
+    label = _("Blocking Locks")
+    ordering = "1"
+    slug = "blocking-locks"
+    statement_timeout = 2
+    sql = """
+        WITH RECURSIVE waiting AS (
+            SELECT
+                pid,
+                pg_blocking_pids(pid) AS blocked_by
+            FROM
+                pg_stat_activity
+            WHERE
+                wait_event_type = 'Lock'
+        ), tree AS (
+            SELECT
+                ARRAY[blocker.pid] AS path,
+                blocker.pid,
+                '{{}}'::int[] AS blocked_by
+            FROM
+                (SELECT DISTINCT unnest(blocked_by) AS pid FROM waiting) AS blocker
+            WHERE
+                blocker.pid NOT IN (SELECT pid FROM waiting)
+            UNION ALL
+            SELECT
+                tree.path || waiting.pid,
+                waiting.pid,
+                waiting.blocked_by
+            FROM
+                tree
+            INNER JOIN
+                waiting
+                ON tree.pid = ANY(waiting.blocked_by)
+            WHERE
+                waiting.pid <> ALL(tree.path)
+        )
+        SELECT
+            array_to_string(tree.path, ' > '),
+            tree.pid,
+            NULLIF(array_to_string(tree.blocked_by, ', '), ''),
+            locks.mode,
+            locks.locktype,
+            locks.relation::regclass::text,
+            activity.state,
+            activity.application_name,
+            extract(epoch FROM now() - activity.query_start)::float8,
+            extract(epoch FROM now() - locks.waitstart)::float8,
+            activity.query
+        FROM
+            tree
+        LEFT OUTER JOIN
+            pg_stat_activity AS activity
+            ON activity.pid = tree.pid
+        LEFT OUTER JOIN
+            pg_locks AS locks
+            ON locks.pid = tree.pid AND NOT locks.granted
+        {ORDER_BY}
+        ;
+    """
+    # pg_locks.waitstart was added in PostgreSQL 14.
+    sql = {
+        90600: sql.replace("locks.waitstart", "activity.query_start"),
+        140000: sql,
+    }
+    thresholds = [
+        Threshold(9, warning=5, critical=30),
+    ]
+
+
+registry.register(BlockingLocks)
+
+
+class Sessions(Metric):
+    """
+    The client sessions that aren't idle, with the age of their current
+    transaction and query. Long running transactions prevent VACUUM from
+    removing the rows deleted or updated since they started, the "xmin age"
+    is the number of transactions since then.
+
+    Sessions "idle in transaction" have started a transaction but aren't
+    executing a query. Transactions idle for over 1 minute will be marked as
+    yellow, for over 5 minutes as red. Other transactions running for over 5
+    minutes will be marked as yellow, for over 30 minutes as red.
+    """
+
+    column_formatters = {5: format_duration, 6: format_duration}
+    header_labels = [
+        _("PID"),
+        _("Database"),
+        _("User"),
+        _("Application"),
+        _("State"),
+        _("Transaction age"),
+        _("Query age"),
+        _("Xmin age"),
+        _("Wait event"),
+        _("Query"),
+    ]
+    identity_columns = (0,)
+    label = _("Sessions")
+    min_pg_version = 100000
+    ordering = "-6"
+    overview = False
+    slug = "sessions"
+    sql = """
+        SELECT
+            pid,
+            datname,
+            usename,
+            application_name,
+            state,
+            extract(epoch FROM now() - xact_start)::float8,
+            extract(epoch FROM now() - query_start)::float8,
+            age(backend_xmin),
+            wait_event_type || ': ' || wait_event,
+            query
+        FROM
+            pg_stat_activity
+        WHERE
+            backend_type = 'client backend'
+            AND state <> 'idle'
+            AND pid <> pg_backend_pid()
+        {ORDER_BY}
+        ;
+    """
+    summary_sql = get_summary_sql(
+        sql,
+        len(header_labels),
+        "c6 DESC NULLS LAST",
+        severity="CASE WHEN c6 IS NULL THEN 0 "
+        "WHEN c5 LIKE 'idle in transaction%' "
+        "THEN (c6 >= 300)::int + (c6 >= 60)::int "
+        "ELSE (c6 >= 1800)::int + (c6 >= 300)::int END",
+    )
+
+    @staticmethod
+    def get_transaction_style(state, transaction_age):
+        """
+        Return the style for a transaction in the given session ``state``
+        running for ``transaction_age`` seconds.
+        """
+        if state is None or transaction_age is None:
+            return None
+        if state.startswith("idle in transaction"):
+            warning, critical = 60, 300
+        else:
+            warning, critical = 300, 1800
+        if transaction_age >= critical:
             return "critical"
-        if usage >= 50.00:
+        if transaction_age >= warning:
             return "warning"
         return "ok"
 
+    def get_record_style(self, record):
+        return self.get_transaction_style(record[4], record[5])
 
-registry.register(SequenceUsage)
+
+registry.register(Sessions)
+
+
+class SessionCounts(Metric):
+    """
+    The number of client sessions per state, application and wait event, and
+    the age of the oldest transaction among them. The ages are marked like in
+    the "Sessions" metric.
+
+    Unlike the "Sessions" metric, idle sessions are counted as well, and only
+    a handful of rows are returned even with thousands of sessions.
+    """
+
+    column_formatters = {4: format_duration}
+    header_labels = [
+        _("State"),
+        _("Application"),
+        _("Wait event"),
+        _("Sessions"),
+        _("Oldest transaction"),
+    ]
+    identity_columns = (0, 1, 2)
+    label = _("Session Counts")
+    min_pg_version = 100000
+    ordering = "-4"
+    slug = "session-counts"
+    sql = """
+        SELECT
+            state,
+            application_name,
+            wait_event_type || ': ' || wait_event,
+            count(*),
+            extract(epoch FROM now() - min(xact_start))::float8
+        FROM
+            pg_stat_activity
+        WHERE
+            backend_type = 'client backend'
+            AND pid <> pg_backend_pid()
+        GROUP BY
+            1,
+            2,
+            3
+        {ORDER_BY}
+        ;
+    """
+
+    def get_record_style(self, record):
+        return Sessions.get_transaction_style(record[0], record[4])
+
+
+registry.register(SessionCounts)
+
+
+class Autovacuum(Metric):
+    """
+    VACUUM makes the space of deleted and updated rows available again, and
+    "freezes" old rows so their transaction IDs can be reused before the
+    32-bit counter wraps around. ANALYZE collects the statistics the planner
+    relies on. Autovacuum runs both once enough rows have changed, but can
+    fall behind on busy tables or be blocked by long running transactions.
+
+    A share of dead rows over 20% of at least 10,000 rows will be marked as
+    yellow, over 50% as red. The age of the oldest unfrozen transaction ID
+    (XID) is also shown in % of the autovacuum_freeze_max_age setting: at
+    100%, autovacuum forces a VACUUM on the table to prevent a wraparound,
+    which is marked as yellow, and at 200% as red. Tables being vacuumed show
+    the phase and how much of the table has been scanned so far.
+    """
+
+    column_formatters = {5: format_duration, 6: format_duration}
+    header_labels = [
+        _("Table"),
+        _("Live rows"),
+        _("Dead rows"),
+        _("Dead (in %)"),
+        _("Modified since analyze"),
+        _("Since vacuum"),
+        _("Since analyze"),
+        _("XID age"),
+        _("XID age (in %)"),
+        _("Vacuum phase"),
+        _("Progress (in %)"),
+    ]
+    identity_columns = (0,)
+    label = _("Autovacuum")
+    ordering = "-9"
+    slug = "autovacuum"
+    sql = """
+        SELECT
+            tbl.relname,
+            tbl.n_live_tup,
+            tbl.n_dead_tup,
+            CASE tbl.n_live_tup + tbl.n_dead_tup
+                WHEN 0 THEN round(0.0, 2)
+                ELSE round(
+                    100.0 * tbl.n_dead_tup / (tbl.n_live_tup + tbl.n_dead_tup), 2
+                )
+            END,
+            tbl.n_mod_since_analyze,
+            extract(
+                epoch FROM now() - greatest(tbl.last_vacuum, tbl.last_autovacuum)
+            )::float8,
+            extract(
+                epoch FROM now() - greatest(tbl.last_analyze, tbl.last_autoanalyze)
+            )::float8,
+            age(cls.relfrozenxid),
+            round(
+                100.0 * age(cls.relfrozenxid)
+                / current_setting('autovacuum_freeze_max_age')::bigint,
+                2
+            ),
+            progress.phase,
+            CASE
+                WHEN progress.heap_blks_total > 0
+                    THEN round(
+                        100.0 * progress.heap_blks_scanned / progress.heap_blks_total,
+                        2
+                    )
+            END
+        FROM
+            pg_stat_user_tables AS tbl
+        INNER JOIN
+            pg_class AS cls
+            ON cls.oid = tbl.relid
+        LEFT OUTER JOIN
+            pg_stat_progress_vacuum AS progress
+            ON progress.relid = tbl.relid
+        WHERE
+            cls.relkind IN ('r', 'm')
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [
+        Threshold(3, warning=20, critical=50, guard=(2, ">=", 10000)),
+        Threshold(8, warning=100, critical=200),
+    ]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c4 DESC", thresholds=thresholds
+    )
+
+
+registry.register(Autovacuum)
+
+
+class TransactionIdWraparound(Metric):
+    """
+    PostgreSQL's transaction IDs are 32-bit numbers that wrap around after
+    about 2 billion transactions. Before that, VACUUM must have "frozen" all
+    rows written by older transactions. Otherwise, PostgreSQL stops accepting
+    new transactions to prevent data loss.
+
+    The age of the oldest unfrozen transaction ID in each database is shown
+    relative to the autovacuum_freeze_max_age setting, and to the point at
+    which the counter wraps around. Databases past 50% of the way to the
+    wraparound will be marked as yellow, past 75% as red. The same applies to
+    multixact IDs, which are used for row locks held by several transactions.
+    """
+
+    header_labels = [
+        _("Database"),
+        _("XID age"),
+        _("XID age (in % of freeze max age)"),
+        _("XID age (in % of wraparound)"),
+        _("Multixact age"),
+        _("Multixact age (in % of wraparound)"),
+    ]
+    identity_columns = (0,)
+    label = _("Transaction ID Wraparound")
+    ordering = "-2"
+    slug = "transaction-id-wraparound"
+    sql = """
+        SELECT
+            datname,
+            age(datfrozenxid),
+            round(
+                100.0 * age(datfrozenxid)
+                / current_setting('autovacuum_freeze_max_age')::bigint,
+                2
+            ),
+            round(100.0 * age(datfrozenxid) / 2147483648, 2),
+            mxid_age(datminmxid),
+            round(100.0 * mxid_age(datminmxid) / 2147483648, 2)
+        FROM
+            pg_database
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [
+        Threshold(3, warning=50, critical=75),
+        Threshold(5, warning=50, critical=75),
+    ]
+
+
+registry.register(TransactionIdWraparound)
+
+
+class Replication(Metric):
+    """
+    The replication state of the PostgreSQL server, which is the same for all
+    databases on it.
+
+    "Standby" rows show each standby server streaming from this server, with
+    how long it took until recent WAL was written, flushed and replayed there,
+    and how much WAL is yet to be replayed. "Slot" rows show each replication
+    slot and how much WAL this server retains for it; an inactive slot
+    retains WAL until the disk is full. If this server is a replica itself,
+    the "Recovery" row shows the time since the last replayed transaction was
+    committed on the primary, which also grows while the primary is idle, and
+    how much received WAL is yet to be replayed.
+
+    A replay lag over 30 seconds or 100 MB will be marked as yellow, over 5
+    minutes or 1 GB as red. Slots retaining over 1 GB of WAL will be marked
+    as yellow, over 10 GB as red.
+    """
+
+    column_formatters = {
+        3: format_duration,
+        4: format_duration,
+        5: format_duration,
+        6: format_size,
+        7: format_size,
+    }
+    header_labels = [
+        _("Type"),
+        _("Name"),
+        _("State"),
+        _("Write lag"),
+        _("Flush lag"),
+        _("Replay lag"),
+        _("Pending WAL"),
+        _("Retained WAL"),
+    ]
+    identity_columns = (0, 1)
+    label = _("Replication")
+    min_pg_version = 100000
+    ordering = "1.2"
+    slug = "replication"
+    sql = """
+        WITH lsn AS (
+            SELECT
+                CASE
+                    WHEN pg_is_in_recovery() THEN pg_last_wal_receive_lsn()
+                    ELSE pg_current_wal_lsn()
+                END AS current
+        )
+        SELECT
+            'Standby',
+            rep.application_name,
+            rep.state,
+            extract(epoch FROM rep.write_lag)::float8,
+            extract(epoch FROM rep.flush_lag)::float8,
+            extract(epoch FROM rep.replay_lag)::float8,
+            pg_wal_lsn_diff(lsn.current, rep.replay_lsn)::bigint,
+            NULL::bigint
+        FROM
+            pg_stat_replication AS rep
+        CROSS JOIN
+            lsn
+        UNION ALL
+        SELECT
+            'Slot',
+            slot.slot_name,
+            CASE WHEN slot.active THEN 'active' ELSE 'inactive' END,
+            NULL,
+            NULL,
+            NULL,
+            NULL,
+            pg_wal_lsn_diff(lsn.current, slot.restart_lsn)::bigint
+        FROM
+            pg_replication_slots AS slot
+        CROSS JOIN
+            lsn
+        UNION ALL
+        SELECT
+            'Recovery',
+            NULL,
+            (SELECT status FROM pg_stat_wal_receiver),
+            NULL,
+            NULL,
+            extract(epoch FROM now() - pg_last_xact_replay_timestamp())::float8,
+            pg_wal_lsn_diff(
+                pg_last_wal_receive_lsn(), pg_last_wal_replay_lsn()
+            )::bigint,
+            NULL
+        WHERE
+            pg_is_in_recovery()
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [
+        Threshold(5, warning=30, critical=300),
+        Threshold(6, warning=100 * 1024**2, critical=1024**3),
+        Threshold(7, warning=1024**3, critical=10 * 1024**3),
+    ]
+
+
+registry.register(Replication)
+
+
+class Checkpoints(Metric):
+    """
+    How the PostgreSQL server writes dirty buffers and WAL, which is the same
+    for all databases on it: the number of checkpoints started because
+    checkpoint_timeout passed (timed) or because they were requested, e.g.
+    when max_wal_size was exceeded, the time checkpoints spent writing and
+    syncing files, the buffers written by the checkpointer, the background
+    writer and the backends themselves, the fsync calls the backends had to
+    make themselves, and the WAL records, full page images and bytes
+    generated.
+
+    Frequent requested checkpoints, and backends writing buffers or even
+    calling fsync themselves, slow down writing queries. As the values are
+    counted since the statistics were last reset, show the changes since the
+    previous sample to see them per second.
+
+    Before PostgreSQL 14, the WAL records and full page images aren't
+    available, and the WAL size is the current WAL position on a primary
+    server only.
+    """
+
+    column_formatters = {
+        2: format_milliseconds,
+        3: format_milliseconds,
+        10: format_size,
+    }
+    counter_columns = tuple(range(11))
+    counters_per_second = True
+    header_labels = [
+        _("Timed checkpoints"),
+        _("Requested checkpoints"),
+        _("Write time"),
+        _("Sync time"),
+        _("Checkpointer buffers"),
+        _("Bgwriter buffers"),
+        _("Backend buffers"),
+        _("Backend fsyncs"),
+        _("WAL records"),
+        _("Full page images"),
+        _("WAL size"),
+    ]
+    label = _("Checkpoints and WAL")
+    slug = "checkpoints"
+    sql = """
+        SELECT
+            bgw.checkpoints_timed,
+            bgw.checkpoints_req,
+            bgw.checkpoint_write_time,
+            bgw.checkpoint_sync_time,
+            bgw.buffers_checkpoint,
+            bgw.buffers_clean,
+            bgw.buffers_backend,
+            bgw.buffers_backend_fsync,
+            wal.wal_records,
+            wal.wal_fpi,
+            wal.wal_bytes::bigint
+        FROM
+            pg_stat_bgwriter AS bgw
+        CROSS JOIN
+            pg_stat_wal AS wal
+        {ORDER_BY}
+        ;
+    """
+    # pg_stat_wal was added in PostgreSQL 14. In PostgreSQL 17, the
+    # checkpointer's counters moved to pg_stat_checkpointer, and the writes
+    # and fsyncs of backends to pg_stat_io.
+    sql = {
+        100000: """
+            SELECT
+                bgw.checkpoints_timed,
+                bgw.checkpoints_req,
+                bgw.checkpoint_write_time,
+                bgw.checkpoint_sync_time,
+                bgw.buffers_checkpoint,
+                bgw.buffers_clean,
+                bgw.buffers_backend,
+                bgw.buffers_backend_fsync,
+                NULL::bigint,
+                NULL::bigint,
+                CASE
+                    WHEN pg_is_in_recovery() THEN NULL
+                    ELSE pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')::bigint
+                END
+            FROM
+                pg_stat_bgwriter AS bgw
+            {ORDER_BY}
+            ;
+        """,
+        140000: sql,
+        170000: """
+            SELECT
+                cp.num_timed,
+                cp.num_requested,
+                cp.write_time,
+                cp.sync_time,
+                cp.buffers_written,
+                bgw.buffers_clean,
+                io.writes,
+                io.fsyncs,
+                wal.wal_records,
+                wal.wal_fpi,
+                wal.wal_bytes::bigint
+            FROM
+                pg_stat_checkpointer AS cp
+            CROSS JOIN
+                pg_stat_bgwriter AS bgw
+            CROSS JOIN
+                pg_stat_wal AS wal
+            CROSS JOIN (
+                SELECT
+                    sum(writes)::bigint AS writes,
+                    sum(fsyncs)::bigint AS fsyncs
+                FROM
+                    pg_stat_io
+                WHERE
+                    object = 'relation'
+                    AND backend_type NOT IN ('background writer', 'checkpointer')
+            ) AS io
+            {ORDER_BY}
+            ;
+        """,
+    }
+
+    def get_delta_record(self, record):
+        return tuple(None if value is None else round(value, 2) for value in record)
+
+
+registry.register(Checkpoints)
+
+
+class Connections(Metric):
+    """
+    The client connections to the PostgreSQL server per database, user,
+    application and state, plus a row without any of them counting all
+    connections. Once max_connections minus the connections reserved for
+    superusers (and, as of PostgreSQL 16, for roles with
+    pg_use_reserved_connections) are used, new connections fail with "too
+    many clients already". The limit and the percentage of it used are shown
+    for each row.
+
+    More than 80% of the available connections used will be marked as yellow,
+    more than 90% as red.
+    """
+
+    header_labels = [
+        _("Database"),
+        _("User"),
+        _("Application"),
+        _("State"),
+        _("Connections"),
+        _("Limit"),
+        _("Used (in %)"),
+    ]
+    identity_columns = (0, 1, 2, 3)
+    label = _("Connections")
+    min_pg_version = 100000
+    ordering = "-5"
+    slug = "connections"
+    sql = """
+        WITH limits AS (
+            SELECT
+                current_setting('max_connections')::int
+                - current_setting('superuser_reserved_connections')::int
+                - coalesce(current_setting('reserved_connections', true), '0')::int
+                AS available
+        )
+        SELECT
+            act.datname,
+            act.usename,
+            act.application_name,
+            act.state,
+            count(*),
+            limits.available,
+            round(100.0 * count(*) / limits.available, 2)
+        FROM
+            pg_stat_activity AS act
+        CROSS JOIN
+            limits
+        WHERE
+            act.backend_type = 'client backend'
+        GROUP BY
+            limits.available,
+            GROUPING SETS (
+                (act.datname, act.usename, act.application_name, act.state),
+                ()
+            )
+        {ORDER_BY}
+        ;
+    """
+    thresholds = [Threshold(6, warning=80, critical=90)]
+    summary_sql = get_summary_sql(
+        sql, len(header_labels), "c5 DESC", thresholds=thresholds
+    )
+
+
+registry.register(Connections)
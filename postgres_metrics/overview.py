@@ -0,0 +1,191 @@
+"""
+Summarize all metrics on all databases for the overview dashboard in the
+Django Admin.
+"""
+
+import time
+
+from .metrics import STYLE_SEVERITY, get_data_concurrently, worst_style
+
+#: The number of most severely styled records kept per summary.
+TOP_RECORDS = 5
+
+
+class MetricSummary:
+    """
+    The gist of a metric's result on a single database.
+
+    .. attribute:: alias
+
+       The alias of the database.
+
+    .. attribute:: style
+
+       The most severe style of all records and items, or ``None``.
+
+    .. attribute:: count
+
+       The total number of records, even if a summary query only returned
+       the first few. ``None`` if the metric couldn't be executed.
+
+    .. attribute:: headers
+
+       The column labels of the :attr:`top_records`.
+
+    .. attribute:: top_records
+
+       Up to :data:`TOP_RECORDS` of the most severely styled records, as
+       2-tuples of the record's style and a list of ``(style, value)`` pairs
+       like :attr:`MetricResult.rows
+       <postgres_metrics.metrics.MetricResult.rows>`. Values are formatted
+       strings. Records that aren't styled at all are left out.
+
+    .. attribute:: reason
+
+       Why the metric couldn't be executed, or ``None``.
+
+    .. attribute:: duration
+
+       The seconds it took to execute the metric, or ``None``.
+
+    .. attribute:: created
+
+       The UNIX timestamp of when the summary was created.
+    """
+
+    __slots__ = (
+        "alias",
+        "style",
+        "count",
+        "headers",
+        "top_records",
+        "reason",
+        "duration",
+        "created",
+    )
+
+    def __init__(
+        self,
+        alias,
+        style=None,
+        count=None,
+        headers=(),
+        top_records=(),
+        reason=None,
+        duration=None,
+        created=None,
+    ):
+        self.alias = alias
+        self.style = style
+        self.count = count
+        self.headers = list(headers)
+        self.top_records = list(top_records)
+        self.reason = reason
+        self.duration = duration
+        self.created = time.time() if created is None else created
+
+    def __repr__(self):
+        return "<MetricSummary alias=%s style=%r count=%r>" % (
+            self.alias,
+            self.style,
+            self.count,
+        )
+
+    @property
+    def age(self):
+        """The seconds since the summary was created."""
+        return time.time() - self.created
+
+    @classmethod
+    def from_result(cls, metric, alias, result):
+        """
+        Summarize a :class:`~postgres_metrics.metrics.MetricResult` or the
+        :class:`~django.db.DatabaseError` raised while executing ``metric`` as
+        returned by :func:`~postgres_metrics.metrics.get_data_concurrently`.
+        """
+        if isinstance(result, Exception):
+            return cls(alias, style="critical", reason=str(result).strip())
+        if not result.holds_data:
+            return cls(alias, reason=str(result.reason))
+        if result.styles is None:
+            result.styles = metric.get_styles(result.records)
+        styled = []
+        style = None
+        for position, (record_style, items) in enumerate(result.rows):
+            record_worst = worst_style(
+                [record_style, *(item_style for item_style, _ in items)]
+            )
+            style = worst_style([style, record_worst])
+            if STYLE_SEVERITY[record_worst] > STYLE_SEVERITY["ok"]:
+                styled.append(
+                    (
+                        -STYLE_SEVERITY[record_worst],
+                        position,
+                        record_style,
+                        [(item_style, str(item)) for item_style, item in items],
+                    )
+                )
+        styled.sort(key=lambda entry: entry[:2])
+        return cls(
+            alias,
+            style=style or None,
+            count=result.total,
+            headers=[str(header) for header in metric.headers],
+            top_records=[entry[2:] for entry in styled[:TOP_RECORDS]],
+            duration=result.timing.total if result.timing else None,
+        )
+
+
+def get_cache_key(metric, alias):
+    return "postgres_metrics:summary:%s:%s" % (metric.slug, alias)
+
+
+def get_summaries(
+    metrics, aliases, cache=None, timeout=None, statement_timeout=None, refresh=False
+):
+    """
+    Summarize all ``metrics`` (instances of
+    :class:`~postgres_metrics.metrics.Metric`, usually with ``summary=True``)
+    on all databases in ``aliases``.
+
+    Summaries found in the Django ``cache`` are reused unless ``refresh`` is
+    set. All others are computed with a single call to
+    :func:`~postgres_metrics.metrics.get_data_concurrently` and stored in the
+    cache for ``timeout`` seconds. Queries running longer than
+    ``statement_timeout`` seconds are canceled.
+
+    :return: Returns a dictionary mapping each metric to a list of
+        :class:`MetricSummary` instances, one per database in the order of
+        ``aliases``.
+    :rtype: dict
+    """
+    summaries = {metric: [None] * len(aliases) for metric in metrics}
+    if cache is not None and not refresh:
+        keys = {
+            get_cache_key(metric, alias): (metric, index)
+            for metric in metrics
+            for index, alias in enumerate(aliases)
+        }
+        for key, summary in cache.get_many(keys).items():
+            metric, index = keys[key]
+            summaries[metric][index] = summary
+
+    missing_metrics = [metric for metric in metrics if None in summaries[metric]]
+    missing_aliases = [
+        alias
+        for index, alias in enumerate(aliases)
+        if any(summaries[metric][index] is None for metric in missing_metrics)
+    ]
+    if missing_metrics:
+        data = get_data_concurrently(
+            missing_metrics, missing_aliases, statement_timeout=statement_timeout
+        )
+        fresh = {}
+        for metric, results in data.items():
+            for alias, result in zip(missing_aliases, results):
+                summary = MetricSummary.from_result(metric, alias, result)
+                summaries[metric][aliases.index(alias)] = summary
+                fresh[get_cache_key(metric, alias)] = summary
+        if cache is not None:
+            cache.set_many(fresh, timeout)
+    return summaries
@@ -0,0 +1,344 @@
+"""
+Record the results of metrics from a real database into fixture files, and
+replay them without PostgreSQL through the
+``postgres_metrics.backends.replay`` database backend.
+
+A fixture file holds the results of all recorded metrics for a single
+database. It's a JSON document, optionally gzip compressed if the file name
+ends in ``.gz``. The rows are recorded without any ``ORDER BY`` clause from
+:meth:`Metric.get_order_by_clause
+<postgres_metrics.metrics.Metric.get_order_by_clause>`, and thus without the
+:attr:`~postgres_metrics.metrics.Metric.limit` that's part of it; the replay
+backend sorts and limits them according to the clause in the replayed query
+instead.
+"""
+
+import datetime
+import gzip
+import json
+import re
+from collections import namedtuple
+from decimal import Decimal
+
+from .metrics import EXTENSIONS_SQL, HAS_PSYCOPG
+
+FORMAT_VERSION = 1
+
+ORDER_BY_RE = re.compile(
+    r"ORDER BY \d+ (?:ASC|DESC)(?:, \d+ (?:ASC|DESC))*(?: LIMIT \d+)?"
+)
+
+#: Statements only changing the session configuration, such as setting the
+#: ``statement_timeout`` in :func:`~postgres_metrics.metrics.get_data_concurrently`.
+#: They are accepted and ignored when replaying.
+SESSION_RE = re.compile(r"^\s*(?:SET\s|SELECT set_config\()", re.IGNORECASE)
+
+
+class Error(Exception):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class DataError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class IntegrityError(DatabaseError):
+    pass
+
+
+class InternalError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class NotSupportedError(DatabaseError):
+    pass
+
+
+#: A column description as per :pep:`249`. Only ``name`` and ``type_code`` are
+#: recorded.
+Column = namedtuple(
+    "Column",
+    "name type_code display_size internal_size precision scale null_ok",
+    defaults=(None,) * 5,
+)
+
+
+def get_query_key(sql):
+    """
+    Return ``sql`` without any ``ORDER BY`` clauses as generated by
+    :meth:`Metric.get_order_by_clause
+    <postgres_metrics.metrics.Metric.get_order_by_clause>` and with normalized
+    whitespace.
+    """
+    return " ".join(ORDER_BY_RE.sub("", sql).split())
+
+
+def encode_value(value):
+    """
+    Turn a value returned by the database into something JSON serializable.
+    Types JSON can't represent are wrapped in a single-key dictionary naming
+    the type.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Decimal):
+        return {"decimal": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"time": value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {"timedelta": value.total_seconds()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"bytes": bytes(value).hex()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {"json": value}
+    return str(value)
+
+
+DECODERS = {
+    "decimal": Decimal,
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "timedelta": lambda value: datetime.timedelta(seconds=value),
+    "bytes": bytes.fromhex,
+    "json": lambda value: value,
+}
+
+
+def decode_value(value):
+    """The inverse of :func:`encode_value`."""
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if isinstance(value, dict):
+        [(kind, value)] = value.items()
+        return DECODERS[kind](value)
+    return value
+
+
+def open_fixture(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def record_query(connection, sql, slug=None):
+    """
+    Execute ``sql`` on the given Django ``connection`` and return the
+    recorded query for a fixture.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        description = [[c.name, c.type_code] for c in cursor.description]
+        rows = [[encode_value(item) for item in row] for row in cursor.fetchall()]
+    return {
+        "metric": slug,
+        "sql": get_query_key(sql),
+        "description": description,
+        "rows": rows,
+    }
+
+
+def record(metrics, connection):
+    """
+    Execute the :attr:`~postgres_metrics.metrics.Metric.sql` and, if
+    available, :attr:`~postgres_metrics.metrics.Metric.exact_sql` and
+    :attr:`~postgres_metrics.metrics.Metric.summary_sql` of each of
+    the ``metrics`` (instances of :class:`~postgres_metrics.metrics.Metric`)
+    supported by the database behind the given Django ``connection``, as
+    returned by :meth:`Metric.get_full_sql
+    <postgres_metrics.metrics.Metric.get_full_sql>` without an ordering. If
+    any metric requires extensions (see :meth:`Metric.get_required_extensions
+    <postgres_metrics.metrics.Metric.get_required_extensions>`), the list of
+    installed extensions is recorded as well, and queries requiring missing
+    extensions are skipped.
+
+    :return: Returns the fixture as a dictionary.
+    :rtype: dict
+    """
+    connection.ensure_connection()
+    queries = []
+    installed = None
+    for metric in metrics:
+        if (
+            (
+                metric.min_pg_version is not None
+                and connection.pg_version < metric.min_pg_version
+            )
+            or (
+                metric.max_pg_version is not None
+                and connection.pg_version > metric.max_pg_version
+            )
+            or metric.get_full_sql(connection) is None
+        ):
+            continue
+        recorded = set()
+        for exact, summary in ((False, False), (True, False), (False, True)):
+            variant = type(metric)(exact=exact, summary=summary)
+            variant.ordering = ""
+            required_extensions = variant.get_required_extensions()
+            if required_extensions:
+                if installed is None:
+                    queries.append(record_query(connection, EXTENSIONS_SQL))
+                    installed = {name for name, in queries[-1]["rows"]}
+                if not installed.issuperset(required_extensions):
+                    continue
+            sql = variant.get_full_sql(connection)
+            if sql is not None and get_query_key(sql) not in recorded:
+                recorded.add(get_query_key(sql))
+                queries.append(record_query(connection, sql, metric.slug))
+    return {
+        "format": FORMAT_VERSION,
+        "alias": connection.alias,
+        "dsn": (
+            connection.connection.info.dsn if HAS_PSYCOPG else connection.connection.dsn
+        ),
+        "pg_version": connection.pg_version,
+        "queries": queries,
+    }
+
+
+def dump(fixture, path):
+    """Write a fixture as returned by :func:`record` to the file ``path``."""
+    with open_fixture(path, "w") as fp:
+        json.dump(fixture, fp)
+
+
+def load(path):
+    """Read a fixture written by :func:`dump` from the file ``path``."""
+    with open_fixture(path, "r") as fp:
+        fixture = json.load(fp)
+    if fixture.get("format") != FORMAT_VERSION:
+        raise InterfaceError(
+            "Unsupported fixture format %r in %s." % (fixture.get("format"), path)
+        )
+    return fixture
+
+
+def get_sort_key(value):
+    return (True, 0) if value is None else (False, value)
+
+
+def sort_rows(rows, order_by):
+    """
+    Sort ``rows`` according to an ``ORDER BY`` clause as generated by
+    :meth:`Metric.get_order_by_clause
+    <postgres_metrics.metrics.Metric.get_order_by_clause>`, and only keep
+    as many as its ``LIMIT``, if any. Like PostgreSQL, ``NULL`` values sort
+    last in ascending and first in descending order.
+    """
+    rows = list(rows)
+    order_by, _, limit = order_by.partition(" LIMIT ")
+    terms = order_by[len("ORDER BY ") :].split(", ")
+    for term in reversed(terms):
+        column, direction = term.split()
+        index = int(column) - 1
+        rows.sort(key=lambda row: get_sort_key(row[index]), reverse=direction == "DESC")
+    if limit:
+        rows = rows[: int(limit)]
+    return rows
+
+
+class ReplayCursor:
+    """A :pep:`249` cursor returning the rows recorded for a query."""
+
+    arraysize = 1
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if SESSION_RE.match(sql):
+            self.description = [Column("set_config", 25)]
+            self._rows = [(None,)]
+        else:
+            try:
+                query = self.connection.queries[get_query_key(sql)]
+            except KeyError:
+                raise ProgrammingError("No recorded result for the query: %s" % sql)
+            self.description = [Column(*column) for column in query["description"]]
+            self._rows = [
+                tuple(decode_value(item) for item in row) for row in query["rows"]
+            ]
+            order_by = ORDER_BY_RE.findall(sql)
+            if order_by:
+                self._rows = sort_rows(self._rows, order_by[-1])
+        self.rowcount = len(self._rows)
+
+    def executemany(self, sql, param_list):
+        raise NotSupportedError("Replay cursors don't support executemany().")
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def setoutputsize(self, size, column=None):
+        pass
+
+
+class ReplayConnection:
+    """A :pep:`249` connection replaying the queries recorded in a fixture."""
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.dsn = fixture["dsn"]
+        self.server_version = fixture["pg_version"]
+        self.queries = {query["sql"]: query for query in fixture["queries"]}
+        self.autocommit = True
+
+    @property
+    def info(self):
+        return self
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def cursor(self):
+        return ReplayCursor(self)
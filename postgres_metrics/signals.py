@@ -0,0 +1,30 @@
+from django.dispatch import Signal
+
+#: Sent by :class:`~postgres_metrics.tracking.StyleTracker` when the style of
+#: a record changed between ``ok``, ``warning`` and ``critical``.
+#:
+#: The ``sender`` is the metric class. Receivers additionally get the keyword
+#: arguments ``metric`` (the metric instance), ``alias`` (the database alias),
+#: ``key`` (the values of the record's
+#: :attr:`~postgres_metrics.metrics.Metric.identity_columns`), ``record``
+#: (``None`` if the record no longer exists), ``previous`` (the previous
+#: style), and ``style`` (the new style).
+style_changed = Signal()
+
+#: Sent by :meth:`Metric.get_result <postgres_metrics.metrics.Metric.get_result>`
+#: right before a metric's query is executed on a database.
+#:
+#: The ``sender`` is the metric class. Receivers additionally get the keyword
+#: arguments ``metric`` (the metric instance), ``alias`` (the database alias),
+#: and ``sql`` (the query).
+pre_metric_execute = Signal()
+
+#: Sent by :meth:`Metric.get_result <postgres_metrics.metrics.Metric.get_result>`
+#: after a metric's query was executed on a database, successfully or not.
+#:
+#: Receivers get the same arguments as for :data:`pre_metric_execute`, and
+#: additionally ``duration`` (in seconds), ``rowcount`` (the number of rows
+#: returned, or ``None`` on error), and ``error`` (the exception raised while
+#: executing the query, or ``None``). The exception is re-raised after the
+#: signal was sent.
+post_metric_execute = Signal()
@@ -0,0 +1,509 @@
+"""
+Export the results of metrics on all databases into a compact, columnar
+snapshot file, and browse such a file without connecting to PostgreSQL.
+
+A snapshot file starts with the magic bytes ``PGMSNAP\\x01``, followed by the
+length of a JSON header as an unsigned 64 bit integer, the header itself, and
+the data section, starting at the next multiple of 8 bytes. The header
+describes every metric, its results per database, and where the columns and
+styles of each result are stored in the data section:
+
+* ``int64`` and ``float64`` columns are stored as arrays,
+* ``decimal`` columns as an ``int64`` array of unscaled values and an exponent,
+* ``text`` columns as ``int64`` end offsets, a ``NULL`` flag byte per value,
+  and the concatenated UTF-8 encoded values,
+* ``json`` columns like ``text`` columns but with each value encoded by
+  :func:`~postgres_metrics.replay.encode_value`,
+* record styles as one byte per record and item styles as one byte per item,
+  both indexing into the list of styles in the header.
+
+:class:`Snapshot` memory-maps the file, so opening it is instant no matter
+its size, and values are only decoded when accessed.
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from django.conf import settings
+
+from .metrics import DecimalColumn, MetricRecords, MetricResult, compact_column
+from .replay import decode_value, encode_value, get_sort_key
+
+MAGIC = b"PGMSNAP\x01"
+
+#: The file name suffix of snapshots listed in the Django Admin.
+SNAPSHOT_SUFFIX = ".pgmsnap"
+FORMAT_VERSION = 1
+
+INT64 = struct.Struct("=q")
+FLOAT64 = struct.Struct("=d")
+
+
+def align(size):
+    """Round ``size`` up to the next multiple of 8."""
+    return (size + 7) & ~7
+
+
+class SnapshotWriter:
+    """Collect columns and styles in a data section and describe them."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def add(self, data):
+        offset = len(self.data)
+        self.data += data
+        self.data += b"\x00" * (align(len(self.data)) - len(self.data))
+        return offset
+
+    def add_column(self, column):
+        if isinstance(column, array) and column.typecode in "qd":
+            return {
+                "type": "int64" if column.typecode == "q" else "float64",
+                "offset": self.add(column.tobytes()),
+            }
+        if isinstance(column, DecimalColumn):
+            return {
+                "type": "decimal",
+                "offset": self.add(array("q", column.values).tobytes()),
+                "exponent": column.exponent,
+            }
+        values = list(column)
+        if all(value is None or isinstance(value, str) for value in values):
+            kind, encode = "text", str
+        else:
+            kind, encode = "json", lambda value: json.dumps(encode_value(value))
+        ends = array("q")
+        blob = bytearray()
+        for value in values:
+            if value is not None:
+                blob += encode(value).encode()
+            ends.append(len(blob))
+        return {
+            "type": kind,
+            "offset": self.add(ends.tobytes()),
+            "nulls": self.add(bytes(value is None for value in values)),
+            "blob": self.add(blob),
+        }
+
+    def add_styles(self, styles, table):
+        return self.add(
+            bytes(table.setdefault(style or "", len(table)) for style in styles)
+        )
+
+    def add_result(self, metric, result):
+        records = result.records
+        if result.styles is None:
+            result.styles = metric.get_styles(records)
+        record_styles, item_styles = result.styles
+        table = {"": 0}
+        width = len(records.columns)
+        description = {
+            "alias": result.alias,
+            "dsn": result.dsn,
+            "rows": len(records),
+            "columns": [self.add_column(column) for column in records.columns],
+            "record_styles": self.add_styles(record_styles, table),
+            "item_styles": self.add_styles(
+                (style for styles in item_styles for style in styles[:width]), table
+            ),
+        }
+        description["styles"] = sorted(table, key=table.__getitem__)
+        return description
+
+
+def write_snapshot(path, data, aliases):
+    """
+    Write the ``data`` as returned by
+    :func:`~postgres_metrics.metrics.get_data_concurrently` for the databases
+    in ``aliases`` to a snapshot file at ``path``.
+    """
+    writer = SnapshotWriter()
+    metrics = []
+    for metric, results in data.items():
+        described = []
+        for alias, result in zip(aliases, results):
+            if isinstance(result, Exception):
+                described.append({"alias": alias, "dsn": "", "reason": str(result)})
+            elif not result.holds_data:
+                described.append(
+                    {"alias": alias, "dsn": result.dsn, "reason": str(result.reason)}
+                )
+            else:
+                described.append(writer.add_result(metric, result))
+        metrics.append(
+            {
+                "slug": metric.slug,
+                "label": str(metric.label),
+                "header_labels": [str(label) for label in metric.header_labels or ()],
+                "exact": metric.exact,
+                "results": described,
+            }
+        )
+    header = json.dumps(
+        {
+            "format": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "data_size": len(writer.data),
+            "metrics": metrics,
+        }
+    ).encode()
+    with open(path, "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack("<Q", len(header)))
+        fp.write(header)
+        fp.write(b"\x00" * (align(fp.tell()) - fp.tell()))
+        fp.write(writer.data)
+
+
+class SnapshotColumn:
+    """
+    A lazy, read-only sequence of the values of a column in a
+    :class:`Snapshot`. Values are decoded from the memory-mapped file on
+    access. Slicing returns another lazy column.
+    """
+
+    __slots__ = ("buffer", "description", "start", "stop")
+
+    def __init__(self, buffer, description, start, stop):
+        self.buffer = buffer
+        self.description = description
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return SnapshotColumn(
+                self.buffer, self.description, self.start + start, self.start + stop
+            )
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return self.decode(self.start + index)
+
+    def __iter__(self):
+        kind = self.description["type"]
+        if kind in ("int64", "float64", "decimal"):
+            values = array("d" if kind == "float64" else "q")
+            offset = self.description["offset"]
+            values.frombytes(
+                self.buffer[offset + self.start * 8 : offset + self.stop * 8]
+            )
+            if self.description["byteorder"] != sys.byteorder:
+                values.byteswap()
+            if kind == "decimal":
+                return iter(DecimalColumn(values, self.description["exponent"]))
+            return iter(values.tolist())
+        return (self.decode(index) for index in range(self.start, self.stop))
+
+    def decode(self, index):
+        description = self.description
+        kind = description["type"]
+        if kind in ("int64", "float64", "decimal"):
+            fmt = FLOAT64 if kind == "float64" else INT64
+            data = self.buffer[
+                description["offset"]
+                + index * 8 : description["offset"]
+                + index * 8
+                + 8
+            ]
+            if description["byteorder"] != sys.byteorder:
+                data = data[::-1]
+            (value,) = fmt.unpack(data)
+            if kind == "decimal":
+                return DecimalColumn([value], description["exponent"])[0]
+            return value
+        if self.buffer[description["nulls"] + index]:
+            return None
+        ends = description["offset"]
+        start = (
+            INT64.unpack_from(self.buffer, ends + (index - 1) * 8)[0] if index else 0
+        )
+        stop = INT64.unpack_from(self.buffer, ends + index * 8)[0]
+        blob = description["blob"]
+        value = self.buffer[blob + start : blob + stop].decode()
+        if kind == "json":
+            return decode_value(json.loads(value))
+        return value
+
+
+class SnapshotStyles:
+    """
+    A lazy, read-only sequence of the record styles (``width=None``) or item
+    styles (a tuple per record) of a result in a :class:`Snapshot`.
+    """
+
+    __slots__ = ("buffer", "offset", "styles", "width", "start", "stop")
+
+    def __init__(self, buffer, offset, styles, width, start, stop):
+        self.buffer = buffer
+        self.offset = offset
+        self.styles = styles
+        self.width = width
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return SnapshotStyles(
+                self.buffer,
+                self.offset,
+                self.styles,
+                self.width,
+                self.start + start,
+                self.start + stop,
+            )
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("style index out of range")
+        index += self.start
+        if self.width is None:
+            return self.styles[self.buffer[self.offset + index]]
+        offset = self.offset + index * self.width
+        return tuple(
+            self.styles[style] for style in self.buffer[offset : offset + self.width]
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+class SnapshotResult(MetricResult):
+    """
+    A :class:`~postgres_metrics.metrics.MetricResult` read from a
+    :class:`Snapshot`. If the metric couldn't be executed on the database when
+    the snapshot was taken, :attr:`reason` tells why.
+    """
+
+    __slots__ = ("reason",)
+
+    def __init__(
+        self,
+        alias,
+        dsn,
+        records,
+        formatters=None,
+        styles=None,
+        reason=None,
+        total=None,
+    ):
+        self.alias = alias
+        self.dsn = dsn
+        self.records = records
+        self.formatters = formatters or {}
+        self.styles = styles
+        self.timing = None
+        self.reason = reason
+        self.total = len(records) if total is None else total
+        self.style_counts = None
+
+    @property
+    def holds_data(self):
+        return self.reason is None
+
+    def get_page(self, start, stop, parsed_ordering=None):
+        """
+        Return a :class:`SnapshotResult` holding only the decoded records from
+        ``start`` to ``stop``, which stays usable after the :class:`Snapshot`
+        is closed. If ``parsed_ordering`` (see
+        :attr:`Metric.parsed_ordering
+        <postgres_metrics.metrics.Metric.parsed_ordering>`) is given, the
+        records are sorted first, with ``NULL`` values last in ascending and
+        first in descending order like PostgreSQL does. Only the columns to
+        sort by are decoded entirely.
+        """
+        if not self.holds_data:
+            return self
+        record_styles, item_styles = self.styles
+        width = len(self.records.columns)
+        if parsed_ordering:
+            indices = list(range(len(self.records)))
+            for direction, column in reversed(parsed_ordering):
+                if not 0 < column <= width:
+                    continue
+                values = list(self.records.column(column - 1))
+                indices.sort(
+                    key=lambda index: get_sort_key(values[index]),
+                    reverse=direction == "-",
+                )
+            indices = indices[start:stop]
+            records = [self.records[index] for index in indices]
+            columns = [
+                compact_column([record[i] for record in records]) for i in range(width)
+            ]
+            styles = (
+                [record_styles[index] for index in indices],
+                [item_styles[index] for index in indices],
+            )
+        else:
+            columns = [
+                compact_column(list(column))
+                for column in self.records[start:stop].columns
+            ]
+            styles = (
+                list(record_styles[start:stop]),
+                list(item_styles[start:stop]),
+            )
+        return SnapshotResult(
+            self.alias,
+            self.dsn,
+            MetricRecords(columns=columns) if columns else MetricRecords(),
+            self.formatters,
+            styles,
+            total=self.total,
+        )
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot file written by :func:`write_snapshot`. Use it as
+    a context manager or call :meth:`close` when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fp:
+            self.mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mmap[: len(MAGIC)] != MAGIC:
+            self.mmap.close()
+            raise ValueError("%s is not a snapshot file." % path)
+        try:
+            (length,) = struct.unpack_from("<Q", self.mmap, len(MAGIC))
+            start = len(MAGIC) + 8
+            self.header = json.loads(self.mmap[start : start + length])
+            self.data_offset = align(start + length)
+            self.metrics = {metric["slug"]: metric for metric in self.header["metrics"]}
+            if self.data_offset + self.header.get("data_size", 0) > len(self.mmap):
+                raise ValueError("truncated")
+        except (struct.error, KeyError, TypeError, ValueError):
+            self.mmap.close()
+            raise ValueError("%s is a corrupt snapshot file." % path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.mmap.close()
+
+    @property
+    def created(self):
+        return datetime.datetime.fromisoformat(self.header["created"])
+
+    def get_results(self, slug, formatters=None):
+        """
+        Return a list of :class:`SnapshotResult` instances, one per database,
+        for the metric with the given ``slug``.
+
+        :raises KeyError: if the metric isn't part of the snapshot.
+        """
+        results = []
+        for description in self.metrics[slug]["results"]:
+            if "reason" in description:
+                results.append(
+                    SnapshotResult(
+                        description["alias"],
+                        description["dsn"],
+                        MetricRecords(),
+                        reason=description["reason"],
+                    )
+                )
+                continue
+            rows = description["rows"]
+            columns = [
+                SnapshotColumn(
+                    self.mmap,
+                    self.resolve(column, ("offset", "nulls", "blob")),
+                    0,
+                    rows,
+                )
+                for column in description["columns"]
+            ]
+            styles = description["styles"]
+            results.append(
+                SnapshotResult(
+                    description["alias"],
+                    description["dsn"],
+                    MetricRecords(columns=columns) if columns else MetricRecords(),
+                    formatters,
+                    (
+                        SnapshotStyles(
+                            self.mmap,
+                            self.data_offset + description["record_styles"],
+                            styles,
+                            None,
+                            0,
+                            rows,
+                        ),
+                        SnapshotStyles(
+                            self.mmap,
+                            self.data_offset + description["item_styles"],
+                            styles,
+                            len(columns),
+                            0,
+                            rows,
+                        ),
+                    ),
+                )
+            )
+        return results
+
+    def resolve(self, column, keys):
+        """Turn the offsets of a column description into absolute ones."""
+        column = dict(column, byteorder=self.header["byteorder"])
+        for key in keys:
+            if key in column:
+                column[key] += self.data_offset
+        return column
+
+
+def get_snapshot_names():
+    """
+    Return the sorted names of the snapshot files (ending in
+    :data:`SNAPSHOT_SUFFIX`) in the ``POSTGRES_METRICS_SNAPSHOT_DIR`` setting's
+    directory. Returns an empty list if the setting isn't defined.
+    """
+    directory = getattr(settings, "POSTGRES_METRICS_SNAPSHOT_DIR", None)
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if name.endswith(SNAPSHOT_SUFFIX)
+        and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def open_snapshot(name):
+    """
+    Open the snapshot file ``name`` from the ``POSTGRES_METRICS_SNAPSHOT_DIR``
+    setting's directory.
+
+    :raises FileNotFoundError: if there's no such snapshot.
+    :raises ValueError: if the file isn't a valid snapshot.
+    """
+    if name not in get_snapshot_names():
+        raise FileNotFoundError(name)
+    return Snapshot(os.path.join(settings.POSTGRES_METRICS_SNAPSHOT_DIR, name))
@@ -1,6 +1,7 @@
 from django import template
 
 from ..metrics import registry as metrics_registry
+from ..timing import format_duration
 
 register = template.Library()
 
@@ -34,6 +35,10 @@ def record_style(context):
     This template tag calls into :class:`Metric.get_record_style
     <postgres_metrics.metrics.Metric.get_record_style>` and will---if a return
     value was specified---prefix that one with ``'pgm-'``.
+
+    The templates shipped with django-postgres-metrics use the precomputed
+    :attr:`MetricResult.rows <postgres_metrics.metrics.MetricResult.rows>`
+    instead.
     """
     metric = context["metric"]
     record = context["record"]
@@ -66,3 +71,12 @@ def record_item_style(context):
     if style:
         return "pgm-%s" % style
     return ""
+
+
+@register.filter
+def duration(value):
+    """
+    Format a number of seconds for display. See
+    :func:`~postgres_metrics.timing.format_duration`.
+    """
+    return format_duration(value)
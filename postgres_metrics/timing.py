@@ -0,0 +1,195 @@
+import logging
+import threading
+from bisect import bisect_left
+
+#: The logger every metric execution is logged to at ``DEBUG`` level. Like
+#: Django's ``django.db.backends`` logger, the log records carry the
+#: measurements as extra attributes: ``metric``, ``alias``, ``duration``,
+#: ``connect``, ``execute``, ``fetch`` and ``rowcount``.
+logger = logging.getLogger("postgres_metrics.timing")
+
+#: The upper bounds in seconds of the buckets of a :class:`LatencyHistogram`.
+#: Durations above the last bound are counted in an additional bucket.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+def format_duration(seconds):
+    """
+    Format a duration in seconds into a human readable form, e.g. ``0.0123``
+    as ``'12.3 ms'`` and ``4.56789`` as ``'4.57 s'``.
+    """
+    if seconds < 1:
+        return "%.1f ms" % (seconds * 1000)
+    return "%.2f s" % seconds
+
+
+class MetricTiming:
+    """
+    How long executing a metric on a single database took.
+
+    .. attribute:: connect
+
+       The seconds spent opening the database connection. ``0`` if the
+       connection was already open.
+
+    .. attribute:: execute
+
+       The seconds spent executing the query. With a client-side cursor, this
+       includes transferring the rows from the server.
+
+    .. attribute:: fetch
+
+       The seconds spent fetching the rows from the cursor.
+
+    .. attribute:: rowcount
+
+       The number of rows returned.
+    """
+
+    __slots__ = ("connect", "execute", "fetch", "rowcount")
+
+    def __init__(self, connect=0.0, execute=0.0, fetch=0.0, rowcount=0):
+        self.connect = connect
+        self.execute = execute
+        self.fetch = fetch
+        self.rowcount = rowcount
+
+    def __repr__(self):
+        return "<MetricTiming total=%.6f rowcount=%d>" % (self.total, self.rowcount)
+
+    def __str__(self):
+        return "connect %s, execute %s, fetch %s" % (
+            format_duration(self.connect),
+            format_duration(self.execute),
+            format_duration(self.fetch),
+        )
+
+    @property
+    def total(self):
+        """The total number of seconds spent on the database."""
+        return self.connect + self.execute + self.fetch
+
+
+class LatencyHistogram:
+    """
+    Count the durations of a metric's executions on a single database in
+    :data:`LATENCY_BUCKETS`. Safe to be used from several threads.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<LatencyHistogram count=%d sum=%.6f>" % (self.count, self.sum)
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def get_quantile(self, q):
+        """
+        Estimate the ``q``-quantile (between ``0`` and ``1``) of the observed
+        durations from the buckets by linear interpolation, the same way
+        Prometheus' ``histogram_quantile()`` does. Returns ``None`` if nothing
+        was observed and the highest bound for durations above it.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def get_histogram(slug, alias):
+    """
+    Return the :class:`LatencyHistogram` for the metric with the given ``slug``
+    on the database ``alias``, creating it if necessary.
+    """
+    key = (slug, alias)
+    try:
+        return _histograms[key]
+    except KeyError:
+        with _histograms_lock:
+            return _histograms.setdefault(key, LatencyHistogram())
+
+
+def get_histograms():
+    """
+    Return a dictionary mapping ``(slug, alias)`` 2-tuples to the
+    :class:`LatencyHistogram` of all metrics executed by this process.
+    """
+    with _histograms_lock:
+        return dict(_histograms)
+
+
+def reset_histograms():
+    """Discard all latency histograms."""
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def record_timing(metric, alias, timing):
+    """
+    Add the ``timing`` (a :class:`MetricTiming`) of executing ``metric`` on the
+    database ``alias`` to the respective histogram and log it.
+    """
+    duration = timing.total
+    get_histogram(metric.slug, alias).observe(duration)
+    logger.debug(
+        "(%.3f) %s; alias=%s; rows=%d; connect=%.3f; execute=%.3f; fetch=%.3f",
+        duration,
+        metric.slug,
+        alias,
+        timing.rowcount,
+        timing.connect,
+        timing.execute,
+        timing.fetch,
+        extra={
+            "metric": metric.slug,
+            "alias": alias,
+            "duration": duration,
+            "connect": timing.connect,
+            "execute": timing.execute,
+            "fetch": timing.fetch,
+            "rowcount": timing.rowcount,
+        },
+    )
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+
+    HAS_OPENTELEMETRY = True
+except ImportError:
+    HAS_OPENTELEMETRY = False
+
+#: The OpenTelemetry tracer used for the spans around metric queries, or
+#: ``None`` if ``opentelemetry-api`` isn't installed.
+tracer = trace.get_tracer("postgres_metrics") if HAS_OPENTELEMETRY else None
+
+
+@contextmanager
+def metric_span(metric, connection, sql):
+    """
+    Wrap the execution of ``metric`` on the given database ``connection`` in an
+    OpenTelemetry span, following the semantic conventions for database
+    client calls. The span is yielded so that more attributes can be added.
+
+    If OpenTelemetry isn't installed, this does nothing and yields ``None``.
+    """
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(
+        "postgres_metrics %s" % metric.slug,
+        kind=trace.SpanKind.CLIENT,
+        attributes={
+            "db.system": "postgresql",
+            "db.name": connection.settings_dict["NAME"] or "",
+            "db.statement": sql,
+            "postgres_metrics.metric": metric.slug,
+            "postgres_metrics.alias": connection.alias,
+        },
+    ) as span:
+        yield span
@@ -0,0 +1,152 @@
+import time
+
+from .metrics import STYLE_SEVERITY, Metric, worst_style
+from .signals import style_changed
+
+#: The styles tracked by :class:`StyleTracker`. Any other style is treated as
+#: ``ok``.
+TRACKED_STYLES = ("ok", "warning", "critical")
+
+
+class StyleTracker:
+    """
+    Track the style of each record of a metric across successive executions
+    and send the :data:`~postgres_metrics.signals.style_changed` signal when it
+    changes between ``ok``, ``warning`` and ``critical``.
+
+    Records are identified by their
+    :attr:`~postgres_metrics.metrics.Metric.identity_columns`. A record that
+    shows up for the first time is assumed to have been ``ok`` before. A
+    tracked record that no longer shows up, e.g. because a lock was released
+    or an index dropped, is treated as ``ok`` now; its change is reported
+    with the record ``None``.
+
+    The state is kept per metric and database in the given Django ``cache``
+    (e.g. the one returned by :func:`~postgres_metrics.metrics.get_cache`).
+    To survive between separate processes, such as periodic runs of
+    ``pgm_check``, the cache must be shared between processes, i.e. not the
+    local memory cache. Without a cache it is kept in memory. Only records
+    that aren't ``ok`` are stored.
+
+    If ``min_duration`` is given, a record needs to have the new style for at
+    least that many seconds before the change is reported. Combined with the
+    ``hysteresis`` of :class:`~postgres_metrics.metrics.Threshold`, this
+    prevents flapping values from reporting changes over and over.
+    """
+
+    cache_key_prefix = "postgres_metrics:styles"
+
+    def __init__(self, cache=None, min_duration=0, timeout=None):
+        self.cache = cache
+        self.min_duration = min_duration
+        self.timeout = timeout
+        self._state = {}
+
+    def get_cache_key(self, metric, alias):
+        return "%s:%s:%s" % (self.cache_key_prefix, metric.slug, alias)
+
+    def get_state(self, metric, alias):
+        """
+        Return the tracked state for the metric on the database ``alias``: a
+        dictionary mapping record keys to 3-tuples of the reported style, the
+        pending style, and since when the pending style was first seen.
+        """
+        key = self.get_cache_key(metric, alias)
+        if self.cache is None:
+            return self._state.get(key, {})
+        return self.cache.get(key, {})
+
+    def set_state(self, metric, alias, state):
+        key = self.get_cache_key(metric, alias)
+        if self.cache is None:
+            self._state[key] = state
+        else:
+            self.cache.set(key, state, self.timeout)
+
+    def get_record_styles(self, metric, result, state):
+        """
+        Yield the key, record and style for each record in ``result``, taking
+        the hysteresis of the metric's thresholds into account.
+        """
+        if result.styles is None:
+            result.styles = metric.get_styles(result.records)
+        record_styles, item_styles = result.styles
+        metric_class = type(metric)
+        uses_hysteresis = (
+            any(t.hysteresis for t in metric.thresholds)
+            and metric_class.get_record_style is Metric.get_record_style
+            and metric_class.get_record_item_style is Metric.get_record_item_style
+        )
+        identity_columns = metric.identity_columns
+        for record, record_style, record_item_styles in zip(
+            result.records, record_styles, item_styles
+        ):
+            key = tuple(record[index] for index in identity_columns)
+            style = worst_style([record_style, *record_item_styles])
+            if uses_hysteresis and key in state:
+                reported = state[key][0]
+                if STYLE_SEVERITY[style] < STYLE_SEVERITY[reported]:
+                    style = worst_style(
+                        t.get_style(record, previous=reported)
+                        for t in metric.thresholds
+                    )
+            if style not in TRACKED_STYLES:
+                style = "ok"
+            yield key, record, style
+
+    def update(self, metric, result, now=None):
+        """
+        Compare the styles of the records in ``result`` with the tracked state,
+        send :data:`~postgres_metrics.signals.style_changed` for every record
+        whose style changed, and store the new state.
+
+        :return: Returns a list of ``(key, previous, style)`` 3-tuples for all
+            reported changes.
+        :rtype: list
+        """
+        if not result.holds_data:
+            return []
+        if now is None:
+            now = time.time()
+        state = self.get_state(metric, result.alias)
+
+        styles = {}
+        records = {}
+        for key, record, style in self.get_record_styles(metric, result, state):
+            if key not in styles or STYLE_SEVERITY[style] > STYLE_SEVERITY[styles[key]]:
+                styles[key] = style
+                records[key] = record
+
+        for key in state.keys() - styles.keys():
+            styles[key] = "ok"
+            records[key] = None
+
+        changes = []
+        new_state = {}
+        for key, style in styles.items():
+            reported, pending, since = state.get(key, ("ok", None, None))
+            if style == reported:
+                pending = since = None
+            elif self.min_duration and (
+                pending != style or now - since < self.min_duration
+            ):
+                if pending != style:
+                    pending, since = style, now
+            else:
+                changes.append((key, reported, style))
+                reported, pending, since = style, None, None
+            if reported != "ok" or pending is not None:
+                new_state[key] = (reported, pending, since)
+        self.set_state(metric, result.alias, new_state)
+
+        for key, previous, style in changes:
+            style_changed.send(
+                sender=type(metric),
+                metric=metric,
+                alias=result.alias,
+                key=key,
+                record=records[key],
+                previous=previous,
+                style=style,
+            )
+        return changes
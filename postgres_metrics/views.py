@@ -1,9 +1,69 @@
-from django.contrib.admin.views.main import ORDER_VAR
+from django.conf import settings
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 from django.http import Http404
 from django.shortcuts import render
+from django.utils.translation import gettext_lazy as _
 
-from .metrics import registry as metrics_registry
+from .deltas import DeltaTracker
+from .metrics import get_cache, get_postgresql_aliases, registry as metrics_registry
+from .overview import get_summaries
+from .snapshots import get_snapshot_names, open_snapshot
+
+DELTA_VAR = "delta"
+EXACT_VAR = "exact"
+REFRESH_VAR = "refresh"
+SNAPSHOT_VAR = "snapshot"
+
+#: The seconds after which the overview dashboard cancels a metric's query.
+OVERVIEW_STATEMENT_TIMEOUT = 10
+
+#: The number of records per database shown on a page when browsing a
+#: snapshot.
+SNAPSHOT_PER_PAGE = 100
+
+
+def get_snapshot_context(request, Metric, ordering, name):
+    """
+    Read the current page of the results of ``Metric`` from the snapshot file
+    ``name``. Only the records on that page and the columns to sort by are
+    decoded.
+    """
+    try:
+        snapshot = open_snapshot(name)
+    except (OSError, ValueError):
+        # Missing, unreadable, truncated or otherwise corrupt snapshot files.
+        raise Http404
+    with snapshot:
+        try:
+            description = snapshot.metrics[Metric.slug]
+        except KeyError:
+            raise Http404
+        metric = Metric(ordering, exact=description["exact"])
+        if metric.header_labels is None:
+            metric.header_labels = description["header_labels"]
+        results = snapshot.get_results(Metric.slug, metric.column_formatters)
+        paginator = Paginator(
+            range(max((len(result.records) for result in results), default=0)),
+            SNAPSHOT_PER_PAGE,
+        )
+        page = paginator.get_page(request.GET.get(PAGE_VAR))
+        start = (page.number - 1) * SNAPSHOT_PER_PAGE
+        results = [
+            result.get_page(start, start + SNAPSHOT_PER_PAGE, metric.parsed_ordering)
+            for result in results
+        ]
+        return {
+            "metric": metric,
+            "results": results,
+            "snapshot": {
+                "name": name,
+                "created": snapshot.created,
+                "page": page,
+                "page_var": PAGE_VAR,
+            },
+        }
 
 
 def metrics_view(request, name):
@@ -16,15 +76,75 @@ def metrics_view(request, name):
         raise PermissionDenied
 
     ordering = request.GET.get(ORDER_VAR)
-    metric = Metric(ordering)
+    snapshot = request.GET.get(SNAPSHOT_VAR)
+    if snapshot:
+        context = get_snapshot_context(request, Metric, ordering, snapshot)
+        metric = context["metric"]
+    else:
+        exact = EXACT_VAR in request.GET
+        metric = Metric(ordering, exact=exact)
+        results = metric.get_data()
+        delta = None
+        if DELTA_VAR in request.GET and metric.counter_columns:
+            # Each viewer has their own previous sample.
+            if request.session.session_key is None:
+                request.session.save()
+            tracker = DeltaTracker(get_cache(), scope=request.session.session_key)
+            delta = {
+                "seconds": max(
+                    filter(None, (tracker.update(metric, r) for r in results)),
+                    default=None,
+                ),
+                "per_second": metric.counters_per_second,
+            }
+        for result in results:
+            if result.holds_data:
+                result.styles = metric.get_styles(result.records)
+        context = {
+            "metric": metric,
+            "results": results,
+            "delta": delta,
+            "snapshot": None,
+        }
 
     return render(
         request,
         "postgres_metrics/table.html",
         {
             "title": metric.label,
-            "metric": metric,
-            "results": metric.get_data(),
+            "snapshots": get_snapshot_names(),
             "opts": {"app_label": "postgres_metrics", "model_name": metric.slug},
+            **context,
+        },
+    )
+
+
+def overview_view(request):
+    metrics = [
+        Metric(summary=True)
+        for Metric in metrics_registry.sorted
+        if Metric.overview and Metric.can_view(request.user)
+    ]
+    if not metrics:
+        raise PermissionDenied
+
+    aliases = get_postgresql_aliases()
+    summaries = get_summaries(
+        metrics,
+        aliases,
+        cache=get_cache(),
+        timeout=getattr(settings, "POSTGRES_METRICS_OVERVIEW_TIMEOUT", 60),
+        statement_timeout=OVERVIEW_STATEMENT_TIMEOUT,
+        refresh=REFRESH_VAR in request.GET,
+    )
+
+    return render(
+        request,
+        "postgres_metrics/overview.html",
+        {
+            "title": _("PostgreSQL Metrics Overview"),
+            "aliases": aliases,
+            "summaries": list(summaries.items()),
+            "opts": {"app_label": "postgres_metrics", "model_name": "overview"},
         },
     )
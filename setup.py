@@ -33,6 +33,7 @@ setuptools.setup(
             "sphinx_rtd_theme>=1.0,<2.0",
             "Sphinx>=4.0,<8.0",
         ],
+        "opentelemetry": ["opentelemetry-api"],
         "test": [
             "coverage[toml]>=5,<8",
             "Django",
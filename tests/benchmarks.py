@@ -0,0 +1,231 @@
+"""
+Micro-benchmarks for the hot paths of django-postgres-metrics.
+
+The benchmarks are not part of the regular test suite. Run them explicitly
+against the databases configured in ``tests/settings.py``:
+
+.. code-block:: console
+
+    $ PGM_BENCHMARK=1 PG_VERSIONS=16 python -m django test \\
+        --pythonpath . --settings=tests.settings tests.benchmarks
+
+``PGM_BENCHMARK_SIZES`` is a comma separated list of the number of tables in
+the synthetic catalogs the metrics are executed against. It defaults to
+``1000,10000``; add ``100000`` to test at production catalog scale. See
+:mod:`tests.catalog` for what each table comes with.
+
+``PGM_BENCHMARK_FIXTURE`` can point to a fixture recorded with ``pgm_record``.
+The metrics in it are then replayed, styled, and rendered without PostgreSQL.
+
+The minimum and median wall time and the peak memory allocated by Python are
+printed after the benchmarks ran.
+"""
+
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import unittest
+
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.db.utils import ConnectionHandler
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import include, re_path
+
+from postgres_metrics.metrics import Metric, MetricHeader, MetricResult, registry
+
+from .catalog import drop_catalog, generate_catalog
+
+urlpatterns = [
+    re_path("^postgres-metrics/", include("postgres_metrics.urls")),
+    re_path("^admin/", admin.site.urls),
+]
+
+SIZES = [
+    int(size)
+    for size in os.getenv("PGM_BENCHMARK_SIZES", "1000,10000").split(",")
+    if size.strip()
+]
+
+RENDER_SIZE = 10000
+
+FIXTURE = os.getenv("PGM_BENCHMARK_FIXTURE")
+
+
+def measure(func, repeat=5):
+    """
+    Call ``func`` ``repeat`` times and return the minimum and median wall time
+    in seconds and the peak memory in bytes allocated during an extra call.
+    """
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(timings), statistics.median(timings), peak
+
+
+class WideMetric(Metric):
+    """
+    A metric with plenty of columns and rows; its SQL is never executed.
+    """
+
+    label = "Wide Metric"
+    slug = "wide-metric"
+    sql = "SELECT 1;"
+    header_labels = ["Name", "Number", "Ratio", "Text", "Size", "Flag"]
+
+
+@unittest.skipUnless(os.getenv("PGM_BENCHMARK"), "Set PGM_BENCHMARK=1 to run.")
+@override_settings(ROOT_URLCONF=__name__)
+class MetricBenchmark(SimpleTestCase):
+    databases = {"default"}
+    results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if not cls.results:
+            return
+        width = max(len(name) for name, *timings in cls.results)
+        lines = [
+            "",
+            "%-*s %12s %12s %12s"
+            % (width, "Benchmark", "Min (ms)", "Median (ms)", "Peak (KiB)"),
+        ]
+        for name, minimum, median, peak in cls.results:
+            lines.append(
+                "%-*s %12.3f %12.3f %12.1f"
+                % (width, name, minimum * 1000, median * 1000, peak / 1024)
+            )
+        sys.stderr.write("\n".join(lines) + "\n")
+
+    def benchmark(self, name, func, repeat=5):
+        type(self).results.append((name, *measure(func, repeat)))
+
+    def test_get_data(self):
+        connection = connections["default"]
+        for size in SIZES:
+            self.addCleanup(drop_catalog, connection)
+            drop_catalog(connection)
+            generate_catalog(connection, tables=size, rows=10, scans=3)
+            for Metric_ in registry:
+                metric = Metric_()
+                self.benchmark(
+                    "get_data %s (%d tables)" % (metric.slug, size),
+                    lambda: metric.get_result(connection),
+                )
+                if Metric_.exact_sql:
+                    exact_metric = Metric_(exact=True)
+                    self.benchmark(
+                        "get_data %s exact (%d tables)" % (metric.slug, size),
+                        lambda: exact_metric.get_result(connection),
+                    )
+            drop_catalog(connection)
+
+    def test_metric_header(self):
+        ordering = WideMetric("1.-3.5.-2").parsed_ordering
+
+        def compute():
+            for i in range(1000):
+                for index, name in enumerate(WideMetric.header_labels, start=1):
+                    header = MetricHeader(name, index, ordering)
+                    header.ascending
+                    header.sort_priority
+                    header.url_primary
+                    header.url_remove
+                    header.url_toggle
+
+        self.benchmark("MetricHeader x 6000", compute)
+
+    def test_get_order_by_clause(self):
+        def compute():
+            for i in range(10000):
+                WideMetric("1.-3.5.-2.6.4").get_order_by_clause()
+
+        self.benchmark("get_order_by_clause x 10000", compute)
+
+    def test_render_table(self):
+        metric = WideMetric("1.-3")
+        records = [
+            ("name-%d" % i, i, i / 7, "text " * (i % 5), i * 8192, i % 2 == 0)
+            for i in range(RENDER_SIZE)
+        ]
+        request = RequestFactory().get("/postgres-metrics/wide-metric/")
+        request.user = AnonymousUser()
+
+        def render():
+            result = MetricResult(connections["default"], records)
+            result.styles = metric.get_styles(result.records)
+            render_to_string(
+                "postgres_metrics/table.html",
+                {
+                    "title": metric.label,
+                    "metric": metric,
+                    "results": [result],
+                    "opts": {
+                        "app_label": "postgres_metrics",
+                        "model_name": metric.slug,
+                    },
+                },
+                request,
+            )
+
+        self.benchmark("render table.html (%d rows)" % RENDER_SIZE, render, 3)
+
+    @unittest.skipUnless(FIXTURE, "Set PGM_BENCHMARK_FIXTURE to run.")
+    def test_replay(self):
+        replayed = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.dummy"},
+                "replay": {
+                    "ENGINE": "postgres_metrics.backends.replay",
+                    "NAME": FIXTURE,
+                },
+            }
+        )
+        self.addCleanup(replayed.close_all)
+        connection = replayed["replay"]
+        request = RequestFactory().get("/postgres-metrics/")
+        request.user = AnonymousUser()
+        for Metric_ in registry:
+            metric = Metric_()
+
+            def render():
+                result = metric.get_result(connection)
+                result.styles = metric.get_styles(result.records)
+                render_to_string(
+                    "postgres_metrics/table.html",
+                    {"metric": metric, "results": [result], "opts": {}},
+                    request,
+                )
+
+            try:
+                rows = len(metric.get_result(connection).records)
+            except DatabaseError:
+                # The metric wasn't recorded.
+                continue
+            self.benchmark("replay %s (%d rows)" % (metric.slug, rows), render, 3)
+
+    def test_show_metric(self):
+        connection = connections["default"]
+        self.addCleanup(drop_catalog, connection)
+        drop_catalog(connection)
+        generate_catalog(connection, tables=SIZES[0])
+        self.benchmark(
+            "pgm_show_metric table-size (%d tables)" % SIZES[0],
+            lambda: call_command("pgm_show_metric", "table-size", stdout=io.StringIO()),
+            3,
+        )
@@ -0,0 +1,215 @@
+"""
+Populate a PostgreSQL database with a synthetic catalog of schemas, tables,
+partitions, indexes, sequences and extensions to exercise the metrics at
+production scale.
+
+All objects are created in schemas named ``pgm_catalog_<n>``. Extensions are
+created in the ``pgm_catalog_extensions`` schema. :func:`drop_catalog` removes
+all of them again.
+"""
+
+import random
+
+SCHEMA_PREFIX = "pgm_catalog"
+
+EXTENSIONS_SCHEMA = "%s_extensions" % SCHEMA_PREFIX
+
+#: The number of tables created or dropped per transaction. Each table takes a
+#: handful of locks (table, indexes, sequence, TOAST table and TOAST index)
+#: which must stay below ``max_locks_per_transaction * max_connections``.
+BATCH_SIZE = 100
+
+#: How many values each partition covers.
+PARTITION_RANGE = 1000
+
+
+def get_schema_names(schemas):
+    return ["%s_%d" % (SCHEMA_PREFIX, n) for n in range(schemas)]
+
+
+def get_table_statements(schema, table, indexes, rows, scans, rng):
+    """
+    Return the SQL statements creating a single table with its sequence and
+    extra indexes, filling it with ``rows`` rows, updating some of them, and
+    scanning it up to ``scans`` times.
+    """
+    name = "%s.%s" % (schema, table)
+    statements = [
+        "CREATE TABLE %s (id serial PRIMARY KEY, number integer, value text)" % name
+    ]
+    columns = ["number", "value", "number, value"]
+    for n in range(indexes):
+        statements.append(
+            "CREATE INDEX %s_idx%d ON %s (%s)"
+            % (table, n, name, columns[n % len(columns)])
+        )
+    if rows:
+        statements.append(
+            "INSERT INTO %s (number, value) "
+            "SELECT i, md5(i::text) FROM generate_series(1, %d) AS i" % (name, rows)
+        )
+        statements.append(
+            "UPDATE %s SET value = md5(value) WHERE id %% %d = 0"
+            % (name, rng.randint(2, 10))
+        )
+    # Most sequences are barely used, some are close to running out.
+    last_value = max(rows, 1)
+    if rng.random() < 0.1:
+        last_value = rng.randint(last_value, 2**31 - 1)
+    statements.append(
+        "SELECT setval(pg_get_serial_sequence('%s', 'id'), %d)" % (name, last_value)
+    )
+    for n in range(rng.randint(0, scans)):
+        statements.append("SELECT count(*) FROM %s" % name)
+    for n in range(rng.randint(0, scans)):
+        statements.append("SELECT * FROM %s WHERE id = %d" % (name, n + 1))
+    return statements
+
+
+def get_partitioned_statements(schema, table, partitions, rows, pg_version):
+    name = "%s.%s" % (schema, table)
+    statements = [
+        "CREATE TABLE %s (id integer NOT NULL, value text) PARTITION BY RANGE (id)"
+        % name
+    ]
+    for n in range(partitions):
+        statements.append(
+            "CREATE TABLE %s_%d PARTITION OF %s FOR VALUES FROM (%d) TO (%d)"
+            % (name, n, name, n * PARTITION_RANGE, (n + 1) * PARTITION_RANGE)
+        )
+    if partitions and pg_version >= 110000:
+        statements.append("CREATE INDEX %s_idx ON %s (id)" % (table, name))
+    elif partitions:
+        # Indexes on partitioned tables require PostgreSQL 11.
+        for n in range(partitions):
+            statements.append(
+                "CREATE INDEX %s_%d_idx ON %s_%d (id)" % (table, n, name, n)
+            )
+    if rows and partitions:
+        statements.append(
+            "INSERT INTO %s SELECT i %% %d, md5(i::text) "
+            "FROM generate_series(1, %d) AS i"
+            % (name, partitions * PARTITION_RANGE, rows)
+        )
+    return statements
+
+
+def execute_batches(cursor, statements, batch_size):
+    """
+    Execute the given lists of statements. Every ``batch_size`` lists are sent
+    to the server at once and hence run in a single transaction.
+    """
+    for start in range(0, len(statements), batch_size):
+        cursor.execute(
+            ";\n".join(
+                statement
+                for batch in statements[start : start + batch_size]
+                for statement in batch
+            )
+        )
+
+
+def generate_catalog(
+    connection,
+    *,
+    schemas=1,
+    tables=100,
+    partitioned=0,
+    partitions=10,
+    indexes=1,
+    sequences=0,
+    extensions=0,
+    rows=0,
+    scans=0,
+    seed=0,
+    batch_size=BATCH_SIZE,
+):
+    """
+    Create a synthetic catalog in the database of the given Django
+    ``connection``.
+
+    :param int schemas: The number of schemas.
+    :param int tables: The number of regular tables in each schema. Each table
+        has a primary key backed by a ``serial`` sequence.
+    :param int partitioned: The number of partitioned tables in each schema.
+    :param int partitions: The number of partitions of each partitioned table.
+    :param int indexes: The number of additional indexes on each table.
+    :param int sequences: The number of standalone sequences in each schema.
+    :param int extensions: The number of extensions to install, if available.
+    :param int rows: The number of rows inserted into each table.
+    :param int scans: The maximum number of sequential and index scans run
+        against each table to generate statistics in the ``pg_stat_*`` views.
+    :param int seed: The seed for the random sequence values and scan counts.
+    :param int batch_size: The number of tables created per transaction.
+    :return: Returns the number of relations in the database.
+    :rtype: int
+    """
+    rng = random.Random(seed)
+    with connection.cursor() as cursor:
+        statements = []
+        for schema in get_schema_names(schemas):
+            statements.append(["CREATE SCHEMA %s" % schema])
+            for n in range(tables):
+                statements.append(
+                    get_table_statements(schema, "t%d" % n, indexes, rows, scans, rng)
+                )
+            for n in range(partitioned):
+                statements.append(
+                    get_partitioned_statements(
+                        schema, "p%d" % n, partitions, rows, connection.pg_version
+                    )
+                )
+            for n in range(sequences):
+                statements.append(
+                    [
+                        "CREATE SEQUENCE %s.s%d" % (schema, n),
+                        "SELECT setval('%s.s%d', %d)"
+                        % (schema, n, rng.randint(1, 2**63 - 1)),
+                    ]
+                )
+        execute_batches(cursor, statements, batch_size)
+
+        if extensions:
+            cursor.execute(
+                "SELECT name FROM pg_available_extensions "
+                "WHERE installed_version IS NULL AND name <> 'plpgsql' "
+                "ORDER BY name LIMIT %s",
+                [extensions],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+            cursor.execute("CREATE SCHEMA IF NOT EXISTS %s" % EXTENSIONS_SCHEMA)
+            for name in names:
+                cursor.execute(
+                    'CREATE EXTENSION IF NOT EXISTS "%s" SCHEMA %s CASCADE'
+                    % (name, EXTENSIONS_SCHEMA)
+                )
+
+        cursor.execute("ANALYZE")
+        cursor.execute("SELECT count(*) FROM pg_class")
+        return cursor.fetchone()[0]
+
+
+def drop_catalog(connection, batch_size=BATCH_SIZE):
+    """
+    Drop everything :func:`generate_catalog` created in the database of the
+    given Django ``connection``.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT n.nspname, c.relname FROM pg_class AS c "
+            "INNER JOIN pg_namespace AS n ON c.relnamespace = n.oid "
+            "WHERE c.relkind IN ('r', 'p') AND n.nspname LIKE %s",
+            [SCHEMA_PREFIX + r"\_%"],
+        )
+        tables = ["%s.%s" % row for row in cursor.fetchall()]
+        execute_batches(
+            cursor,
+            [["DROP TABLE IF EXISTS %s CASCADE" % table] for table in tables],
+            batch_size,
+        )
+        cursor.execute(
+            "SELECT nspname FROM pg_namespace WHERE nspname LIKE %s",
+            [SCHEMA_PREFIX + r"\_%"],
+        )
+        for (schema,) in cursor.fetchall():
+            cursor.execute("DROP SCHEMA IF EXISTS %s CASCADE" % schema)
@@ -0,0 +1,86 @@
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tests.catalog import BATCH_SIZE, drop_catalog, generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Populate a database with a synthetic catalog of schemas, tables, "
+        "partitions, indexes, sequences and extensions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="The database to populate. Defaults to the 'default' database.",
+        )
+        parser.add_argument("--schemas", type=int, default=1)
+        parser.add_argument(
+            "--tables", type=int, default=100, help="The number of tables per schema."
+        )
+        parser.add_argument(
+            "--partitioned",
+            type=int,
+            default=0,
+            help="The number of partitioned tables per schema.",
+        )
+        parser.add_argument(
+            "--partitions",
+            type=int,
+            default=10,
+            help="The number of partitions per partitioned table.",
+        )
+        parser.add_argument(
+            "--indexes",
+            type=int,
+            default=1,
+            help="The number of additional indexes per table.",
+        )
+        parser.add_argument(
+            "--sequences",
+            type=int,
+            default=0,
+            help="The number of standalone sequences per schema.",
+        )
+        parser.add_argument("--extensions", type=int, default=0)
+        parser.add_argument(
+            "--rows", type=int, default=0, help="The number of rows per table."
+        )
+        parser.add_argument(
+            "--scans",
+            type=int,
+            default=0,
+            help="The maximum number of sequential and index scans per table.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop a previously generated catalog and exit.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options.pop("database")]
+        batch_size = options.pop("batch_size")
+        drop_catalog(connection, batch_size=batch_size)
+        if options["drop"]:
+            self.stdout.write("Dropped the synthetic catalog.")
+            return
+        relations = generate_catalog(
+            connection,
+            schemas=options["schemas"],
+            tables=options["tables"],
+            partitioned=options["partitioned"],
+            partitions=options["partitions"],
+            indexes=options["indexes"],
+            sequences=options["sequences"],
+            extensions=options["extensions"],
+            rows=options["rows"],
+            scans=options["scans"],
+            seed=options["seed"],
+            batch_size=batch_size,
+        )
+        self.stdout.write("The database now has %d relations." % relations)
@@ -0,0 +1,92 @@
+import io
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from postgres_metrics.metrics import SequenceUsage
+
+from .catalog import (
+    SCHEMA_PREFIX,
+    drop_catalog,
+    generate_catalog,
+    get_partitioned_statements,
+)
+
+RELKINDS_SQL = r"""
+    SELECT c.relkind, count(*)
+    FROM pg_class AS c
+    INNER JOIN pg_namespace AS n ON c.relnamespace = n.oid
+    WHERE n.nspname LIKE 'pgm\_catalog\_%'
+    GROUP BY c.relkind
+    ORDER BY c.relkind
+"""
+
+
+class CatalogTest(TestCase):
+    def get_relkinds(self):
+        with connection.cursor() as cursor:
+            cursor.execute(RELKINDS_SQL)
+            return dict(cursor.fetchall())
+
+    def test_generate_and_drop(self):
+        relations = generate_catalog(
+            connection,
+            schemas=2,
+            tables=3,
+            indexes=2,
+            sequences=1,
+            rows=5,
+            scans=2,
+            batch_size=2,
+        )
+        # Per schema: 3 tables with a primary key, 2 more indexes and a serial
+        # sequence each, and one standalone sequence.
+        self.assertEqual(self.get_relkinds(), {"S": 8, "i": 18, "r": 6})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_class")
+            self.assertEqual(cursor.fetchone()[0], relations)
+            cursor.execute("SELECT count(*) FROM %s_1.t2" % SCHEMA_PREFIX)
+            self.assertEqual(cursor.fetchone()[0], 5)
+
+        records = SequenceUsage().get_result(connection).records
+        self.assertGreaterEqual(
+            len([r for r in records if r[0] in ("t0", "t1", "t2")]), 6
+        )
+
+        drop_catalog(connection, batch_size=2)
+        self.assertEqual(self.get_relkinds(), {})
+
+    def test_generate_partitioned(self):
+        if connection.pg_version < 100000:
+            self.skipTest("Partitioned tables require PostgreSQL 10.")
+        generate_catalog(connection, tables=0, partitioned=2, partitions=3, rows=10)
+        relkinds = self.get_relkinds()
+        self.assertEqual(relkinds["p"], 2)
+        self.assertEqual(relkinds["r"], 6)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM %s_0.p1" % SCHEMA_PREFIX)
+            self.assertEqual(cursor.fetchone()[0], 10)
+            cursor.execute(
+                "SELECT count(*) FROM pg_index JOIN pg_class ON indrelid = oid "
+                "WHERE relnamespace = '%s_0'::regnamespace AND relkind = 'r'"
+                % SCHEMA_PREFIX
+            )
+            self.assertEqual(cursor.fetchone()[0], 6)
+
+    def test_partitioned_statements(self):
+        statements = get_partitioned_statements("s", "p", 2, 0, 100000)
+        self.assertNotIn("CREATE INDEX p_idx ON s.p (id)", statements)
+        self.assertIn("CREATE INDEX p_0_idx ON s.p_0 (id)", statements)
+        self.assertIn("CREATE INDEX p_1_idx ON s.p_1 (id)", statements)
+        statements = get_partitioned_statements("s", "p", 2, 0, 110000)
+        self.assertIn("CREATE INDEX p_idx ON s.p (id)", statements)
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command("pgm_generate_catalog", "--tables", "2", stdout=stdout)
+        self.assertIn("The database now has", stdout.getvalue())
+        self.assertEqual(self.get_relkinds()["r"], 2)
+        call_command("pgm_generate_catalog", "--drop", stdout=stdout)
+        self.assertIn("Dropped the synthetic catalog.", stdout.getvalue())
+        self.assertEqual(self.get_relkinds(), {})
@@ -1,4 +1,5 @@
 import io
+import json
 import os
 from contextlib import contextmanager
 from functools import partial
@@ -12,8 +13,11 @@ from rich.console import Console
 
 from postgres_metrics.management.commands import pgm_list_metrics, pgm_show_metric
 from postgres_metrics.metrics import (
+    Metric as BaseMetric,
     MetricResult,
     NoMetricResult,
+    Threshold,
+    get_summary_sql,
     registry as metric_registry,
 )
 
@@ -65,17 +69,32 @@ class TestShowMetricCommand(SaveSVGMixin, RichConsoleMixin, TestCase):
     def test_call_generic(self):
         for Metric in metric_registry:
             metric = Metric()
-            metric.get_data()
+            results = metric.get_data()
             stdout = io.StringIO()
             with self.patch_console():
                 cmd = pgm_show_metric.Command()
                 call_command(cmd, str(metric.slug), stdout=stdout)
                 self.save_svg(cmd, metric.slug)
             out = stdout.getvalue()
+            if not any(result.holds_data for result in results):
+                with self.subTest(metric=metric):
+                    self.assertIn(results[0].reason, out)
+                continue
             for header in metric.headers:
                 with self.subTest(metric=metric, header=header):
                     self.assertIn(str(header.name), out)
 
+    def test_call_estimated(self):
+        stdout = io.StringIO()
+        with self.patch_console():
+            call_command("pgm_show_metric", "table-size", stdout=stdout)
+        self.assertIn(" (estimated)", stdout.getvalue())
+
+        stdout = io.StringIO()
+        with self.patch_console():
+            call_command("pgm_show_metric", "table-size", "--exact", stdout=stdout)
+        self.assertNotIn(" (estimated)", stdout.getvalue())
+
     def test_call_missing_metric(self):
         stdout = io.StringIO()
         with self.assertRaises(CommandError):
@@ -97,3 +116,218 @@ class TestShowMetricCommand(SaveSVGMixin, RichConsoleMixin, TestCase):
                 call_command("pgm_show_metric", "index-size", stdout=stdout)
         out = stdout.getvalue()
         self.assertIn("\nsome reason\n", out)
+
+
+class CheckMetric(BaseMetric):
+    label = "Check"
+    slug = "check"
+    sql = "SELECT * FROM (VALUES ('a', 10), ('b', 60), ('c', 80)) AS t(name, value);"
+    thresholds = [Threshold(1, warning=50, critical=75)]
+
+
+class WarningCheckMetric(CheckMetric):
+    label = "Warning Check"
+    slug = "warning-check"
+    sql = CheckMetric.sql
+    thresholds = [Threshold(1, warning=50)]
+
+
+class ManyCheckMetric(BaseMetric):
+    label = "Many Check"
+    slug = "many-check"
+    sql = "SELECT i FROM generate_series(1, 30) AS i {ORDER_BY};"
+    thresholds = [Threshold(0, warning=10, critical=20)]
+    summary_sql = get_summary_sql(sql, 1, "c1", thresholds=thresholds)
+
+
+class BrokenCheckMetric(BaseMetric):
+    label = "Broken Check"
+    slug = "broken-check"
+    sql = "SELECT pg_sleep(5);"
+
+
+class TestCheckCommand(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def setUp(self):
+        for metric in (
+            CheckMetric,
+            WarningCheckMetric,
+            ManyCheckMetric,
+            BrokenCheckMetric,
+        ):
+            metric_registry.register(metric)
+            self.addCleanup(metric_registry.unregister, metric.slug)
+
+    def call_check(self, *args):
+        stdout = io.StringIO()
+        try:
+            call_command("pgm_check", *args, stdout=stdout)
+        except SystemExit as e:
+            return e.code, stdout.getvalue()
+        return 0, stdout.getvalue()
+
+    def test_ok(self):
+        status, out = self.call_check("index-size", "cache-hits")
+        self.assertEqual(status, 0)
+        num_databases = len(self.databases)
+        self.assertTrue(
+            out.startswith(
+                "PGM OK - 0 critical, 0 warning, 0 unknown in 2 metrics on %d "
+                "databases | critical=0 warning=0 unknown=0 time=" % num_databases
+            ),
+            out,
+        )
+        self.assertEqual(out.count("\n"), 1)
+
+    def test_critical(self):
+        status, out = self.call_check("check", "index-size", "--json")
+        self.assertEqual(status, 2)
+        summary, details = out.splitlines()
+        num_databases = len(self.databases)
+        self.assertTrue(
+            summary.startswith(
+                "PGM CRITICAL - %d critical, %d warning, 0 unknown in 2 metrics"
+                % (num_databases, num_databases)
+            ),
+            summary,
+        )
+        details = json.loads(details)
+        self.assertEqual(len(details), 2 * num_databases)
+        self.assertEqual(
+            details[:2],
+            [
+                {
+                    "metric": "check",
+                    "alias": "default",
+                    "status": "WARNING",
+                    "record": {"name": "b", "value": 60},
+                },
+                {
+                    "metric": "check",
+                    "alias": "default",
+                    "status": "CRITICAL",
+                    "record": {"name": "c", "value": 80},
+                },
+            ],
+        )
+
+    def test_warning(self):
+        status, out = self.call_check("warning-check", "--database", "default")
+        self.assertEqual(status, 1)
+        self.assertTrue(
+            out.startswith(
+                "PGM WARNING - 0 critical, 2 warning, 0 unknown in 1 metrics on 1 "
+                "databases"
+            ),
+            out,
+        )
+
+    def test_timeout(self):
+        status, out = self.call_check(
+            "broken-check", "--database", "default", "--timeout", "0.1", "--json"
+        )
+        self.assertEqual(status, 3)
+        summary, details = out.splitlines()
+        self.assertTrue(
+            summary.startswith("PGM UNKNOWN - 0 critical, 0 warning, 1 unknown"),
+            summary,
+        )
+        details = json.loads(details)
+        self.assertEqual(details[0]["metric"], "broken-check")
+        self.assertEqual(details[0]["status"], "UNKNOWN")
+        self.assertIn("statement timeout", details[0]["error"])
+
+    def test_summary(self):
+        with mock.patch(
+            "postgres_metrics.management.commands.pgm_check.get_data_concurrently",
+            return_value={},
+        ) as get_data_concurrently:
+            self.call_check()
+            metrics = get_data_concurrently.call_args[0][0]
+            self.assertEqual(len(metrics), len(list(metric_registry)))
+            for metric in metrics:
+                with self.subTest(metric=metric):
+                    self.assertEqual(metric.summary, bool(metric.summary_sql))
+            self.assertTrue(any(metric.summary for metric in metrics))
+
+            self.call_check("--full")
+            metrics = get_data_concurrently.call_args[0][0]
+            self.assertFalse(any(metric.summary for metric in metrics))
+
+    def test_summary_counts(self):
+        num_databases = len(self.databases)
+        for args, num_details in [((), 10), (("--full",), 21)]:
+            with self.subTest(args=args):
+                status, out = self.call_check("many-check", "--json", *args)
+                self.assertEqual(status, 2)
+                summary, details = out.splitlines()
+                self.assertTrue(
+                    summary.startswith(
+                        "PGM CRITICAL - %d critical, %d warning, 0 unknown"
+                        % (11 * num_databases, 10 * num_databases)
+                    ),
+                    summary,
+                )
+                self.assertIn(
+                    "| critical=%d warning=%d unknown=0"
+                    % (11 * num_databases, 10 * num_databases),
+                    summary,
+                )
+                self.assertEqual(len(json.loads(details)), num_details * num_databases)
+
+    def test_missing_metric(self):
+        status, out = self.call_check("does-not-exist")
+        self.assertEqual(status, 3)
+        self.assertEqual(out, "PGM UNKNOWN - Metric 'does-not-exist' not found\n")
+
+    def test_missing_database(self):
+        status, out = self.call_check("check", "--database", "sqlite")
+        self.assertEqual(status, 3)
+        self.assertEqual(out, "PGM UNKNOWN - Database 'sqlite' not found\n")
+
+
+class TestBenchCommand(RichConsoleMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def call_bench(self, *args):
+        stdout = io.StringIO()
+        with self.patch_console():
+            call_command("pgm_bench", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_call(self):
+        out = self.call_bench("--runs", "3", "--warmup", "0")
+        for alias in self.databases:
+            with self.subTest(alias=alias):
+                self.assertIn("%s (3 runs, 0 warmup)" % alias, out)
+        for Metric in metric_registry:
+            with self.subTest(metric=Metric):
+                self.assertIn(Metric.slug, out)
+        self.assertIn(" P95 ", out)
+        self.assertNotIn(" Shared hit ", out)
+
+    def test_call_explain(self):
+        out = self.call_bench(
+            "cache-hits", "--database", "default", "--runs", "2", "--explain"
+        )
+        self.assertIn(" Shared hit ", out)
+        self.assertIn(" Execution ", out)
+        self.assertNotIn("Execution Time:", out)
+
+        out = self.call_bench(
+            "cache-hits", "--database", "default", "--explain", "--verbosity", "2"
+        )
+        self.assertIn("Execution Time:", out)
+
+    def test_call_missing_metric(self):
+        with self.assertRaises(CommandError):
+            self.call_bench("does-not-exist")
+
+    def test_call_missing_database(self):
+        with self.assertRaises(CommandError):
+            self.call_bench("cache-hits", "--database", "sqlite")
+
+    def test_call_invalid_runs(self):
+        with self.assertRaisesMessage(CommandError, "--runs must be at least 1."):
+            self.call_bench("--runs", "0")
@@ -0,0 +1,202 @@
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from rich.console import Console
+
+from postgres_metrics.deltas import DeltaTracker
+from postgres_metrics.metrics import Metric, MetricResult, NoMetricResult, registry
+
+
+class CounterMetric(Metric):
+    counter_columns = (1, 2)
+    identity_columns = (0,)
+    slug = "counters"
+    sql = "SELECT 'a', 1, 1.5;"
+
+    def get_delta_record(self, record):
+        name, calls, total = record
+        return name.upper(), calls, total
+
+
+class RateMetric(CounterMetric):
+    counters_per_second = True
+    slug = "rates"
+    sql = CounterMetric.sql
+
+
+class PlainMetric(Metric):
+    slug = "plain"
+    sql = "SELECT 'a', 1, 1;"
+
+
+class DeltaTrackerTest(TestCase):
+    def get_result(self, records):
+        return MetricResult(connection, records)
+
+    def test_update(self):
+        tracker = DeltaTracker()
+        metric = CounterMetric()
+        result = self.get_result([("a", 10, Decimal("1.5")), ("b", 5, None)])
+        self.assertIsNone(tracker.update(metric, result, now=100))
+        self.assertEqual(result.records, [("A", None, None), ("B", None, None)])
+
+        result = self.get_result(
+            [("a", 16, Decimal("4.5")), ("b", 2, Decimal("1")), ("c", 1, None)]
+        )
+        result.styles = ([], [])
+        self.assertEqual(tracker.update(metric, result, now=110), 10)
+        self.assertEqual(
+            result.records,
+            [("A", 6, Decimal("3.0")), ("B", None, None), ("C", None, None)],
+        )
+        self.assertIsNone(result.styles)
+
+    def test_per_second(self):
+        tracker = DeltaTracker(per_second=True)
+        metric = CounterMetric()
+        tracker.update(metric, self.get_result([("a", 10, Decimal("1.5"))]), now=100)
+        result = self.get_result([("a", 30, Decimal("2.5"))])
+        tracker.update(metric, result, now=104)
+        self.assertEqual(result.records, [("A", 5.0, 0.25)])
+
+    def test_counters_per_second(self):
+        tracker = DeltaTracker()
+        metric = RateMetric()
+        tracker.update(metric, self.get_result([("a", 10, Decimal("1.5"))]), now=100)
+        result = self.get_result([("a", 30, Decimal("2.5"))])
+        tracker.update(metric, result, now=104)
+        self.assertEqual(result.records, [("A", 5.0, 0.25)])
+
+    def test_cache(self):
+        cache = {}
+
+        class Cache:
+            def get(self, key):
+                return cache.get(key)
+
+            def set(self, key, value, timeout):
+                cache[key] = value
+
+        metric = CounterMetric()
+        DeltaTracker(Cache()).update(metric, self.get_result([("a", 1, 1)]), now=1)
+        self.assertEqual(
+            cache, {"postgres_metrics:samples:counters:default": (1, {("a",): (1, 1)})}
+        )
+        result = self.get_result([("a", 3, 1)])
+        self.assertEqual(DeltaTracker(Cache()).update(metric, result, now=2), 1)
+        self.assertEqual(result.records, [("A", 2, 0)])
+
+    def test_scope(self):
+        metric = CounterMetric()
+        self.assertEqual(
+            DeltaTracker(scope="abc").get_cache_key(metric, "default"),
+            "postgres_metrics:samples:counters:default:abc",
+        )
+        cache = caches["default"]
+        cache.clear()
+        DeltaTracker(cache, scope="a").update(
+            metric, self.get_result([("a", 1, 1)]), now=1
+        )
+        self.assertIsNone(DeltaTracker(cache, scope="b").get_sample(metric, "default"))
+        self.assertIsNotNone(
+            DeltaTracker(cache, scope="a").get_sample(metric, "default")
+        )
+
+    def test_duplicate_keys(self):
+        tracker = DeltaTracker()
+        metric = CounterMetric()
+        tracker.update(
+            metric, self.get_result([("a", 1, 1), ("a", 5, 5), ("b", 1, 1)]), now=1
+        )
+        result = self.get_result([("a", 2, 2), ("a", 6, 6), ("b", 3, 1)])
+        tracker.update(metric, result, now=2)
+        self.assertEqual(
+            result.records, [("A", None, None), ("A", None, None), ("B", 2, 0)]
+        )
+        self.assertEqual(tracker.get_sample(metric, "default"), (2, {("b",): (3, 1)}))
+
+    def test_no_data(self):
+        tracker = DeltaTracker()
+        result = NoMetricResult(connection, "unsupported")
+        self.assertIsNone(tracker.update(CounterMetric(), result))
+        result = self.get_result([("a", 1, 1)])
+        self.assertIsNone(tracker.update(PlainMetric(), result))
+        self.assertEqual(result.records, [("a", 1, 1)])
+
+
+@override_settings(ROOT_URLCONF="tests.test_views")
+class DeltaViewTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            "superuser", "superuser@local", "secret"
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+        registry.register(CounterMetric)
+        self.addCleanup(registry.unregister, CounterMetric.slug)
+        self.client.force_login(self.superuser)
+
+    def test_delta(self):
+        response = self.client.get("/postgres-metrics/counters/")
+        self.assertContains(
+            response, '<a href="?o=&amp;delta=1">Show changes since the previous'
+        )
+        response = self.client.get("/postgres-metrics/counters/?delta=1")
+        self.assertContains(response, "There's no previous sample yet.")
+        self.assertContains(response, '<td class="">A</td><td class="">None</td>')
+        response = self.client.get("/postgres-metrics/counters/?delta=1&o=2")
+        self.assertContains(response, "The values shown are the changes over the last")
+        self.assertContains(response, '<td class="">A</td><td class="">0</td>')
+        self.assertContains(response, '<a href="?o=1.2&amp;delta=1">')
+
+    def test_delta_per_session(self):
+        self.client.get("/postgres-metrics/counters/?delta=1")
+        other = self.client_class()
+        other.force_login(self.superuser)
+        response = other.get("/postgres-metrics/counters/?delta=1")
+        self.assertContains(response, "There's no previous sample yet.")
+        response = self.client.get("/postgres-metrics/counters/?delta=1")
+        self.assertContains(response, "The values shown are the changes over the last")
+
+
+class DeltaCommandTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def setUp(self):
+        registry.register(CounterMetric)
+        self.addCleanup(registry.unregister, CounterMetric.slug)
+
+    def call_command(self, *args):
+        stdout = io.StringIO()
+        with mock.patch(
+            "django_rich.management.RichCommand.make_rich_console",
+            lambda *args, **kwargs: Console(width=200, file=stdout),
+        ):
+            call_command("pgm_show_metric", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_delta(self):
+        out = self.call_command("counters", "--delta", "0.01")
+        self.assertIn("changes over 0.01 seconds, 1 rows", out)
+        self.assertIn("│ A        │ 0        │ 0.0      │", out)
+
+    def test_delta_per_second(self):
+        registry.register(RateMetric)
+        self.addCleanup(registry.unregister, RateMetric.slug)
+        out = self.call_command("rates", "--delta", "0.01")
+        self.assertIn("changes per second over 0.01", out)
+
+    def test_no_counters(self):
+        with self.assertRaises(CommandError):
+            self.call_command("cache-hits", "--delta", "0")
@@ -1,22 +1,66 @@
+import pickle
+import threading
+from array import array
+from decimal import Decimal
+from unittest import mock
+
 import django
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.db import connections
-from django.test import SimpleTestCase, TestCase
+from django.db import DatabaseError, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 
 from postgres_metrics.metrics import (
+    COMPILE_SQL_CACHE_SIZE,
     HAS_PSYCOPG,
+    Autovacuum,
     AvailableExtensions,
+    BlockingLocks,
     CacheHits,
+    Checkpoints,
+    Connections,
+    DecimalColumn,
+    IndexBloat,
+    IndexProblems,
     IndexUsage,
     Metric,
     MetricHeader,
+    MetricRecords,
     MetricRegistry,
     MetricResult,
+    Replication,
     SequenceUsage,
+    SessionCounts,
+    Sessions,
+    StatementStatistics,
+    TableBloat,
+    TableSize,
+    Threshold,
+    TransactionIdWraparound,
+    compile_sql,
+    format_size,
+    get_data_concurrently,
+    get_metrics_and_aliases,
+    get_postgresql_aliases,
     registry,
+    worst_style,
 )
 
+MB = 1024 * 1024
+
+
+def create_extension(connection, name):
+    """
+    Create the extension ``name`` in the database behind ``connection`` if
+    it's available there. Return whether it was created.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = %s", [name])
+        if cursor.fetchone() is None:
+            return False
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS %s" % name)
+    return True
+
 
 class MyMetric(Metric):
     label = "My Metric"
@@ -129,6 +173,141 @@ class MetricTest(TestCase):
             OrderedMetric().full_sql, "SELECT 1 ORDER BY 2 DESC, 1 ASC, 3 ASC;"
         )
 
+    def test_exact_sql(self):
+        class MyMetric(Metric):
+            ordering = "1"
+            sql = "SELECT 1 {ORDER_BY};"
+
+        metric = MyMetric(exact=True)
+        self.assertIs(metric.exact, False)
+        self.assertIs(metric.estimated, False)
+        self.assertEqual(metric.full_sql, "SELECT 1 ORDER BY 1 ASC;")
+
+        class EstimatingMetric(Metric):
+            ordering = "1"
+            sql = "SELECT 1 {ORDER_BY};"
+            exact_sql = "SELECT 2 {ORDER_BY};"
+
+        metric = EstimatingMetric()
+        self.assertIs(metric.exact, False)
+        self.assertIs(metric.estimated, True)
+        self.assertEqual(metric.full_sql, "SELECT 1 ORDER BY 1 ASC;")
+
+        metric = EstimatingMetric(exact=True)
+        self.assertIs(metric.exact, True)
+        self.assertIs(metric.estimated, False)
+        self.assertEqual(metric.full_sql, "SELECT 2 ORDER BY 1 ASC;")
+
+    def test_sql_variants(self):
+        class VersionedMetric(Metric):
+            ordering = "1"
+            sql = {
+                110000: "SELECT 11 {ORDER_BY};",
+                140000: "SELECT 14 {ORDER_BY};",
+            }
+
+        metric = VersionedMetric()
+        self.assertEqual(metric.full_sql, "SELECT 14 ORDER BY 1 ASC;")
+        for pg_version, expected in [
+            (100000, None),
+            (110000, "SELECT 11 ORDER BY 1 ASC;"),
+            (130011, "SELECT 11 ORDER BY 1 ASC;"),
+            (140000, "SELECT 14 ORDER BY 1 ASC;"),
+            (170002, "SELECT 14 ORDER BY 1 ASC;"),
+        ]:
+            with self.subTest(pg_version=pg_version):
+                connection = mock.Mock(pg_version=pg_version)
+                self.assertEqual(metric.get_full_sql(connection), expected)
+
+        result = metric.get_result(mock.Mock(pg_version=100000))
+        self.assertIs(result.holds_data, False)
+        self.assertEqual(
+            result.reason, "This metric is not supported on this PostgreSQL version."
+        )
+
+    def test_sql_variants_cached(self):
+        class VersionedMetric(Metric):
+            ordering = "1"
+            sql = {0: "SELECT 1 {ORDER_BY};"}
+
+        connection = mock.Mock(pg_version=160000)
+        compile_sql.cache_clear()
+        VersionedMetric().get_full_sql(connection)
+        VersionedMetric().get_full_sql(connection)
+        VersionedMetric(ordering="-1").get_full_sql(connection)
+        info = compile_sql.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+        for column in range(1, 2 * COMPILE_SQL_CACHE_SIZE):
+            VersionedMetric(ordering=str(column)).get_full_sql(connection)
+        self.assertEqual(compile_sql.cache_info().currsize, COMPILE_SQL_CACHE_SIZE)
+
+    def test_sql_instance_override(self):
+        class VersionedMetric(Metric):
+            ordering = "1"
+            sql = {0: "SELECT 1 {ORDER_BY};"}
+            summary_sql = "SELECT 1 LIMIT 1;"
+
+        connection = mock.Mock(pg_version=160000)
+        metric = VersionedMetric()
+        metric.sql = {0: "SELECT 1 {ORDER_BY};", 160000: "SELECT 16 {ORDER_BY};"}
+        self.assertEqual(metric.get_full_sql(connection), "SELECT 16 ORDER BY 1 ASC;")
+        self.assertEqual(metric.full_sql, "SELECT 16 ORDER BY 1 ASC;")
+        self.assertEqual(
+            VersionedMetric().get_full_sql(connection), "SELECT 1 ORDER BY 1 ASC;"
+        )
+        metric = VersionedMetric(summary=True)
+        metric.summary_sql = "SELECT 2 LIMIT 1;"
+        self.assertEqual(metric.get_full_sql(connection), "SELECT 2 LIMIT 1;")
+
+    def test_sql_variants_invalid(self):
+        msg = (
+            'Metric "InvalidMetric" must map PostgreSQL versions to non-empty SQL '
+            'strings in "exact_sql".'
+        )
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+
+            class InvalidMetric(Metric):
+                sql = "SELECT 1;"
+                exact_sql = {"14": "SELECT 2;"}
+
+    def test_required_extensions(self):
+        class MyMetric(Metric):
+            required_extensions = ["plpgsql"]
+            sql = "SELECT 1;"
+
+        class MissingExtensionMetric(Metric):
+            required_extensions = ["plpgsql", "does_not_exist"]
+            sql = "SELECT * FROM does_not_exist;"
+
+        connection = connections["default"]
+        self.assertEqual(MyMetric().get_result(connection).records, [(1,)])
+        result = MissingExtensionMetric().get_result(connection)
+        self.assertIs(result.holds_data, False)
+        self.assertEqual(
+            result.reason, "This metric requires the does_not_exist extension."
+        )
+
+    def test_exact_required_extensions(self):
+        class MyMetric(Metric):
+            exact_required_extensions = ["does_not_exist"]
+            required_extensions = ["plpgsql"]
+            sql = "SELECT 1;"
+            exact_sql = "SELECT * FROM does_not_exist;"
+
+        self.assertEqual(MyMetric().get_required_extensions(), ["plpgsql"])
+        self.assertEqual(
+            MyMetric(exact=True).get_required_extensions(),
+            ["plpgsql", "does_not_exist"],
+        )
+        connection = connections["default"]
+        self.assertEqual(MyMetric().get_result(connection).records, [(1,)])
+        result = MyMetric(exact=True).get_result(connection)
+        self.assertIs(result.holds_data, False)
+        self.assertEqual(
+            result.reason, "This metric requires the does_not_exist extension."
+        )
+
     def test_get_data(self):
         class DjangoMigrationStatistics(Metric):
             """
@@ -170,6 +349,77 @@ class MetricTest(TestCase):
                 # 2 columns
                 self.assertEqual(len(data[i].records[0]), 2)
 
+    def test_get_data_concurrently(self):
+        class MyMetric(Metric):
+            sql = "SELECT current_database(), current_setting('statement_timeout');"
+
+        class BrokenMetric(Metric):
+            sql = "SELECT 1 / 0;"
+
+        metric, broken = MyMetric(), BrokenMetric()
+        aliases = get_postgresql_aliases()
+        self.assertEqual(sorted(aliases), sorted(self.databases))
+
+        data = get_data_concurrently([metric, broken], statement_timeout=1.5)
+        self.assertEqual(list(data), [metric, broken])
+        for alias, result in zip(aliases, data[metric]):
+            with self.subTest(alias=alias):
+                self.assertEqual(result.alias, alias)
+                self.assertEqual(
+                    result.records,
+                    [(connections[alias].settings_dict["NAME"], "1500ms")],
+                )
+        for error in data[broken]:
+            self.assertIsInstance(error, DatabaseError)
+
+        data = get_data_concurrently([metric], aliases=aliases[:1])
+        self.assertEqual(len(data[metric]), 1)
+        self.assertEqual(data[metric][0].alias, aliases[0])
+
+    def test_get_metrics_and_aliases(self):
+        metrics, aliases = get_metrics_and_aliases()
+        self.assertEqual([type(m) for m in metrics], list(registry))
+        self.assertEqual(aliases, get_postgresql_aliases())
+
+        metrics, aliases = get_metrics_and_aliases(
+            ["index-size"], ["default"], exact=True
+        )
+        self.assertEqual([m.slug for m in metrics], ["index-size"])
+        self.assertTrue(metrics[0].exact)
+        self.assertEqual(aliases, ["default"])
+
+        with self.assertRaisesMessage(ValueError, "Metric 'missing' not found"):
+            get_metrics_and_aliases(["missing"])
+        with self.assertRaisesMessage(
+            ValueError, "Database 'missing', 'sqlite' not found"
+        ):
+            get_metrics_and_aliases(aliases=["default", "sqlite", "missing"])
+
+    def test_get_styles(self):
+        class MyMetric(Metric):
+            sql = "SELECT 1;"
+
+        records = MetricRecords([(1, "a"), (2, "b")])
+        self.assertEqual(
+            MyMetric().get_styles(records), (["", ""], [("", ""), ("", "")])
+        )
+        self.assertEqual(MyMetric().get_styles(MetricRecords([])), ([], []))
+
+        class StyledMetric(Metric):
+            sql = "SELECT 1;"
+
+            def get_record_style(self, record):
+                return "ok" if record[0] > 1 else None
+
+            def get_record_item_style(self, record, item, index):
+                if index == 1 and item == "a":
+                    return "critical"
+
+        self.assertEqual(
+            StyledMetric().get_styles(records),
+            ([None, "ok"], [(None, "critical"), (None, None)]),
+        )
+
     def test_get_record_style(self):
         class MyMetric(Metric):
             sql = "SELECT 1;"
@@ -183,6 +433,96 @@ class MetricTest(TestCase):
         self.assertEqual(MyMetric().get_record_item_style(None, None, None), "")
 
 
+class FormatSizeTest(SimpleTestCase):
+    def test_format_size(self):
+        data = [
+            (0, "0 bytes"),
+            (8192, "8192 bytes"),
+            (10239, "10239 bytes"),
+            (10240, "10 kB"),
+            (24576, "24 kB"),
+            (10485247, "10239 kB"),
+            (10485248, "10 MB"),
+            (20 * 1024**2 - 1, "20 MB"),
+            (20 * 1024**2, "20 MB"),
+            (13 * 1024**3 + 512 * 1024**2, "14 GB"),
+            (20 * 1024**3, "20 GB"),
+            (20 * 1024**4, "20 TB"),
+            (20 * 1024**5, "20 PB"),
+            (20 * 1024**6, "20480 PB"),
+            (-24576, "-24 kB"),
+        ]
+        for value, expected in data:
+            with self.subTest(value=value):
+                self.assertEqual(format_size(value), expected)
+
+
+class MetricRecordsTest(SimpleTestCase):
+    records = [
+        ("foo", 1, 1.5, Decimal("1.25"), None, True),
+        ("bar", 2, 2.5, Decimal("22.50"), "x", False),
+        ("foo", 3, 3.5, Decimal("0.00"), "y", None),
+    ]
+
+    def test_columns(self):
+        records = MetricRecords(self.records)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len(records.columns), 6)
+        self.assertEqual(records.column(1), array("q", [1, 2, 3]))
+        self.assertEqual(records.column(2), array("d", [1.5, 2.5, 3.5]))
+        self.assertIsInstance(records.column(3), DecimalColumn)
+        self.assertEqual(records.column(3).values, array("q", [125, 2250, 0]))
+        self.assertEqual(records.column(4), [None, "x", "y"])
+        self.assertEqual(records.column(5), [True, False, None])
+        self.assertIs(records.column(0)[0], records.column(0)[2])
+
+    def test_fallback_columns(self):
+        records = MetricRecords(
+            [
+                (2**64, 1, Decimal("1.5"), Decimal("NaN")),
+                (1, None, Decimal("1.25"), Decimal("1")),
+            ]
+        )
+        self.assertEqual(records.column(0), [2**64, 1])
+        self.assertEqual(records.column(1), [1, None])
+        self.assertEqual(records.column(2), [Decimal("1.5"), Decimal("1.25")])
+        self.assertIsInstance(records.column(3), list)
+        self.assertEqual(records.column(3)[1], Decimal("1"))
+
+    def test_rows(self):
+        records = MetricRecords(self.records)
+        self.assertEqual(list(records), self.records)
+        self.assertEqual(records, self.records)
+        self.assertNotEqual(records, self.records[:2])
+        self.assertEqual(records[0], self.records[0])
+        self.assertEqual(records[-1], self.records[-1])
+        self.assertEqual(str(records[1][3]), "22.50")
+        self.assertEqual(records[1:], self.records[1:])
+        self.assertIsInstance(records[1:], MetricRecords)
+        with self.assertRaises(IndexError):
+            records[3]
+
+    def test_empty(self):
+        records = MetricRecords([])
+        self.assertEqual(len(records), 0)
+        self.assertFalse(records)
+        self.assertEqual(list(records), [])
+        self.assertEqual(records, [])
+        self.assertEqual(records[:5], [])
+        self.assertEqual(records.column(3), [])
+
+    def test_pickle(self):
+        records = MetricRecords(self.records)
+        self.assertEqual(pickle.loads(pickle.dumps(records)), self.records)
+
+    def test_compact(self):
+        rows = [
+            ("table_%d" % (i // 5), "index_%d" % i, Decimal(i).scaleb(-2), i)
+            for i in range(10000)
+        ]
+        self.assertLess(len(pickle.dumps(MetricRecords(rows))), len(pickle.dumps(rows)))
+
+
 class MetricHeaderTest(SimpleTestCase):
     def test_repr(self):
         header = MetricHeader("Some Name", 1, [])
@@ -378,6 +718,48 @@ class MetricResultTest(TestCase):
                 )
                 self.assertEqual(result.records, [("foo", 1, 2), ("bar", 3, 4)])
 
+    def test_slots(self):
+        result = MetricResult(connections["default"], [("foo", 1)])
+        self.assertFalse(hasattr(result, "__dict__"))
+        self.assertIsInstance(result.records, MetricRecords)
+
+    def test_rows(self):
+        records = [("foo", 10240, None), ("bar", 3, 4)]
+        result = MetricResult(connections["default"], records)
+        self.assertEqual(
+            list(result.rows),
+            [
+                ("", [("", "foo"), ("", 10240), ("", None)]),
+                ("", [("", "bar"), ("", 3), ("", 4)]),
+            ],
+        )
+
+        result = MetricResult(
+            connections["default"], records, {1: format_size, 2: format_size}
+        )
+        result.styles = (
+            ["ok", None],
+            [("", "warning", ""), ("critical", "", "")],
+        )
+        self.assertEqual(
+            list(result.rows),
+            [
+                ("ok", [("", "foo"), ("warning", "10 kB"), ("", None)]),
+                (None, [("critical", "bar"), ("", "3 bytes"), ("", "4 bytes")]),
+            ],
+        )
+
+        result = MetricResult(connections["default"], [], {1: format_size})
+        self.assertEqual(list(result.rows), [])
+
+    def test_raw_sizes(self):
+        for metric in (TableSize(ordering="-2"), TableSize(ordering="-2", exact=True)):
+            with self.subTest(exact=metric.exact):
+                for result in metric.get_data():
+                    sizes = [record[1] for record in result.records]
+                    self.assertTrue(all(isinstance(size, int) for size in sizes))
+                    self.assertEqual(sizes, sorted(sizes, reverse=True))
+
 
 class StyleAssertionMixin:
     def assertRecordStylesEqual(self, metric_class, records, expecteds):
@@ -386,6 +768,8 @@ class StyleAssertionMixin:
             with self.subTest(record=record):
                 style = metric.get_record_style(record)
                 self.assertEqual(style, expected)
+        record_styles, _ = metric.get_styles(MetricRecords(records))
+        self.assertEqual(record_styles, expecteds)
 
     def assertRecordItemStylesEqual(self, metric_class, records, expecteds):
         metric = metric_class()
@@ -396,6 +780,103 @@ class StyleAssertionMixin:
                     for index, item in enumerate(record)
                 )
                 self.assertEqual(styles, expected)
+        _, item_styles = metric.get_styles(MetricRecords(records))
+        self.assertEqual(item_styles, expecteds)
+
+
+class ThresholdTest(SimpleTestCase):
+    def test_invalid_comparator(self):
+        msg = 'Invalid threshold comparator "=". Use one of <, <=, >, >=.'
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            Threshold(0, "=", warning=1)
+        msg = 'Invalid threshold guard comparator "!=". Use one of <, <=, >, >=.'
+        with self.assertRaisesMessage(ImproperlyConfigured, msg):
+            Threshold(0, warning=1, guard=(1, "!=", 2))
+
+    def test_repr(self):
+        self.assertEqual(
+            repr(Threshold(1, "<", warning=2, critical=1)),
+            "<Threshold column=1 < warning=2 critical=1>",
+        )
+
+    def test_get_styles(self):
+        records = [(0, None), (1, 5), (2, 10), (3, 15), (None, 20)]
+        data = [
+            (
+                Threshold(0, warning=1, critical=2),
+                ["ok", "warning", "critical", "critical", None],
+            ),
+            (
+                Threshold(0, ">", warning=1, critical=2),
+                ["ok", "ok", "warning", "critical", None],
+            ),
+            (Threshold(0, "<=", warning=1), ["warning", "warning", "ok", "ok", None]),
+            (Threshold(0, "<", critical=2), ["critical", "critical", "ok", "ok", None]),
+            (
+                Threshold(0, warning=1, critical=2, guard=(1, ">=", 10)),
+                [None, None, "critical", "critical", None],
+            ),
+        ]
+        for threshold, expected in data:
+            with self.subTest(threshold=threshold):
+                self.assertEqual(threshold.get_styles(records), expected)
+                self.assertEqual(threshold.get_styles(MetricRecords(records)), expected)
+                self.assertEqual([threshold.get_style(r) for r in records], expected)
+
+    def test_get_severity_sql(self):
+        self.assertEqual(
+            Threshold(1, warning=10, critical=20).get_severity_sql(),
+            "CASE WHEN c2 >= 20 THEN 2 WHEN c2 >= 10 THEN 1 ELSE 0 END",
+        )
+        self.assertEqual(
+            Threshold(0, "<", warning=0.5, guard=(2, ">=", 100)).get_severity_sql(),
+            "CASE WHEN (c3 >= 100) IS NOT TRUE THEN 0 WHEN c1 < 0.5 THEN 1 ELSE 0 END",
+        )
+
+    def test_cast(self):
+        threshold = Threshold(0, warning=1, cast=float)
+        records = [("0.5",), ("N/A",), ("1.5",), (None,)]
+        self.assertEqual(threshold.get_styles(records), ["ok", None, "warning", None])
+
+    def test_worst_style(self):
+        self.assertIsNone(worst_style([]))
+        self.assertIsNone(worst_style([None, ""]))
+        self.assertEqual(worst_style([None, "ok"]), "ok")
+        self.assertEqual(worst_style(["ok", "critical", "warning"]), "critical")
+        self.assertEqual(worst_style(["info", "ok"]), "info")
+
+    def test_metric_thresholds(self):
+        class MyMetric(Metric):
+            sql = "SELECT 1;"
+            thresholds = [
+                Threshold(0, warning=10, critical=20),
+                Threshold(1, "<", warning=5),
+                Threshold(1, warning=10, item=True),
+                Threshold(1, "<", warning=1, critical=0, item=True),
+            ]
+
+        records = [(1, 8), (15, 2), (25, 12), (1, -1)]
+        metric = MyMetric()
+        self.assertEqual(
+            [metric.get_record_style(record) for record in records],
+            ["ok", "warning", "critical", "warning"],
+        )
+        self.assertEqual(
+            [
+                tuple(
+                    metric.get_record_item_style(r, i, idx) for idx, i in enumerate(r)
+                )
+                for r in records
+            ],
+            [(None, "ok"), (None, "ok"), (None, "warning"), (None, "critical")],
+        )
+        self.assertEqual(
+            metric.get_styles(MetricRecords(records)),
+            (
+                ["ok", "warning", "critical", "warning"],
+                [(None, "ok"), (None, "ok"), (None, "warning"), (None, "critical")],
+            ),
+        )
 
 
 class AvailableExtensionsTest(StyleAssertionMixin, SimpleTestCase):
@@ -415,6 +896,198 @@ class AvailableExtensionsTest(StyleAssertionMixin, SimpleTestCase):
         self.assertRecordStylesEqual(AvailableExtensions, records, expecteds)
 
 
+class StatementTimeoutTest(TransactionTestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_statement_timeout(self):
+        class TimeoutMetric(Metric):
+            statement_timeout = 1
+            sql = "SELECT current_setting('statement_timeout');"
+
+        class SleepMetric(Metric):
+            statement_timeout = 0.05
+            sql = "SELECT pg_sleep(1);"
+
+        connection = connections["default"]
+        self.assertEqual(TimeoutMetric().get_result(connection).records, [("1s",)])
+        with self.assertRaises(DatabaseError):
+            SleepMetric().get_result(connection)
+        # The timeout only applies to the metric's query.
+        with connection.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            self.assertEqual(cursor.fetchone(), ("0",))
+
+
+class AutovacuumTest(StyleAssertionMixin, SimpleTestCase):
+    def test_get_record_style(self):
+        records = [
+            ("table1", 9000, 9000, 50.00, 0, 1.0, 1.0, 1000, 0.00, None, None),
+            ("table1", 50000, 10000, 16.67, 0, 1.0, 1.0, 1000, 0.00, None, None),
+            ("table1", 40000, 10000, 20.00, 0, 1.0, 1.0, 1000, 0.00, None, None),
+            ("table1", 10000, 10000, 50.00, 0, None, None, 1000, 0.00, None, None),
+            ("table1", 0, 0, 0.00, 0, 1.0, 1.0, 200000000, 100.00, None, None),
+            ("table1", 0, 0, 0.00, 0, 1.0, 1.0, 400000000, 200.00, None, None),
+        ]
+        expecteds = ["ok", "ok", "warning", "critical", "warning", "critical"]
+        self.assertRecordStylesEqual(Autovacuum, records, expecteds)
+
+
+class TransactionIdWraparoundTest(StyleAssertionMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            ("db1", 1000, 0.00, 0.00, 0, 0.00),
+            ("db1", 1073741824, 536.87, 50.00, 0, 0.00),
+            ("db1", 1000, 0.00, 0.00, 1610612736, 75.00),
+        ]
+        expecteds = ["ok", "warning", "critical"]
+        self.assertRecordStylesEqual(TransactionIdWraparound, records, expecteds)
+
+    def test_get_result(self):
+        connection = connections["default"]
+        result = TransactionIdWraparound().get_result(connection)
+        databases = [record[0] for record in result.records]
+        self.assertIn(connection.settings_dict["NAME"], databases)
+
+
+class CheckpointsTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_result(self):
+        for alias in self.databases:
+            with self.subTest(alias=alias):
+                result = Checkpoints().get_result(connections[alias])
+                [record] = result.records
+                self.assertEqual(len(record), 11)
+                self.assertGreater(record[10], 0)
+
+    def test_get_delta_record(self):
+        record = (1, 2, 3.14159, 0.5, 10, 0, 0, 0, None, None, 1024.123)
+        self.assertEqual(
+            Checkpoints().get_delta_record(record),
+            (1, 2, 3.14, 0.5, 10, 0, 0, 0, None, None, 1024.12),
+        )
+
+
+class ConnectionsTest(StyleAssertionMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            (None, None, None, None, 70, 97, 72.16),
+            (None, None, None, None, 80, 97, 82.47),
+            (None, None, None, None, 90, 97, 92.78),
+            ("db1", "user1", "app1", "active", 10, 97, 10.31),
+        ]
+        expecteds = ["ok", "warning", "critical", "ok"]
+        self.assertRecordStylesEqual(Connections, records, expecteds)
+
+    def test_get_result(self):
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT current_setting('max_connections')::int"
+                " - current_setting('superuser_reserved_connections')::int"
+            )
+            [available] = cursor.fetchone()
+        result = Connections().get_result(connection)
+        [total] = [record for record in result.records if record[0] is None]
+        self.assertGreaterEqual(total[4], 1)
+        self.assertLessEqual(total[5], available)
+        databases = [record[0] for record in result.records]
+        self.assertIn(connection.settings_dict["NAME"], databases)
+        self.assertEqual(
+            sum(record[4] for record in result.records if record[0] is not None),
+            total[4],
+        )
+
+
+class ReplicationTest(StyleAssertionMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            ("Standby", "s1", "streaming", 0.1, 0.2, 0.3, 1024, None),
+            ("Standby", "s2", "streaming", 1.0, 5.0, 30.0, 1024, None),
+            ("Standby", "s3", "catchup", None, None, None, 1024 * MB, None),
+            ("Slot", "slot1", "inactive", None, None, None, None, 1024 * MB),
+            ("Slot", "slot2", "inactive", None, None, None, None, 10240 * MB),
+            ("Recovery", None, "streaming", None, None, 10.0, 0, None),
+        ]
+        expecteds = ["ok", "warning", "critical", "warning", "critical", "ok"]
+        self.assertRecordStylesEqual(Replication, records, expecteds)
+
+    def test_get_result(self):
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_create_physical_replication_slot('pgm_test', true)"
+            )
+        try:
+            result = Replication().get_result(connection)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_drop_replication_slot('pgm_test')")
+        [record] = [r for r in result.records if r[:2] == ("Slot", "pgm_test")]
+        self.assertEqual(record[2], "inactive")
+        self.assertGreaterEqual(record[7], 0)
+
+
+class BlockingLocksTest(StyleAssertionMixin, TransactionTestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            ("1", 1, None, None, None, None, "idle", "", 40.0, None, "LOCK t"),
+            ("1 > 2", 2, "1", "AccessShareLock", "relation", "t", "", "", 4, 4, ""),
+            ("1 > 3", 3, "1", "AccessShareLock", "relation", "t", "", "", 5, 5, ""),
+            ("1 > 4", 4, "1", "AccessShareLock", "relation", "t", "", "", 30, 30, ""),
+        ]
+        expecteds = [None, "ok", "warning", "critical"]
+        self.assertRecordStylesEqual(BlockingLocks, records, expecteds)
+
+    def test_get_result(self):
+        blocker = connections.create_connection("default")
+        blocker.set_autocommit(False)
+        with blocker.cursor() as cursor:
+            cursor.execute("LOCK TABLE django_migrations IN ACCESS EXCLUSIVE MODE")
+
+        def wait():
+            waiter = connections.create_connection("default")
+            try:
+                with waiter.cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM django_migrations")
+            finally:
+                waiter.close()
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        try:
+            for i in range(50):
+                result = BlockingLocks().get_result(connections["default"])
+                if len(result.records) == 2:
+                    break
+                thread.join(0.1)
+        finally:
+            blocker.rollback()
+            blocker.close()
+            thread.join()
+        blocker_pid, waiter_pid = result.records[0][1], result.records[1][1]
+        self.assertEqual(result.records[0][:3], (str(blocker_pid), blocker_pid, None))
+        self.assertEqual(
+            result.records[1][:6],
+            (
+                "%d > %d" % (blocker_pid, waiter_pid),
+                waiter_pid,
+                str(blocker_pid),
+                "AccessShareLock",
+                "relation",
+                "django_migrations",
+            ),
+        )
+
+
 class CacheHitsTest(StyleAssertionMixin, SimpleTestCase):
     def test_get_record_item_style(self):
         records = [
@@ -434,6 +1107,50 @@ class CacheHitsTest(StyleAssertionMixin, SimpleTestCase):
         self.assertRecordItemStylesEqual(CacheHits, records, expecteds)
 
 
+class IndexProblemsTest(StyleAssertionMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            ("table1", "index1", "Invalid", None, 8192, 0),
+            ("table1", "index1", "Duplicate", "index2", 8192, 0),
+            ("table1", "index1", "Redundant", "index2", 8192, 0),
+            ("table1", "index1", "Unused", None, 8192, 0),
+        ]
+        expecteds = ["critical", "warning", "warning", "info"]
+        self.assertRecordStylesEqual(IndexProblems, records, expecteds)
+
+    def test_get_result(self):
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE problems (id int PRIMARY KEY, a int, b int);"
+                "CREATE INDEX problems_a ON problems (a);"
+                "CREATE INDEX problems_a_copy ON problems (a);"
+                "CREATE INDEX problems_a_b ON problems (a, b);"
+                "CREATE INDEX problems_b_desc ON problems (b DESC);"
+                "CREATE UNIQUE INDEX problems_b ON problems (b);"
+                "CREATE INDEX problems_partial ON problems (a) WHERE b > 0;"
+                "UPDATE pg_index SET indisvalid = false "
+                "WHERE indexrelid = 'problems_b_desc'::regclass;"
+            )
+        result = IndexProblems(ordering="2.3").get_result(connection)
+        records = [record[1:4] for record in result.records if record[0] == "problems"]
+        self.assertEqual(
+            records,
+            [
+                ("problems_a", "Redundant", "problems_a_b"),
+                ("problems_a", "Unused", None),
+                ("problems_a_b", "Unused", None),
+                ("problems_a_copy", "Duplicate", "problems_a"),
+                ("problems_a_copy", "Redundant", "problems_a_b"),
+                ("problems_a_copy", "Unused", None),
+                ("problems_b_desc", "Invalid", None),
+                ("problems_partial", "Unused", None),
+            ],
+        )
+
+
 class IndexUsageTest(StyleAssertionMixin, SimpleTestCase):
     def test_get_record_style(self):
         records = [
@@ -474,6 +1191,85 @@ class SequenceUsageTest(StyleAssertionMixin, SimpleTestCase):
         self.assertRecordStylesEqual(SequenceUsage, records, expecteds)
 
 
+class TableBloatTest(StyleAssertionMixin, TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            ("table1", 100 * MB, 0, 0.00),
+            ("table1", 100 * MB, 29 * MB, 29.00),
+            ("table1", 100 * MB, 30 * MB, 30.00),
+            ("table1", 100 * MB, 50 * MB, 50.00),
+            ("table1", 10 * MB, 9 * MB, 90.00),
+        ]
+        expecteds = [None, "ok", "warning", "critical", None]
+        self.assertRecordStylesEqual(TableBloat, records, expecteds)
+
+    def test_get_result(self):
+        connection = connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bloat_test (id int PRIMARY KEY, value text);"
+                "INSERT INTO bloat_test "
+                "SELECT i, md5(i::text) FROM generate_series(1, 10000) AS i;"
+                "ANALYZE bloat_test;"
+            )
+        for metric_class in (TableBloat, IndexBloat):
+            with self.subTest(metric=metric_class.slug):
+                result = metric_class().get_result(connection)
+                record = next(r for r in result.records if "bloat_test" in r)
+                # A freshly filled table and index are hardly bloated.
+                self.assertGreater(record[-3], 0)
+                self.assertLess(record[-1], 10)
+
+    def test_get_result_exact(self):
+        for alias in sorted(self.databases):
+            connection = connections[alias]
+            with self.subTest(alias=alias):
+                if not create_extension(connection, "pgstattuple"):
+                    self.skipTest("The pgstattuple extension isn't available.")
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "CREATE TABLE bloat_test (id int PRIMARY KEY, value text);"
+                        "CREATE INDEX bloat_test_invalid ON bloat_test (value);"
+                        "INSERT INTO bloat_test "
+                        "SELECT i, md5(i::text) FROM generate_series(1, 10000) AS i;"
+                        # Like an index left behind by a failed CREATE INDEX
+                        # CONCURRENTLY.
+                        "UPDATE pg_index SET indisvalid = false "
+                        "WHERE indexrelid = 'bloat_test_invalid'::regclass;"
+                    )
+                for metric_class in (TableBloat, IndexBloat):
+                    result = metric_class(exact=True).get_result(connection)
+                    self.assertIs(result.holds_data, True)
+                    records = [r for r in result.records if "bloat_test" in r]
+                    self.assertEqual(len(records), 1)
+                    self.assertGreater(records[0][-3], 0)
+                    # B-tree leaf pages are filled up to 90% by default.
+                    self.assertLess(records[0][-1], 20)
+
+    def test_exact_missing_extension(self):
+        for metric_class in (TableBloat, IndexBloat):
+            with self.subTest(metric=metric_class.slug):
+                result = metric_class(exact=True).get_result(connections["default"])
+                self.assertIs(result.holds_data, False)
+                self.assertEqual(
+                    result.reason, "This metric requires the pgstattuple extension."
+                )
+
+
+class IndexBloatTest(StyleAssertionMixin, SimpleTestCase):
+    def test_get_record_style(self):
+        records = [
+            ("table1", "index1", 100 * MB, 29 * MB, 29.00),
+            ("table1", "index1", 100 * MB, 30 * MB, 30.00),
+            ("table1", "index1", 100 * MB, 50 * MB, 50.00),
+            ("table1", "index1", 10 * MB, 9 * MB, 90.00),
+        ]
+        expecteds = ["ok", "warning", "critical", None]
+        self.assertRecordStylesEqual(IndexBloat, records, expecteds)
+
+
 def gen_metric_test_case(metric_class):
     def test_get_data_default_ordering(self):
         metric = self.metric_class()
@@ -488,6 +1284,16 @@ def gen_metric_test_case(metric_class):
         metric = self.metric_class(ordering="1.-2")
         metric.get_data()
 
+    def test_get_data_exact(self):
+        metric = self.metric_class(exact=True)
+        metric.get_data()
+
+    def test_get_data_summary(self):
+        metric = self.metric_class(summary=True)
+        for result in metric.get_data():
+            if result.holds_data:
+                self.assertGreaterEqual(result.total, len(result.records))
+
     def test_repr(self):
         self.assertEqual(
             repr(self.metric_class()), '<Metric "%s">' % self.metric_class.label
@@ -500,6 +1306,8 @@ def gen_metric_test_case(metric_class):
         "test_get_data_default_ordering": test_get_data_default_ordering,
         "test_get_data_no_ordering": test_get_data_no_ordering,
         "test_get_data_explicit_ordering": test_get_data_explicit_ordering,
+        "test_get_data_exact": test_get_data_exact,
+        "test_get_data_summary": test_get_data_summary,
         "test_repr": test_repr,
     }
     cls = type(tc_name, (TestCase,), attrs)
@@ -509,3 +1317,119 @@ def gen_metric_test_case(metric_class):
 for metric_class in registry:
     tc_name, tc = gen_metric_test_case(metric_class)
     locals()[tc_name] = tc
+
+
+class SessionsTest(StyleAssertionMixin, TransactionTestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_record_style(self):
+        records = [
+            (1, "db", "user", "app", "idle in transaction", 59.9, 1, 1, None, ""),
+            (2, "db", "user", "app", "idle in transaction", 60, 1, 1, None, ""),
+            (3, "db", "user", "app", "idle in transaction", 300, 1, 1, None, ""),
+            (4, "db", "user", "app", "active", 60, 1, 1, None, ""),
+            (5, "db", "user", "app", "active", 300, 1, 1, None, ""),
+            (6, "db", "user", "app", "active", 1800, 1, 1, None, ""),
+            (7, "db", "user", "app", None, None, None, None, None, ""),
+        ]
+        expecteds = ["ok", "warning", "critical", "ok", "warning", "critical", None]
+        self.assertRecordStylesEqual(Sessions, records, expecteds)
+
+        records = [
+            ("idle", "app", "Client: ClientRead", 10, None),
+            ("idle in transaction", "app", "Client: ClientRead", 1, 300),
+            ("active", "app", None, 1, 300),
+        ]
+        expecteds = [None, "critical", "warning"]
+        self.assertRecordStylesEqual(SessionCounts, records, expecteds)
+
+    def test_get_result(self):
+        session = connections.create_connection("default")
+        session.set_autocommit(False)
+        try:
+            with session.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid()")
+                (pid,) = cursor.fetchone()
+            result = Sessions().get_result(connections["default"])
+            record = next(record for record in result.records if record[0] == pid)
+            self.assertEqual(record[4], "idle in transaction")
+            self.assertEqual(record[9], "SELECT pg_backend_pid()")
+            self.assertGreaterEqual(record[5], record[6])
+
+            result = SessionCounts().get_result(connections["default"])
+            states = {record[0] for record in result.records}
+            self.assertIn("idle in transaction", states)
+        finally:
+            session.rollback()
+            session.close()
+
+
+class StatementStatisticsTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_get_full_sql(self):
+        metric = StatementStatistics()
+        for pg_version, expected, unexpected, toplevel in [
+            (120000, "total_time", "total_exec_time", "NULL::boolean"),
+            (130000, "total_exec_time", "total_time", "NULL::boolean"),
+            (140000, "total_exec_time", "total_time", "stmt.toplevel"),
+        ]:
+            with self.subTest(pg_version=pg_version):
+                connection = mock.Mock(pg_version=pg_version)
+                sql = metric.get_full_sql(connection)
+                self.assertIn("stmt.%s," % expected, sql)
+                self.assertNotIn("stmt.%s," % unexpected, sql)
+                self.assertIn("::bigint,\n            %s\n" % toplevel, sql)
+                self.assertIn("ORDER BY 6 DESC LIMIT 100", sql)
+
+    def test_get_result(self):
+        for alias in sorted(self.databases):
+            connection = connections[alias]
+            with self.subTest(alias=alias):
+                with connection.cursor() as cursor:
+                    cursor.execute("SHOW shared_preload_libraries")
+                    preloaded = "pg_stat_statements" in cursor.fetchone()[0]
+                if not preloaded or not create_extension(
+                    connection, "pg_stat_statements"
+                ):
+                    self.skipTest("The pg_stat_statements extension isn't loaded.")
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 'statement statistics test'")
+                result = StatementStatistics().get_result(connection)
+                self.assertIs(result.holds_data, True)
+                record = next(
+                    r for r in result.records if "statement statistics test" in r[3]
+                )
+                self.assertEqual(len(record), len(StatementStatistics.header_labels))
+                self.assertEqual(record[2], connection.settings_dict["USER"])
+                self.assertGreaterEqual(record[4], 1)
+
+    def test_limit(self):
+        self.assertEqual(
+            StatementStatistics("-5.1").get_order_by_clause(),
+            "ORDER BY 5 DESC, 1 ASC LIMIT 100",
+        )
+        metric = StatementStatistics()
+        metric.ordering = ""
+        self.assertEqual(metric.get_order_by_clause(), "")
+        self.assertNotIn("LIMIT", metric.full_sql)
+
+    def test_missing_extension(self):
+        result = StatementStatistics().get_result(connections["default"])
+        self.assertIs(result.holds_data, False)
+        self.assertEqual(
+            result.reason, "This metric requires the pg_stat_statements extension."
+        )
+
+    def test_get_delta_record(self):
+        metric = StatementStatistics()
+        record = (1, "db", "user", "SELECT 1", 4, 10.0, 1.0, 4, 0, 0, 0, True)
+        self.assertEqual(metric.get_delta_record(record)[6], 2.5)
+        record = (1, "db", "user", "SELECT 1", None, None, 1.0, 4, 0, 0, 0, True)
+        self.assertIsNone(metric.get_delta_record(record)[6])
+        record = (None, "db", "user", "<insufficient privilege>", 4, 10.0)
+        record += (1.0, 4, 0, 0, 0, True)
+        self.assertEqual(
+            metric.get_delta_record(record),
+            (None, "db", "user", "<insufficient privilege>") + (None,) * 7 + (True,),
+        )
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+from django.test import TestCase
+
+from postgres_metrics.metrics import (
+    Metric,
+    NoMetricResult,
+    Threshold,
+    get_postgresql_aliases,
+    get_summary_sql,
+)
+from postgres_metrics.overview import TOP_RECORDS, MetricSummary, get_summaries
+
+
+class SeriesMetric(Metric):
+    ordering = "1"
+    slug = "overview-series"
+    sql = """
+        SELECT i, 'name ' || i FROM generate_series(1, 20) AS i {ORDER_BY};
+    """
+    summary_sql = """
+        SELECT i, 'name ' || i FROM generate_series(1, 20) AS i
+        ORDER BY 1 DESC LIMIT 10;
+    """
+    thresholds = [Threshold(0, warning=12, critical=18)]
+
+
+class GeneratedSummarySeriesMetric(Metric):
+    ordering = "1"
+    slug = "overview-generated-summary-series"
+    sql = SeriesMetric.sql
+    thresholds = SeriesMetric.thresholds
+    summary_sql = get_summary_sql(sql, 2, "c1 ASC", thresholds=thresholds)
+
+
+class UnstyledSeriesMetric(Metric):
+    slug = "overview-unstyled-series"
+    sql = SeriesMetric.sql
+
+
+class MetricSummaryTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_summary_sql(self):
+        self.assertIn("LIMIT 10", SeriesMetric(summary=True).full_sql)
+        self.assertNotIn("LIMIT 10", SeriesMetric().full_sql)
+        self.assertNotIn("LIMIT 10", SeriesMetric(exact=True).full_sql)
+
+    def test_from_result(self):
+        metric = SeriesMetric(summary=True)
+        summary = MetricSummary.from_result(
+            metric, "default", metric.get_result(connection)
+        )
+        self.assertEqual(summary.style, "critical")
+        self.assertEqual(summary.count, 10)
+        self.assertEqual(summary.headers, ["i", "?column?"])
+        self.assertEqual(len(summary.top_records), TOP_RECORDS)
+        # Critical records first, then warnings, each in the original order.
+        self.assertEqual(
+            [items[0][1] for style, items in summary.top_records],
+            ["20", "19", "18", "17", "16"],
+        )
+        self.assertEqual(summary.top_records[0][0], "critical")
+        self.assertEqual(summary.top_records[3][0], "warning")
+        self.assertIsNotNone(summary.duration)
+
+    def test_from_generated_summary_result(self):
+        metric = GeneratedSummarySeriesMetric(summary=True)
+        result = metric.get_result(connection)
+        self.assertEqual(len(result.records), 10)
+        self.assertEqual(result.total, 20)
+        self.assertEqual(result.records[0], (18, "name 18"))
+        summary = MetricSummary.from_result(metric, "default", result)
+        self.assertEqual(summary.style, "critical")
+        self.assertEqual(summary.count, 20)
+        self.assertEqual(summary.headers, ["c1", "c2"])
+        # Critical and warning records first, although they come last by c1.
+        self.assertEqual(
+            [items[0][1] for style, items in summary.top_records],
+            ["18", "19", "20", "12", "13"],
+        )
+
+    def test_from_unstyled_result(self):
+        metric = UnstyledSeriesMetric()
+        summary = MetricSummary.from_result(
+            metric, "default", metric.get_result(connection)
+        )
+        self.assertIsNone(summary.style)
+        self.assertEqual(summary.count, 20)
+        self.assertEqual(summary.top_records, [])
+
+    def test_from_error(self):
+        summary = MetricSummary.from_result(
+            SeriesMetric(), "default", DatabaseError("canceled ")
+        )
+        self.assertEqual(summary.style, "critical")
+        self.assertEqual(summary.reason, "canceled")
+        self.assertIsNone(summary.count)
+
+        summary = MetricSummary.from_result(
+            SeriesMetric(), "default", NoMetricResult(connection, "unsupported")
+        )
+        self.assertIsNone(summary.style)
+        self.assertEqual(summary.reason, "unsupported")
+
+    def test_get_summaries(self):
+        cache = caches["default"]
+        cache.clear()
+        aliases = get_postgresql_aliases()
+        metric = SeriesMetric(summary=True)
+        summaries = get_summaries([metric], aliases, cache=cache)
+        self.assertEqual([s.alias for s in summaries[metric]], aliases)
+        cached = get_summaries([metric], aliases, cache=cache)
+        self.assertEqual(
+            [s.created for s in cached[metric]],
+            [s.created for s in summaries[metric]],
+        )
+        refreshed = get_summaries([metric], aliases, cache=cache, refresh=True)
+        self.assertNotEqual(
+            [s.created for s in refreshed[metric]],
+            [s.created for s in summaries[metric]],
+        )
@@ -0,0 +1,178 @@
+import datetime
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase
+
+from postgres_metrics import replay
+from postgres_metrics.metrics import Metric, get_data_concurrently, registry
+
+
+class SeriesMetric(Metric):
+    ordering = "1"
+    slug = "series"
+    sql = """
+        SELECT i, CASE WHEN i % 3 = 0 THEN NULL ELSE i % 4 END, 'name ' || i
+        FROM generate_series(1, 10) AS i
+        {ORDER_BY};
+    """
+
+
+class LimitedSeriesMetric(SeriesMetric):
+    limit = 4
+    slug = "limited-series"
+    sql = SeriesMetric.sql
+
+
+class EncodingTest(SimpleTestCase):
+    def test_roundtrip(self):
+        values = [
+            None,
+            True,
+            1,
+            1.5,
+            "text",
+            Decimal("1.23"),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            datetime.date(2024, 1, 2),
+            datetime.time(3, 4, 5),
+            datetime.timedelta(days=1, seconds=5),
+            b"\x00\xff",
+            [1, Decimal("2.5")],
+            {"key": ["value"]},
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                encoded = replay.encode_value(value)
+                self.assertEqual(replay.decode_value(encoded), value)
+
+    def test_sort_rows(self):
+        rows = [(1, "b"), (None, "a"), (2, "a"), (1, "a")]
+        self.assertEqual(
+            replay.sort_rows(rows, "ORDER BY 1 ASC, 2 DESC"),
+            [(1, "b"), (1, "a"), (2, "a"), (None, "a")],
+        )
+        self.assertEqual(
+            replay.sort_rows(rows, "ORDER BY 1 DESC, 2 ASC"),
+            [(None, "a"), (2, "a"), (1, "a"), (1, "b")],
+        )
+        self.assertEqual(
+            replay.sort_rows(rows, "ORDER BY 1 DESC, 2 ASC LIMIT 2"),
+            [(None, "a"), (2, "a")],
+        )
+
+    def test_get_query_key(self):
+        self.assertEqual(
+            replay.get_query_key("SELECT 1\n    ORDER BY 1 ASC, 3 DESC\n;"),
+            "SELECT 1 ;",
+        )
+        self.assertEqual(
+            replay.get_query_key("SELECT 1\n    ORDER BY 1 ASC LIMIT 100\n;"),
+            "SELECT 1 ;",
+        )
+
+
+class ReplayTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "default.json.gz")
+        self.metrics = [Metric() for Metric in registry] + [
+            SeriesMetric(),
+            LimitedSeriesMetric(),
+        ]
+        replay.dump(replay.record(self.metrics, connections["default"]), self.path)
+        self.connections = ConnectionHandler(
+            {
+                "default": {"ENGINE": "django.db.backends.dummy"},
+                "replay": {
+                    "ENGINE": "postgres_metrics.backends.replay",
+                    "NAME": self.path,
+                },
+            }
+        )
+        self.addCleanup(self.connections.close_all)
+
+    def test_replay(self):
+        replayed = self.connections["replay"]
+        self.assertEqual(replayed.pg_version, connections["default"].pg_version)
+        for metric in self.metrics:
+            with self.subTest(metric=metric):
+                expected = metric.get_result(connections["default"])
+                result = type(metric)().get_result(replayed)
+                self.assertEqual(result.alias, "replay")
+                self.assertEqual(result.dsn, expected.dsn)
+                self.assertEqual(
+                    sorted(map(repr, result.records)),
+                    sorted(map(repr, expected.records)),
+                )
+
+    def test_ordering(self):
+        replayed = self.connections["replay"]
+        for ordering in ("1", "-1", "2.-1", "-2.3"):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(
+                    list(SeriesMetric(ordering).get_result(replayed).records),
+                    list(
+                        SeriesMetric(ordering)
+                        .get_result(connections["default"])
+                        .records
+                    ),
+                )
+
+    def test_limit(self):
+        replayed = self.connections["replay"]
+        [query] = [
+            query
+            for query in replay.load(self.path)["queries"]
+            if query["metric"] == LimitedSeriesMetric.slug
+        ]
+        self.assertEqual(len(query["rows"]), 10)
+        for ordering in ("1", "-1", "2.-1", "-2.3"):
+            with self.subTest(ordering=ordering):
+                records = LimitedSeriesMetric(ordering).get_result(replayed).records
+                self.assertEqual(len(records), 4)
+                self.assertEqual(
+                    list(records),
+                    list(
+                        LimitedSeriesMetric(ordering)
+                        .get_result(connections["default"])
+                        .records
+                    ),
+                )
+
+    def test_get_data(self):
+        with mock.patch("postgres_metrics.metrics.connections", self.connections):
+            [result] = SeriesMetric().get_data()
+            data = get_data_concurrently([SeriesMetric()], statement_timeout=1)
+        self.assertEqual(result.alias, "replay")
+        self.assertEqual(len(result.records), 10)
+        self.assertEqual(list(data[next(iter(data))][0].records), list(result.records))
+
+    def test_unknown_query(self):
+        class UnknownMetric(Metric):
+            slug = "unknown"
+            sql = "SELECT 42;"
+
+        with self.assertRaisesMessage(DatabaseError, "No recorded result"):
+            UnknownMetric().get_result(self.connections["replay"])
+
+    def test_record_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            stdout = io.StringIO()
+            call_command(
+                "pgm_record", directory, "cache-hits", "--compress", stdout=stdout
+            )
+            self.assertIn("Recorded 1 queries from default to", stdout.getvalue())
+            fixture = replay.load(os.path.join(directory, "default.json.gz"))
+        self.assertEqual(fixture["alias"], "default")
+        self.assertEqual([q["metric"] for q in fixture["queries"]], ["cache-hits"])
@@ -0,0 +1,252 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rich.console import Console
+
+from postgres_metrics.metrics import (
+    Metric,
+    Threshold,
+    get_data_concurrently,
+    get_postgresql_aliases,
+    registry,
+)
+from postgres_metrics.snapshots import (
+    MAGIC,
+    Snapshot,
+    get_snapshot_names,
+    open_snapshot,
+    write_snapshot,
+)
+from postgres_metrics.views import SNAPSHOT_PER_PAGE
+
+
+class MixedMetric(Metric):
+    header_labels = ["Int", "Float", "Decimal", "Text", "Date", "JSON"]
+    ordering = "1"
+    slug = "mixed"
+    sql = """
+        SELECT
+            i,
+            i * 1.5::float8,
+            round(i / 3.0, 2),
+            CASE WHEN i % 3 = 0 THEN NULL ELSE 'näme ' || i END,
+            DATE '2024-01-01' + i,
+            CASE WHEN i % 5 = 0 THEN NULL ELSE jsonb_build_object('i', i) END
+        FROM generate_series(1, 250) AS i
+        {ORDER_BY};
+    """
+    thresholds = [
+        Threshold(0, warning=100, critical=200),
+        Threshold(2, warning=10, item=True),
+    ]
+
+
+class SnapshotTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "test.pgmsnap")
+        self.aliases = get_postgresql_aliases()
+
+    def write(self, metrics):
+        data = get_data_concurrently(metrics, self.aliases)
+        write_snapshot(self.path, data, self.aliases)
+        return data
+
+    def test_roundtrip(self):
+        metrics = [Metric() for Metric in registry] + [MixedMetric()]
+        data = self.write(metrics)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(
+                list(snapshot.metrics), [metric.slug for metric in metrics]
+            )
+            for metric, expected in data.items():
+                results = snapshot.get_results(metric.slug)
+                self.assertEqual(len(results), len(self.aliases))
+                for result, expected_result in zip(results, expected):
+                    with self.subTest(metric=metric, alias=result.alias):
+                        self.assertEqual(result.alias, expected_result.alias)
+                        self.assertEqual(result.holds_data, expected_result.holds_data)
+                        if not result.holds_data:
+                            self.assertEqual(result.reason, expected_result.reason)
+                            continue
+                        self.assertEqual(result.dsn, expected_result.dsn)
+                        self.assertEqual(list(result.records), expected_result.records)
+                        self.assertEqual(
+                            [result.records[i] for i in range(len(result.records))],
+                            expected_result.records,
+                        )
+                        record_styles, item_styles = expected_result.styles
+                        self.assertEqual(
+                            list(result.styles[0]), [s or "" for s in record_styles]
+                        )
+                        self.assertEqual(
+                            list(result.styles[1]),
+                            [tuple(s or "" for s in i) for i in item_styles],
+                        )
+
+    def test_get_page(self):
+        [expected] = self.write([MixedMetric("-4.1")]).values()
+        with Snapshot(self.path) as snapshot:
+            result = snapshot.get_results("mixed")[0]
+            page = result.get_page(10, 20)
+            self.assertEqual(page.records[0], result.records[10])
+            sorted_page = result.get_page(0, 100, [("-", 4), ("", 1)])
+        self.assertEqual(len(page.records), 10)
+        self.assertEqual(page.styles[0][0], "ok")
+        # NULLs first in descending order, like the database.
+        self.assertEqual(list(sorted_page.records), expected[0].records[:100])
+        self.assertEqual(list(sorted_page.styles[0]), list(expected[0].styles[0][:100]))
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as fp:
+            fp.write(b"not a snapshot")
+        with self.assertRaisesMessage(ValueError, "is not a snapshot file"):
+            Snapshot(self.path)
+        open(self.path, "wb").close()
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+    def test_truncated_file(self):
+        self.write([MixedMetric()])
+        with open(self.path, "rb") as fp:
+            content = fp.read()
+        for size in (len(MAGIC) + 4, len(MAGIC) + 20, len(content) - 1):
+            with self.subTest(size=size):
+                with open(self.path, "wb") as fp:
+                    fp.write(content[:size])
+                with self.assertRaisesMessage(ValueError, "is a corrupt snapshot file"):
+                    Snapshot(self.path)
+
+    def test_get_snapshot_names(self):
+        self.write([MixedMetric()])
+        open(os.path.join(self.directory, "other.txt"), "w").close()
+        self.assertEqual(get_snapshot_names(), [])
+        with self.settings(POSTGRES_METRICS_SNAPSHOT_DIR=self.directory):
+            self.assertEqual(get_snapshot_names(), ["test.pgmsnap"])
+            with self.assertRaises(FileNotFoundError):
+                open_snapshot("other.txt")
+            with self.assertRaises(FileNotFoundError):
+                open_snapshot("../test.pgmsnap")
+            with open_snapshot("test.pgmsnap") as snapshot:
+                self.assertIn("mixed", snapshot.metrics)
+
+
+@override_settings(ROOT_URLCONF="tests.test_views")
+class SnapshotViewTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            "superuser", "superuser@local", "secret"
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        registry.register(MixedMetric)
+        self.addCleanup(registry.unregister, MixedMetric.slug)
+        aliases = get_postgresql_aliases()
+        data = get_data_concurrently([MixedMetric()], aliases)
+        write_snapshot(os.path.join(directory.name, "test.pgmsnap"), data, aliases)
+        self.client.force_login(self.superuser)
+        settings = self.settings(POSTGRES_METRICS_SNAPSHOT_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_pages(self):
+        response = self.client.get("/postgres-metrics/mixed/?snapshot=test.pgmsnap")
+        self.assertContains(response, "from the snapshot test.pgmsnap taken at")
+        self.assertContains(response, "Page 1 of 3")
+        self.assertContains(response, "&amp;snapshot=test.pgmsnap&amp;p=2")
+        self.assertContains(response, '<td class="">näme 1</td>', html=False)
+        self.assertNotContains(response, "näme 101<")
+        self.assertEqual(len(response.context["results"][0].records), SNAPSHOT_PER_PAGE)
+
+        response = self.client.get(
+            "/postgres-metrics/mixed/?snapshot=test.pgmsnap&o=-1&p=3"
+        )
+        self.assertContains(response, "Page 3 of 3")
+        self.assertContains(response, "näme 1<")
+        self.assertNotContains(response, "näme 250<")
+
+    def test_sidebar(self):
+        response = self.client.get("/postgres-metrics/mixed/")
+        self.assertContains(response, '<a href="?snapshot=test.pgmsnap"')
+        self.assertNotContains(response, "Page 1 of")
+
+    def test_missing(self):
+        for query in ("snapshot=missing.pgmsnap", "snapshot=../test.pgmsnap"):
+            with self.subTest(query=query):
+                response = self.client.get("/postgres-metrics/mixed/?" + query)
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(
+            "/postgres-metrics/cache-hits/?snapshot=test.pgmsnap"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_corrupt(self):
+        path = os.path.join(settings.POSTGRES_METRICS_SNAPSHOT_DIR, "test.pgmsnap")
+        with open(path, "rb") as fp:
+            content = fp.read()
+        for content in (b"", content[:20], content[: len(content) // 2]):
+            with self.subTest(size=len(content)):
+                with open(path, "wb") as fp:
+                    fp.write(content)
+                response = self.client.get(
+                    "/postgres-metrics/mixed/?snapshot=test.pgmsnap"
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class SnapshotCommandTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def call_command(self, *args):
+        stdout = io.StringIO()
+        with mock.patch(
+            "django_rich.management.RichCommand.make_rich_console",
+            lambda *args, **kwargs: Console(width=200, file=stdout),
+        ):
+            call_command(*args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_export_and_show(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.pgmsnap")
+            out = self.call_command(
+                "pgm_export", path, "cache-hits", "table-size", "--database", "default"
+            )
+            self.assertIn("Exported 2 metrics from 1 databases to", out)
+            out = self.call_command("pgm_show_metric", "table-size", "--snapshot", path)
+            self.assertIn("snapshot taken at", out)
+            self.assertIn("default (", out)
+            with self.assertRaises(CommandError):
+                self.call_command("pgm_show_metric", "index-size", "--snapshot", path)
+            with self.assertRaises(CommandError):
+                self.call_command(
+                    "pgm_show_metric", "table-size", "--snapshot", directory
+                )
+
+    def test_export_missing_metric(self):
+        with self.assertRaises(CommandError):
+            self.call_command("pgm_export", "unused.pgmsnap", "does-not-exist")
+
+
+class SnapshotColumnTest(SimpleTestCase):
+    def test_empty_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "empty.pgmsnap")
+            write_snapshot(path, {}, [])
+            with Snapshot(path) as snapshot:
+                self.assertEqual(snapshot.metrics, {})
@@ -37,8 +37,11 @@ class GetPostgresMetricsTest(TestCase):
             (self.staff_permitted, "cache-hits "),
             (
                 self.superuser,
-                "available-extensions cache-hits detailed-index-usage index-size index-"
-                "usage sequence-usage table-size ",
+                "autovacuum available-extensions blocking-locks cache-hits "
+                "checkpoints connections detailed-index-usage index-bloat "
+                "index-problems index-size index-usage replication "
+                "sequence-usage session-counts sessions statement-statistics "
+                "table-bloat table-size transaction-id-wraparound ",
             ),
         ]
         rf = RequestFactory()
@@ -0,0 +1,92 @@
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+
+from postgres_metrics.metrics import CacheHits, Metric
+from postgres_metrics.timing import (
+    LatencyHistogram,
+    MetricTiming,
+    format_duration,
+    get_histogram,
+    get_histograms,
+    reset_histograms,
+)
+
+
+class TimedMetric(Metric):
+    slug = "timed"
+    sql = "SELECT generate_series(1, 3);"
+
+
+class FormatDurationTest(SimpleTestCase):
+    def test_format_duration(self):
+        self.assertEqual(format_duration(0), "0.0 ms")
+        self.assertEqual(format_duration(0.01234), "12.3 ms")
+        self.assertEqual(format_duration(0.9999), "999.9 ms")
+        self.assertEqual(format_duration(1), "1.00 s")
+        self.assertEqual(format_duration(4.56789), "4.57 s")
+
+
+class MetricTimingTest(SimpleTestCase):
+    def test_timing(self):
+        timing = MetricTiming(0.001, 0.02, 0.0003, 5)
+        self.assertAlmostEqual(timing.total, 0.0213)
+        self.assertEqual(str(timing), "connect 1.0 ms, execute 20.0 ms, fetch 0.3 ms")
+        self.assertEqual(repr(timing), "<MetricTiming total=0.021300 rowcount=5>")
+
+
+class LatencyHistogramTest(SimpleTestCase):
+    def test_observe(self):
+        histogram = LatencyHistogram(buckets=(0.01, 0.1, 1))
+        self.assertIsNone(histogram.get_quantile(0.5))
+        self.assertEqual(histogram.mean, 0.0)
+        for seconds in (0.005, 0.01, 0.05, 0.5, 2):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 2.565)
+        self.assertAlmostEqual(histogram.mean, 0.513)
+
+    def test_quantile(self):
+        histogram = LatencyHistogram(buckets=(0.01, 0.1, 1))
+        for i in range(10):
+            histogram.observe(0.05)
+        self.assertAlmostEqual(histogram.get_quantile(0.5), 0.055)
+        self.assertAlmostEqual(histogram.get_quantile(1), 0.1)
+        histogram.observe(5)
+        self.assertEqual(histogram.get_quantile(1), 1)
+
+
+class RecordTimingTest(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        reset_histograms()
+        self.addCleanup(reset_histograms)
+
+    def test_get_result(self):
+        with self.assertLogs("postgres_metrics.timing", "DEBUG") as logs:
+            result = TimedMetric().get_result(connections["default"])
+        self.assertEqual(result.timing.rowcount, 3)
+        self.assertGreater(result.timing.execute, 0)
+        self.assertGreaterEqual(result.timing.total, result.timing.execute)
+
+        [record] = logs.records
+        self.assertEqual(record.metric, "timed")
+        self.assertEqual(record.alias, "default")
+        self.assertEqual(record.rowcount, 3)
+        self.assertEqual(record.duration, result.timing.total)
+        self.assertRegex(record.getMessage(), r"^\(\d+\.\d{3}\) timed; alias=default;")
+
+        histogram = get_histogram("timed", "default")
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.sum, result.timing.total)
+
+    def test_histograms(self):
+        TimedMetric().get_result(connections["default"])
+        TimedMetric().get_result(connections["default"])
+        CacheHits().get_result(connections["default"])
+        histograms = get_histograms()
+        self.assertEqual(
+            sorted(histograms), [("cache-hits", "default"), ("timed", "default")]
+        )
+        self.assertEqual(histograms["timed", "default"].count, 2)
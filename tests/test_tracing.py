@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.db import DatabaseError, connections
+from django.test import TestCase
+
+from postgres_metrics import tracing
+from postgres_metrics.metrics import Metric
+from postgres_metrics.signals import post_metric_execute, pre_metric_execute
+
+
+class ExecutedMetric(Metric):
+    slug = "executed"
+    sql = "SELECT generate_series(1, 4);"
+
+
+class FailingMetric(Metric):
+    slug = "failing"
+    sql = "SELECT 1 / 0;"
+
+
+class ExecuteSignalsTest(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.received = []
+        for signal in (pre_metric_execute, post_metric_execute):
+            signal.connect(self.receiver)
+            self.addCleanup(signal.disconnect, self.receiver)
+
+    def receiver(self, signal, sender, **kwargs):
+        self.received.append((signal, sender, kwargs))
+
+    def test_signals(self):
+        metric = ExecutedMetric()
+        result = metric.get_result(connections["default"])
+        (pre, pre_sender, pre_kwargs), (post, post_sender, post_kwargs) = self.received
+        self.assertIs(pre, pre_metric_execute)
+        self.assertIs(pre_sender, ExecutedMetric)
+        self.assertEqual(
+            pre_kwargs,
+            {"metric": metric, "alias": "default", "sql": metric.full_sql},
+        )
+        self.assertIs(post, post_metric_execute)
+        self.assertIs(post_sender, ExecutedMetric)
+        self.assertEqual(post_kwargs["sql"], metric.full_sql)
+        self.assertEqual(post_kwargs["duration"], result.timing.total)
+        self.assertEqual(post_kwargs["rowcount"], 4)
+        self.assertIsNone(post_kwargs["error"])
+
+    def test_signals_error(self):
+        with self.assertRaises(DatabaseError) as cm:
+            FailingMetric().get_result(connections["default"])
+        self.assertEqual(len(self.received), 2)
+        kwargs = self.received[1][2]
+        self.assertIs(kwargs["error"], cm.exception)
+        self.assertIsNone(kwargs["rowcount"])
+        self.assertGreater(kwargs["duration"], 0)
+
+
+class MetricSpanTest(TestCase):
+    databases = {"default"}
+
+    def test_no_opentelemetry(self):
+        with mock.patch.object(tracing, "tracer", None):
+            with tracing.metric_span(ExecutedMetric(), connections["default"], ""):
+                pass
+            result = ExecutedMetric().get_result(connections["default"])
+        self.assertEqual(len(result.records), 4)
+
+    def test_span(self):
+        tracer = mock.MagicMock()
+        span = tracer.start_as_current_span.return_value.__enter__.return_value
+        metric = ExecutedMetric()
+        with mock.patch.object(tracing, "tracer", tracer), mock.patch.object(
+            tracing, "trace", create=True
+        ) as trace:
+            metric.get_result(connections["default"])
+        tracer.start_as_current_span.assert_called_once_with(
+            "postgres_metrics executed",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "db.system": "postgresql",
+                "db.name": connections["default"].settings_dict["NAME"],
+                "db.statement": metric.full_sql,
+                "postgres_metrics.metric": "executed",
+                "postgres_metrics.alias": "default",
+            },
+        )
+        span.set_attribute.assert_called_once_with("db.response.returned_rows", 4)
@@ -0,0 +1,225 @@
+import io
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+
+from postgres_metrics.metrics import (
+    Metric,
+    MetricResult,
+    NoMetricResult,
+    Threshold,
+    registry,
+)
+from postgres_metrics.signals import style_changed
+from postgres_metrics.tracking import StyleTracker
+
+
+class TrackedMetric(Metric):
+    identity_columns = (0,)
+    slug = "tracked"
+    sql = "SELECT 1;"
+    thresholds = [Threshold(1, warning=50, critical=75, hysteresis=5)]
+
+
+class StyleTrackerTest(TestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.received = []
+        style_changed.connect(self.receiver, sender=TrackedMetric)
+        self.addCleanup(style_changed.disconnect, self.receiver, sender=TrackedMetric)
+        caches["default"].clear()
+
+    def receiver(self, sender, metric, alias, key, record, previous, style, **kwargs):
+        self.received.append((sender, alias, key, record, previous, style))
+
+    def result(self, *records):
+        return MetricResult(connections["default"], list(records))
+
+    def test_transitions(self):
+        tracker = StyleTracker()
+        metric = TrackedMetric()
+
+        changes = tracker.update(metric, self.result(("a", 10), ("b", 60)), now=0)
+        self.assertEqual(changes, [(("b",), "ok", "warning")])
+        self.assertEqual(
+            self.received,
+            [(TrackedMetric, "default", ("b",), ("b", 60), "ok", "warning")],
+        )
+        self.assertEqual(
+            tracker.get_state(metric, "default"), {("b",): ("warning", None, None)}
+        )
+
+        changes = tracker.update(metric, self.result(("a", 80), ("b", 61)), now=1)
+        self.assertEqual(changes, [(("a",), "ok", "critical")])
+
+        changes = tracker.update(metric, self.result(("a", 10), ("b", 10)), now=2)
+        self.assertEqual(
+            changes, [(("a",), "critical", "ok"), (("b",), "warning", "ok")]
+        )
+        self.assertEqual(tracker.get_state(metric, "default"), {})
+        self.assertEqual(len(self.received), 4)
+
+    def test_hysteresis(self):
+        tracker = StyleTracker()
+        metric = TrackedMetric()
+        self.assertEqual(
+            tracker.update(metric, self.result(("a", 76)), now=0),
+            [(("a",), "ok", "critical")],
+        )
+        # Within the hysteresis margin of 5 the style sticks ...
+        self.assertEqual(tracker.update(metric, self.result(("a", 74)), now=1), [])
+        self.assertEqual(tracker.update(metric, self.result(("a", 70.5)), now=2), [])
+        # ... until the value is past the level by more than the margin.
+        self.assertEqual(
+            tracker.update(metric, self.result(("a", 69)), now=3),
+            [(("a",), "critical", "warning")],
+        )
+        self.assertEqual(tracker.update(metric, self.result(("a", 46)), now=4), [])
+        self.assertEqual(
+            tracker.update(metric, self.result(("a", 44)), now=5),
+            [(("a",), "warning", "ok")],
+        )
+
+    def test_min_duration(self):
+        tracker = StyleTracker(min_duration=60)
+        metric = TrackedMetric()
+        self.assertEqual(tracker.update(metric, self.result(("a", 80)), now=0), [])
+        self.assertEqual(
+            tracker.get_state(metric, "default"), {("a",): ("ok", "critical", 0)}
+        )
+        self.assertEqual(tracker.update(metric, self.result(("a", 80)), now=30), [])
+        # Flapping back resets the pending style.
+        self.assertEqual(tracker.update(metric, self.result(("a", 10)), now=40), [])
+        self.assertEqual(tracker.get_state(metric, "default"), {})
+        self.assertEqual(tracker.update(metric, self.result(("a", 80)), now=50), [])
+        self.assertEqual(tracker.update(metric, self.result(("a", 80)), now=100), [])
+        self.assertEqual(
+            tracker.update(metric, self.result(("a", 80)), now=110),
+            [(("a",), "ok", "critical")],
+        )
+        self.assertEqual(self.received[0][4:], ("ok", "critical"))
+
+    def test_vanished(self):
+        tracker = StyleTracker()
+        metric = TrackedMetric()
+        tracker.update(metric, self.result(("a", 80), ("b", 60), ("c", 10)), now=0)
+        changes = tracker.update(metric, self.result(("c", 10)), now=1)
+        self.assertEqual(
+            sorted(changes), [(("a",), "critical", "ok"), (("b",), "warning", "ok")]
+        )
+        self.assertIn(
+            (TrackedMetric, "default", ("a",), None, "critical", "ok"), self.received
+        )
+        self.assertEqual(tracker.get_state(metric, "default"), {})
+        # The next occurrence is reported as a new change.
+        self.assertEqual(
+            tracker.update(metric, self.result(("a", 80)), now=2),
+            [(("a",), "ok", "critical")],
+        )
+
+    def test_vanished_min_duration(self):
+        tracker = StyleTracker(min_duration=60)
+        metric = TrackedMetric()
+        tracker.update(metric, self.result(("a", 80)), now=0)
+        tracker.update(metric, self.result(("a", 80)), now=60)
+        self.assertEqual(tracker.update(metric, self.result(), now=70), [])
+        self.assertEqual(
+            tracker.get_state(metric, "default"), {("a",): ("critical", "ok", 70)}
+        )
+        # Showing up again within the minimum duration isn't reported.
+        self.assertEqual(tracker.update(metric, self.result(("a", 80)), now=80), [])
+        self.assertEqual(tracker.update(metric, self.result(), now=90), [])
+        self.assertEqual(
+            tracker.update(metric, self.result(), now=150),
+            [(("a",), "critical", "ok")],
+        )
+        self.assertEqual(tracker.get_state(metric, "default"), {})
+
+    def test_duplicate_keys(self):
+        tracker = StyleTracker()
+        self.assertEqual(
+            tracker.update(TrackedMetric(), self.result(("a", 60), ("a", 80)), now=0),
+            [(("a",), "ok", "critical")],
+        )
+
+    def test_cache(self):
+        metric = TrackedMetric()
+        StyleTracker(caches["default"]).update(metric, self.result(("a", 60)))
+        self.assertEqual(
+            caches["default"].get("postgres_metrics:styles:tracked:default"),
+            {("a",): ("warning", None, None)},
+        )
+        changes = StyleTracker(caches["default"]).update(metric, self.result(("a", 80)))
+        self.assertEqual(changes, [(("a",), "warning", "critical")])
+
+    def test_no_data(self):
+        tracker = StyleTracker()
+        result = NoMetricResult(connections["default"], "some reason")
+        self.assertEqual(tracker.update(TrackedMetric(), result), [])
+
+
+class CriticalMetric(Metric):
+    identity_columns = (0,)
+    slug = "critical"
+    sql = "SELECT 'a', 80;"
+    thresholds = [Threshold(1, warning=50, critical=75)]
+
+
+class CheckCommandTrackingTest(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    def test_track(self):
+        received = []
+
+        def receiver(sender, alias, key, previous, style, **kwargs):
+            received.append((sender, alias, key, previous, style))
+
+        caches["default"].clear()
+        registry.register(CriticalMetric)
+        self.addCleanup(registry.unregister, CriticalMetric.slug)
+        style_changed.connect(receiver)
+        self.addCleanup(style_changed.disconnect, receiver)
+        for i in range(2):
+            with self.assertRaises(SystemExit):
+                call_command(
+                    "pgm_check",
+                    "critical",
+                    "--track",
+                    "--database",
+                    "default",
+                    stdout=io.StringIO(),
+                )
+        self.assertEqual(
+            received, [(CriticalMetric, "default", ("a",), "ok", "critical")]
+        )
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            "metrics": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "postgres-metrics-tracking",
+            },
+        },
+        POSTGRES_METRICS_CACHE="metrics",
+    )
+    def test_track_cache(self):
+        registry.register(CriticalMetric)
+        self.addCleanup(registry.unregister, CriticalMetric.slug)
+        with self.assertRaises(SystemExit):
+            call_command(
+                "pgm_check",
+                "critical",
+                "--track",
+                "--database",
+                "default",
+                stdout=io.StringIO(),
+            )
+        self.assertEqual(
+            caches["metrics"].get("postgres_metrics:styles:critical:default"),
+            {("a",): ("critical", None, None)},
+        )
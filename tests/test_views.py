@@ -1,9 +1,14 @@
+from unittest import mock
+
 from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.models import Permission, User
+from django.core.cache import caches
 from django.test import TestCase, override_settings
 from django.urls import include, re_path
 
+from postgres_metrics.metrics import get_data_concurrently
+
 urlpatterns = [
     re_path("^postgres-metrics/", include("postgres_metrics.urls")),
     re_path("^admin/", admin.site.urls),
@@ -66,7 +71,7 @@ class TestMetricsView(TestCase):
 
     def test_anonymous_no_metric(self):
         result = self.client.get("/postgres-metrics/")
-        self.assertEqual(404, result.status_code)
+        self.assertEqual(403, result.status_code)
 
     def test_detail_view_sidebar(self):
         self.client.force_login(self.superuser)
@@ -87,6 +92,58 @@ class TestMetricsView(TestCase):
             result.content.decode(),
         )
 
+    def test_detail_view_estimated(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/table-size/")
+        self.assertContains(
+            result,
+            '<p class="pgm-estimated">The values shown are estimates. '
+            '<a href="?o=1&amp;exact=1">Show exact values</a></p>',
+            html=True,
+        )
+        self.assertContains(result, "&mdash; estimated &mdash;")
+        self.assertContains(result, '<a href="?o=-1&amp;exact=1">', count=0)
+
+        result = self.client.get("/postgres-metrics/table-size/?o=-1&exact=1")
+        self.assertContains(
+            result,
+            '<p class="pgm-exact">The values shown are exact. '
+            '<a href="?o=-1">Show estimated values</a></p>',
+            html=True,
+        )
+        self.assertNotContains(result, "&mdash; estimated")
+        self.assertContains(result, '<a href="?o=1&amp;exact=1">')
+
+    def test_detail_view_formatted_values(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/index-size/?exact=1")
+        self.assertRegex(
+            result.content.decode(), r'<td class="">\d+ (bytes|kB|MB)</td>'
+        )
+
+    def test_detail_view_styles(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/available-extensions/")
+        self.assertRegex(
+            result.content.decode(),
+            r'<tr class="row[12] pgm-ok"><td class="">plpgsql</td>',
+        )
+
+    def test_detail_view_timing(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/cache-hits/")
+        self.assertRegex(
+            result.content.decode(),
+            r'<span class="pgm-timing" title="connect [0-9.]+ ms, execute [0-9.]+ '
+            r'ms, fetch [0-9.]+ ms">1 row in [0-9.]+ ms</span></caption>',
+        )
+
+    def test_detail_view_not_estimated(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/cache-hits/?exact=1")
+        self.assertNotContains(result, "pgm-estimated")
+        self.assertNotContains(result, "pgm-exact")
+
     def test_admin_index_list(self):
         self.client.force_login(self.superuser)
         result = self.client.get("/admin/")
@@ -102,3 +159,88 @@ class TestMetricsView(TestCase):
             'Usage">Index Usage</a></th>',
             html=True,
         )
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestOverviewView(TestCase):
+    databases = {name for name in settings.DATABASES if name != "sqlite"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = User.objects.create_superuser(
+            "superuser", "superuser@local", "secret"
+        )
+        cls.staff_permitted = User.objects.create_user(
+            "staff_permitted", "staff_permitted@local", is_staff=True
+        )
+        cls.staff_permitted.user_permissions.add(
+            Permission.objects.get(codename="can_view_metric_cache_hits")
+        )
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_check_access(self):
+        result = self.client.get("/postgres-metrics/")
+        self.assertEqual(403, result.status_code)
+
+        self.client.force_login(self.staff_permitted)
+        result = self.client.get("/postgres-metrics/")
+        self.assertEqual(200, result.status_code)
+        self.assertEqual(
+            [metric.slug for metric, summaries in result.context["summaries"]],
+            ["cache-hits"],
+        )
+
+    def test_grid(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/")
+        self.assertContains(
+            result,
+            '<th scope="row"><a href="/postgres-metrics/table-size/">Table Size</a>'
+            "</th>",
+            html=True,
+        )
+        for alias in self.databases:
+            with self.subTest(alias=alias):
+                self.assertContains(
+                    result,
+                    '<th scope="col"><div class="text">'
+                    "<span>%s</span></div></th>" % alias,
+                    html=True,
+                )
+        self.assertContains(result, '<a href="?refresh=1">Refresh</a>', html=True)
+
+    def test_sessions(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/postgres-metrics/")
+        self.assertContains(
+            result,
+            '<th scope="row"><a href="/postgres-metrics/session-counts/">'
+            "Session Counts</a></th>",
+            html=True,
+        )
+        self.assertNotContains(result, 'href="/postgres-metrics/sessions/"')
+
+    def test_cached(self):
+        self.client.force_login(self.superuser)
+        self.client.get("/postgres-metrics/")
+        with mock.patch("postgres_metrics.overview.get_data_concurrently") as get:
+            self.client.get("/postgres-metrics/")
+        get.assert_not_called()
+        with mock.patch(
+            "postgres_metrics.overview.get_data_concurrently",
+            wraps=get_data_concurrently,
+        ) as get:
+            self.client.get("/postgres-metrics/?refresh=1")
+        get.assert_called_once()
+
+    def test_admin_index_link(self):
+        self.client.force_login(self.superuser)
+        result = self.client.get("/admin/")
+        self.assertContains(
+            result,
+            '<th scope="row"><a href="/postgres-metrics/" title="Overview">Overview'
+            "</a></th>",
+            html=True,
+        )